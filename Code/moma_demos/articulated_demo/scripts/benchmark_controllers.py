@@ -0,0 +1,180 @@
+#----- Description -----
+
+# Micro-benchmark of the controllers on the inputs recorded during reference runs,
+# i.e. runs saved with '--record-controller-steps'. The recorded (veldesEE_ee,
+# infoTuple) stream of every run is replayed through 'SplitVelocity' and
+# 'CalculateDesiredJointVel' of every controller (see ControllerStepReplay), and
+# the distributions of the solve times are reported. Every run is replayed
+# 'repeat' times and the fastest time of every tick is kept, which removes most
+# of the noise of the machine.
+#
+# With '-o', the solutions and the timings are saved. With '--baseline', they are
+# compared to the ones saved with an earlier version of the controllers, on the
+# same runs. The script exits with status 1 if a solution moved by more than
+# 'tol' or a stage got slower than 'max-slowdown' at the median, so it can be used
+# as a regression gate for changes of the controllers.
+
+#-----------------------
+
+from highlevel_planning.sim.controllers.fixed_base_torque_control import Controller as TorqueController
+from highlevel_planning.sim.controllers.moving_base_QCQP_vel_control import Controller as QCQPController
+from highlevel_planning.sim.controllers.moving_base_LCQP_vel_control import Controller as LCQPController
+from highlevel_planning.sim.controllers.moving_base_SOCP_vel_control import Controller as SOCPController
+from highlevel_planning.sim.controllers.qp_workspace import QP_BACKENDS
+from highlevel_planning.sim.controllers.step_recorder import ControllerStepReplay, LoadControllerSteps
+
+import argparse
+import sys
+import numpy as np
+
+#-----------------
+
+# The fixed base Cartesian controller only commands pybullet and cannot be replayed
+
+CONTROLLERS = {
+    "fixed_base_torque": (TorqueController, dict()),
+    "QCQP": (QCQPController, dict(noCollision=True)),
+    "QCQP_bounded": (QCQPController, dict(noCollision=True, split_backend='bounded')),
+    "LCQP": (LCQPController, dict(noCollision=True, Npolygon=32)),
+    "SOCP": (SOCPController, dict(noCollision=True)),
+}
+
+STAGES = ["velocity_split", "qp_solve"]
+
+
+def replay_controller(replays, controller_class, kwargs, repeat):
+
+    #----- Returns the solutions of all the runs and the fastest time of every
+    # tick and stage [ns] -----
+
+    q_dot_optimal = []
+    vLinBase_b = []
+    durations = {stage: [] for stage in STAGES}
+
+    for replay in replays:
+
+        fastest = dict()
+
+        for r in range(repeat):
+
+            controller = replay.MakeController(controller_class, **kwargs)
+            q_dot, v_base, profiler = replay.Run(controller)
+
+            if r == 0:
+                q_dot_optimal.append(q_dot)
+                vLinBase_b.append(v_base)
+
+            for stage in STAGES:
+                stage_durations = profiler.StageDurations(stage)
+                fastest[stage] = stage_durations if r == 0 else np.minimum(fastest[stage], stage_durations)
+
+        for stage in STAGES:
+            durations[stage].append(fastest[stage])
+
+    return np.concatenate(q_dot_optimal), np.concatenate(vLinBase_b), {stage: np.concatenate(durations[stage]) for stage in STAGES}
+
+
+def max_delta(x, x_baseline):
+
+    #----- Ticks that failed in only one of the versions count as an infinite delta -----
+
+    if x.shape != x_baseline.shape:
+        return np.inf
+
+    failed = np.isnan(x)
+    if np.any(failed != np.isnan(x_baseline)):
+        return np.inf
+
+    if np.all(failed):
+        return 0.0
+
+    return float(np.max(np.abs(x[~failed] - x_baseline[~failed])))
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("runs", type=str, nargs="+", help="folders of runs saved with --record-controller-steps")
+    parser.add_argument("-c", "--controllers", type=str, nargs="+", default=list(CONTROLLERS.keys()), choices=list(CONTROLLERS.keys()))
+    parser.add_argument("--qp-backend", type=str, default="quadprog", choices=QP_BACKENDS)
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="number of replays of every run")
+    parser.add_argument("-o", "--output", type=str, default=None, help="npz file for the solutions and timings")
+    parser.add_argument("-b", "--baseline", type=str, default=None, help="npz file saved with -o by an earlier version")
+    parser.add_argument("--tol", type=float, default=1e-6, help="allowed change of the commanded velocities")
+    parser.add_argument("--max-slowdown", type=float, default=1.25, help="allowed ratio of the median times to the baseline")
+    args = parser.parse_args()
+
+    replays = [ControllerStepReplay(LoadControllerSteps(folder_name)) for folder_name in args.runs]
+
+    print("Replayed runs:  ", len(replays))
+    print("Replayed ticks: ", sum(replay.num_steps for replay in replays))
+
+    results = dict()
+
+    print("{:>18} {:>14} {:>8} | {:>10} {:>10} {:>10} {:>10} | {:>6}".format("controller", "stage [us]", "ticks", "p50", "p95", "p99", "max", "failed"))
+
+    for name in args.controllers:
+
+        controller_class, kwargs = CONTROLLERS[name]
+        kwargs = dict(kwargs, qp_backend=args.qp_backend)
+
+        q_dot_optimal, vLinBase_b, durations = replay_controller(replays, controller_class, kwargs, max(args.repeat, 1))
+        num_failed = int(np.sum(np.any(np.isnan(q_dot_optimal), axis=1)))
+
+        results[name + "_q_dot_optimal"] = q_dot_optimal
+        results[name + "_vLinBase_b"] = vLinBase_b
+
+        for stage in STAGES:
+
+            if len(durations[stage]) == 0:
+                continue
+
+            results[name + "_" + stage] = durations[stage]
+
+            p50, p95, p99 = np.percentile(durations[stage]*1e-3, [50, 95, 99])
+            print("{:>18} {:>14} {:8d} | {:10.1f} {:10.1f} {:10.1f} {:10.1f} | {:6d}".format(
+                name, stage, len(durations[stage]), p50, p95, p99, np.max(durations[stage])*1e-3, num_failed
+            ))
+
+    if args.output is not None:
+        np.savez(args.output, **results)
+
+    if args.baseline is None:
+        return
+
+    #----- Comparison with the baseline -----
+
+    with np.load(args.baseline) as data:
+        baseline = {key: data[key] for key in data.files}
+
+    passed = True
+
+    print("{:>18} {:>14} {:>14} {:>14} | {:>6}".format("controller", "max dq_dot", "max dvBase", "p50 ratio", "gate"))
+
+    for name in args.controllers:
+
+        if name + "_q_dot_optimal" not in baseline:
+            print("{:>18} not in the baseline".format(name))
+            continue
+
+        delta_q_dot = max_delta(results[name + "_q_dot_optimal"], baseline[name + "_q_dot_optimal"])
+        delta_v_base = max_delta(results[name + "_vLinBase_b"], baseline[name + "_vLinBase_b"])
+
+        ratio = 0.0
+        for stage in STAGES:
+            key = name + "_" + stage
+            if key in results and key in baseline and len(baseline[key]) > 0:
+                ratio = max(ratio, np.median(results[key])/max(np.median(baseline[key]), 1.0))
+
+        gate = delta_q_dot <= args.tol and delta_v_base <= args.tol and ratio <= args.max_slowdown
+        passed = passed and gate
+
+        print("{:>18} {:14.3e} {:14.3e} {:14.3f} | {:>6}".format(name, delta_q_dot, delta_v_base, ratio, "ok" if gate else "FAILED"))
+
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,202 @@
+#----- Description -----
+
+# Equivalence gate for the two backends of the velocity split of the QCCO controller
+# (moving_base_QCQP_vel_control): SLSQP, as used in the thesis, and the bounded 2D
+# solver SolveSplit2D. By default the split problems (vdes, vmean, scaleFactor, v)
+# are those of recorded runs: the controller steps saved with
+# '--record-controller-steps' (STEP_FILE_NAME) are searched in the given folders and
+# replayed through the QCCO controller (see ControllerStepReplay), which logs every
+# split problem it solves. A corpus saved with 'Controller.SaveSplitLog' can be given
+# instead with '-c'. Random problems of a similar magnitude are checked in addition.
+#
+# The script exits with status 1 if, on any corpus, the bounded solver is worse
+# than SLSQP by more than 'tol' on the objective or leaves the disc by more than
+# 'tol', so it can be used as a regression gate for changes of SolveSplit2D.
+
+#-----------------------
+
+from highlevel_planning.tools.door_opening_util import Objective1, Constraint1, SolveSplit2D
+from highlevel_planning.sim.controllers.moving_base_QCQP_vel_control import Controller as QCQPController
+from highlevel_planning.sim.controllers.step_recorder import ControllerStepReplay, LoadControllerSteps, STEP_FILE_NAME
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from scipy.optimize import minimize
+
+#-----------------
+
+def find_runs(folders):
+
+    #----- Folders containing recorded controller steps, searched recursively -----
+
+    runs = []
+
+    for folder in folders:
+        for dir_path, dir_names, file_names in os.walk(folder):
+            dir_names.sort()
+            if STEP_FILE_NAME in file_names:
+                runs.append(dir_path)
+
+    return runs
+
+
+def recorded_corpus(runs):
+
+    #----- Split problems of the recorded runs, as solved by the thesis version
+    # of the controller -----
+
+    problems = []
+
+    for folder_name in runs:
+
+        replay = ControllerStepReplay(LoadControllerSteps(folder_name))
+
+        controller = replay.MakeController(QCQPController, noCollision=True, split_backend='slsqp')
+        controller.split_log = []
+        replay.Run(controller)
+
+        problems.extend(controller.split_log)
+
+    return {
+        "vdes": np.array([entry[0] for entry in problems]).reshape(-1, 2),
+        "vmean": np.array([entry[1] for entry in problems]).reshape(-1, 2),
+        "scaleFactor": np.array([entry[2] for entry in problems]),
+        "v": np.array([entry[3] for entry in problems]),
+    }
+
+
+def random_corpus(num_problems, seed=0):
+
+    rng = np.random.default_rng(seed)
+
+    return {
+        "vdes": 0.1*rng.normal(size=(num_problems, 2)),
+        "vmean": 0.1*rng.normal(size=(num_problems, 2)),
+        "scaleFactor": rng.uniform(-1.0, 1.0, size=num_problems),
+        "v": np.abs(0.1*rng.normal(size=num_problems)),
+    }
+
+
+def solve_slsqp(vdes, vmean, scaleFactor, v):
+
+    opt = {'maxiter': 100, 'disp': False}
+    cons = ({'type': 'ineq', 'fun':Constraint1, 'args':(0.5*v, )})
+
+    sol_lin = minimize(Objective1, np.array([0.0, 0.0]), args = (vdes, vmean, scaleFactor), method='SLSQP', constraints=cons, options=opt)
+
+    return sol_lin.x
+
+
+def solve_bounded(vdes, vmean, scaleFactor, v):
+
+    return SolveSplit2D(vdes, vmean, scaleFactor, 0.5*v)
+
+
+def run_backend(solve_fcn, corpus):
+
+    num_problems = len(corpus["v"])
+    solutions = np.zeros((num_problems, 2))
+    durations = np.zeros(num_problems)
+
+    for i in range(num_problems):
+
+        start = time.perf_counter()
+        solutions[i, :] = solve_fcn(corpus["vdes"][i], corpus["vmean"][i], corpus["scaleFactor"][i], corpus["v"][i])
+        durations[i] = time.perf_counter() - start
+
+    return solutions, durations
+
+
+def compare_backends(name, corpus, tol):
+
+    #----- Prints the comparison on one corpus and returns whether it passed the gate -----
+
+    num_problems = len(corpus["v"])
+
+    print("----- " + name + " -----")
+    print("Number of problems:            ", num_problems)
+
+    if num_problems == 0:
+        return True
+
+    x_slsqp, t_slsqp = run_backend(solve_slsqp, corpus)
+    x_bounded, t_bounded = run_backend(solve_bounded, corpus)
+
+    #----- The objective is only piecewise smooth and can be flat, hence the
+    # backends are compared on the objective value rather than on the solution -----
+
+    f_slsqp = np.zeros(num_problems)
+    f_bounded = np.zeros(num_problems)
+    violation_slsqp = np.zeros(num_problems)
+    violation_bounded = np.zeros(num_problems)
+
+    for i in range(num_problems):
+
+        args_i = (corpus["vdes"][i], corpus["vmean"][i], corpus["scaleFactor"][i])
+        radius = 0.5*corpus["v"][i]
+
+        violation_slsqp[i] = max(0.0, -Constraint1(x_slsqp[i], radius))
+        violation_bounded[i] = max(0.0, -Constraint1(x_bounded[i], radius))
+
+        #----- SLSQP often stops slightly outside the disc, which would give it
+        # a lower objective value, hence its solution is projected onto the disc -----
+
+        norm_slsqp = np.linalg.norm(x_slsqp[i])
+        if norm_slsqp > radius:
+            x_slsqp[i] *= radius/norm_slsqp
+
+        f_slsqp[i] = Objective1(x_slsqp[i], *args_i)
+        f_bounded[i] = Objective1(x_bounded[i], *args_i)
+
+    excess = f_bounded - f_slsqp
+    num_outside = int(np.sum((excess > tol) | (violation_bounded > tol) | np.isnan(f_bounded)))
+
+    print("Max objective excess vs SLSQP: ", np.max(excess))
+    print("Max constraint violation SLSQP:", np.max(violation_slsqp))
+    print("Max constraint violation:      ", np.max(violation_bounded))
+    print("Problems outside tolerance:    ", num_outside)
+    print("Mean time SLSQP [us]:          ", 1e6*np.mean(t_slsqp))
+    print("Mean time bounded [us]:        ", 1e6*np.mean(t_bounded))
+    print("Max time SLSQP [us]:           ", 1e6*np.max(t_slsqp))
+    print("Max time bounded [us]:         ", 1e6*np.max(t_bounded))
+    print("Speedup (mean):                ", np.mean(t_slsqp)/np.mean(t_bounded))
+
+    return num_outside == 0
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("runs", type=str, nargs="*", default=["."], help="folders searched for runs saved with --record-controller-steps")
+    parser.add_argument("-c", "--corpus", type=str, default=None, help="npz file saved with Controller.SaveSplitLog, used instead of the recorded runs")
+    parser.add_argument("-n", "--num-problems", type=int, default=2000, help="number of additional random problems, 0 to skip them")
+    parser.add_argument("--tol", type=float, default=1e-6, help="allowed objective excess and constraint violation of the bounded solver")
+    args = parser.parse_args()
+
+    if args.corpus is not None:
+        name = args.corpus
+        corpus = dict(np.load(args.corpus))
+    else:
+        runs = find_runs(args.runs)
+        if len(runs) == 0:
+            parser.error("no " + STEP_FILE_NAME + " found in " + ", ".join(args.runs))
+        name = "recorded runs ({})".format(len(runs))
+        corpus = recorded_corpus(runs)
+
+    passed = compare_backends(name, corpus, args.tol)
+
+    if args.num_problems > 0:
+        passed = compare_backends("random problems", random_corpus(args.num_problems), args.tol) and passed
+
+    print("Gate:", "ok" if passed else "FAILED")
+
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+
+    main()
@@ -2,9 +2,14 @@
 # -*- coding: utf-8 -*-
 
 import os
+import argparse
 import numpy as np
-import matplotlib.pyplot as plt
 import math
+import warnings
+
+from highlevel_planning.tools.results_store import ResultsStore, ingest_runs
+from highlevel_planning.sim.termination_monitor import OUTCOMES, SUCCESSFUL_OUTCOMES
+from highlevel_planning.tools.figure_jobs import render_figures, figure_subplots
 
 #----- Description -----
 
@@ -12,8 +17,18 @@ import math
 
 #-----------------------
 
-def AnalyseResultsPybullet():
-    print("Collect the data...")
+RESULTS_FOLDER = os.getcwd()+'/moma/moma_demos/articulated_demo/RESULTS SECTION RUNS'
+RESULTS_STORE = RESULTS_FOLDER + '/results_store.npz'
+
+#----- Number of objects, criteria, values, configs and controllers of the
+# result runs, i.e. the key levels of the results store -----
+
+RESULTS_KEY_SHAPE = (5, 6, 2, 25, 4)
+
+def ListResultRuns(folder):
+    
+    #----- Yields the key (object, criterion, value, config, controller) and the
+    # folder of every run of the results section -----
     
     list_of_names = ['Dishwasher','Drawer','Room Door','Sliding door', 'Sliding lid']
     list_of_criteria2 = ['Beta','c1c2','f','m', 'Nominal model', 'Complete alg']
@@ -28,10 +43,6 @@ def AnalyseResultsPybullet():
     list_of_controllers2 = ['fixed_base_cartesian_velocity_control', 'moving_base_no_collision_max_mob_control_LCQP_32', 'moving_base_no_collision_max_mob_control_QCCO', 'moving_base_no_collision_max_mob_control_SOCP']
     list_of_controllers3 = ['fixed_base_torque_control', 'moving_base_no_collision_max_mob_control_QCCO']
     
-    folder = os.getcwd()+'/moma/moma_demos/articulated_demo/RESULTS SECTION RUNS'
-    
-    big_matrix = np.zeros((5,6,2,25,4,12,1201))    
-    
     for i in range(len(list_of_names)):
         
         name = list_of_names[i]
@@ -111,43 +122,76 @@ def AnalyseResultsPybullet():
                             contr = list_of_controllers[c]
                             folder7 = folder6 + '/' + contr
                             
-                            actual_dir = np.load(folder7+'//actual_dir.npy')
-                            estimated_dir = np.load(folder7+'//estimated_dir.npy')
-                            manipulability = np.load(folder7+'//manipulability_meas.npy')
-                            exec_time = np.load(folder7+'//exec_time.npy')
-                            
-                            vel_base = np.load(folder7+'//lin_vBase_O_meas.npy')
-                            vel_ee_des = np.load(folder7+'//lin_vdesEE_O.npy')
-                            vel_ee_meas = np.load(folder7+'//lin_vEE_O_meas.npy')
-                            
-                            actual_pose = np.load(folder7+'//actual_drawer_pos.npy')
-                            
-                            for idx1 in range(estimated_dir.shape[0]):
-                                                                
-                                big_matrix[i,j,k,current_run,c,0,idx1]=np.dot(np.squeeze(estimated_dir[idx1, :]), np.squeeze(actual_dir[idx1, :]))
-                                big_matrix[i,j,k,current_run,c,1,idx1]=manipulability[idx1]
-                                big_matrix[i,j,k,current_run,c,2,idx1]=exec_time[idx1]
-                                
-                                big_matrix[i,j,k,current_run,c,3,idx1]=vel_ee_meas[idx1,0]
-                                big_matrix[i,j,k,current_run,c,4,idx1]=vel_ee_meas[idx1,1]
-                                big_matrix[i,j,k,current_run,c,5,idx1]=vel_ee_meas[idx1,2]
-                                
-                                big_matrix[i,j,k,current_run,c,6,idx1]=vel_ee_des[idx1,0]
-                                big_matrix[i,j,k,current_run,c,7,idx1]=vel_ee_des[idx1,1]
-                                big_matrix[i,j,k,current_run,c,8,idx1]=vel_ee_des[idx1,2]
-                                
-                                big_matrix[i,j,k,current_run,c,9,idx1]=actual_pose[idx1,0]
-                                big_matrix[i,j,k,current_run,c,10,idx1]=actual_pose[idx1,1]
-                                big_matrix[i,j,k,current_run,c,11,idx1]=actual_pose[idx1,2]
-                                
-                            big_matrix[i,j,k,current_run,c,0,1200] = estimated_dir.shape[0]
-                                
-    np.save(folder+'//big_matrix.npy', big_matrix)                           
-    return big_matrix
+                            yield (i, j, k, current_run, c), folder7
+
+def AnalyseResultsPybullet():
+    
+    #----- Collects all the runs once into the results store, which replaces the
+    # former dense big_matrix. It is indexed the same way by task1 -----
+    
+    print("Collect the data...")
+    
+    store = ingest_runs(ListResultRuns(RESULTS_FOLDER), RESULTS_STORE, num_steps=1200, key_shape=RESULTS_KEY_SHAPE)
+    
+    print("Stored "+str(len(store))+" runs in "+RESULTS_STORE)
+    
+    return store
+
+def IsSuccessfulRun(store, key, min_t):
+    
+    #----- Runs saved with an outcome are classified by it, e.g. a run that was
+    # stopped at the joint limit is successful although it is shorter than min_t.
+    # Runs saved without an outcome are classified by their length -----
+    
+    outcome = store.get_outcome(key)
+    
+    if outcome >= 0:
+        return OUTCOMES[outcome] in SUCCESSFUL_OUTCOMES
+    
+    return store[tuple(key) + (0, store.num_steps)] >= min_t
+
+def MaskPadding(run):
+    
+    #----- Copy of a run in the layout of the store (features x num_steps+1) with
+    # the ticks after the end of the run set to NaN, so that the nan-aware
+    # statistics of task1 only use the actual ticks of every run -----
+    
+    num_steps = run.shape[1] - 1
+    length = int(run[0, num_steps])
+    
+    run = np.array(run, dtype=np.float64)
+    run[:, length:num_steps] = np.nan
+    
+    return run
 
-def task1(big_matrix):
+def EndWindow(mat, width):
+    
+    #----- The last 'width' ticks of every run, i.e. of every row of mat, which
+    # is NaN after the end of the run -----
+    
+    if np.ndim(mat) < 2:
+        return np.zeros((0, width))
+    
+    out = np.full((mat.shape[0], width), np.nan)
+    
+    for r in range(mat.shape[0]):
+        
+        valid = mat[r][~np.isnan(mat[r])][-width:]
+        
+        if len(valid) > 0:
+            out[r, width-len(valid):] = valid
+    
+    return out
+
+def task1(big_matrix, num_workers=None, use_cache=True):
     
     print("Analysing...")
+    
+    #----- Runs that were stopped early are NaN after their end, ticks that no
+    # run reached give empty slices -----
+    
+    warnings.filterwarnings("ignore", message="Mean of empty slice")
+    warnings.filterwarnings("ignore", message="Degrees of freedom <= 0 for slice")
 
     list_of_names = ['Dishwasher','Drawer','Room Door','Sliding door', 'Sliding lid']
     list_of_criteria = ['Beta','c1c2','f','m', 'Nominal model']
@@ -173,13 +217,13 @@ def task1(big_matrix):
     
     matrix1complete=np.zeros((2,7,2))
     
-    fig1, (ax1_1, ax1_2) = plt.subplots(2,1,figsize=(10,10), constrained_layout=True)
+    fig1, (ax1_1, ax1_2) = figure_subplots(2,1,figsize=(10,10), constrained_layout=True)
     
-    fig21, (ax21_1, ax21_2, ax21_3) = plt.subplots(3,1,figsize=(15,15), constrained_layout=True)
-    fig22, (ax22_1, ax22_2, ax22_3) = plt.subplots(3,1,figsize=(15,15), constrained_layout=True)
+    fig21, (ax21_1, ax21_2, ax21_3) = figure_subplots(3,1,figsize=(15,15), constrained_layout=True)
+    fig22, (ax22_1, ax22_2, ax22_3) = figure_subplots(3,1,figsize=(15,15), constrained_layout=True)
        
-    fig31, (ax31_1, ax31_2, ax31_3) = plt.subplots(3,1,figsize=(15,15), constrained_layout=True)
-    fig32, (ax32_1, ax32_2, ax32_3) = plt.subplots(3,1,figsize=(15,15), constrained_layout=True)
+    fig31, (ax31_1, ax31_2, ax31_3) = figure_subplots(3,1,figsize=(15,15), constrained_layout=True)
+    fig32, (ax32_1, ax32_2, ax32_3) = figure_subplots(3,1,figsize=(15,15), constrained_layout=True)
     
 #    fig21, (ax21_1, ax21_2) = plt.subplots(2,1,figsize=(15,15), constrained_layout=True)
 #    fig22, (ax22_1, ax22_2) = plt.subplots(2,1,figsize=(15,15), constrained_layout=True)
@@ -192,29 +236,29 @@ def task1(big_matrix):
     ax22_1_2 = ax22_1.twinx()
     ax32_1_2 = ax32_1.twinx()  
         
-    fig4, (ax4_1, ax4_2, ax4_3, ax4_4) = plt.subplots(4,1,figsize=(15,15), constrained_layout=True)         #velocity mobile drawer
-    fig5, (ax5_1, ax5_2, ax5_3, ax5_4) = plt.subplots(4,1,figsize=(15,15), constrained_layout=True)         #velocity mobile room door 
+    fig4, (ax4_1, ax4_2, ax4_3, ax4_4) = figure_subplots(4,1,figsize=(15,15), constrained_layout=True)         #velocity mobile drawer
+    fig5, (ax5_1, ax5_2, ax5_3, ax5_4) = figure_subplots(4,1,figsize=(15,15), constrained_layout=True)         #velocity mobile room door 
     
-    fig6, (ax6_1, ax6_2, ax6_3) = plt.subplots(3,1,figsize=(15,15), constrained_layout=True)                #position all doors
-    fig7, (ax7_1, ax7_2, ax7_3) = plt.subplots(3,1,figsize=(15,15), constrained_layout=True)                #position all doors
+    fig6, (ax6_1, ax6_2, ax6_3) = figure_subplots(3,1,figsize=(15,15), constrained_layout=True)                #position all doors
+    fig7, (ax7_1, ax7_2, ax7_3) = figure_subplots(3,1,figsize=(15,15), constrained_layout=True)                #position all doors
     
-    fig8, (ax8_1, ax8_2) = plt.subplots(2,1,figsize=(15,15), constrained_layout=True)                       #plots for m drawer
-    fig9, (ax9_1, ax9_2) = plt.subplots(2,1,figsize=(15,15), constrained_layout=True)                       #plots for m door
+    fig8, (ax8_1, ax8_2) = figure_subplots(2,1,figsize=(15,15), constrained_layout=True)                       #plots for m drawer
+    fig9, (ax9_1, ax9_2) = figure_subplots(2,1,figsize=(15,15), constrained_layout=True)                       #plots for m door
     
-    fig10, (ax10_1, ax10_2) = plt.subplots(2,1,figsize=(15,15), constrained_layout=True)                       #plots for b drawer
-    fig11, (ax11_1, ax11_2) = plt.subplots(2,1,figsize=(15,15), constrained_layout=True)                       #plots for b door    
+    fig10, (ax10_1, ax10_2) = figure_subplots(2,1,figsize=(15,15), constrained_layout=True)                       #plots for b drawer
+    fig11, (ax11_1, ax11_2) = figure_subplots(2,1,figsize=(15,15), constrained_layout=True)                       #plots for b door    
 
-    fig12, (ax12_1, ax12_2) = plt.subplots(2,1,figsize=(15,15), constrained_layout=True)                       #plots for f drawer
-    fig13, (ax13_1, ax13_2) = plt.subplots(2,1,figsize=(15,15), constrained_layout=True)                       #plots for f door
+    fig12, (ax12_1, ax12_2) = figure_subplots(2,1,figsize=(15,15), constrained_layout=True)                       #plots for f drawer
+    fig13, (ax13_1, ax13_2) = figure_subplots(2,1,figsize=(15,15), constrained_layout=True)                       #plots for f door
 
-    fig14, (ax14_1, ax14_2) = plt.subplots(2,1,figsize=(15,15), constrained_layout=True)                       #plots for c1c12 drawer
-    fig15, (ax15_1, ax15_2) = plt.subplots(2,1,figsize=(15,15), constrained_layout=True)                       #plots for c1c2 door
+    fig14, (ax14_1, ax14_2) = figure_subplots(2,1,figsize=(15,15), constrained_layout=True)                       #plots for c1c12 drawer
+    fig15, (ax15_1, ax15_2) = figure_subplots(2,1,figsize=(15,15), constrained_layout=True)                       #plots for c1c2 door
     
-    fig16, (ax16_1, ax16_2, ax16_3) = plt.subplots(3,1,figsize=(15,15), constrained_layout=True) 
+    fig16, (ax16_1, ax16_2, ax16_3) = figure_subplots(3,1,figsize=(15,15), constrained_layout=True) 
     #fig16, (ax16_1, ax16_2) = plt.subplots(2,1,figsize=(15,15), constrained_layout=True) 
     ax16_1_2 = ax16_1.twinx()
 
-    fig17, (ax17_1, ax17_2, ax17_3) = plt.subplots(3,1,figsize=(15,15), constrained_layout=True)                       #complete mobile   
+    fig17, (ax17_1, ax17_2, ax17_3) = figure_subplots(3,1,figsize=(15,15), constrained_layout=True)                       #complete mobile   
     #fig17, (ax17_1, ax17_2) = plt.subplots(2,1,figsize=(15,15), constrained_layout=True) 
     ax17_1_2 = ax17_1.twinx()
     
@@ -316,63 +360,63 @@ def task1(big_matrix):
                 
                 current_run = np.squeeze(big_matrix[i, 4, 0, br, c, :, :])
                 
-                if big_matrix[i, 4, 0, br, c, 0, 1200]<min_t:
+                if not IsSuccessfulRun(big_matrix, (i, 4, 0, br, c), min_t):
                     
                     n_bad_runs+=1
                     
                 else:
                     
-                    list_of_good_runs.append(current_run)
+                    list_of_good_runs.append(MaskPadding(current_run))
                     
                 if c==0 or c==2:
                     #-----    
                     current_runb1 = np.squeeze(big_matrix[i, 0, 0, br, c, :, :])                
-                    if big_matrix[i, 0, 0, br, c, 0, 1200]<min_t:                    
+                    if not IsSuccessfulRun(big_matrix, (i, 0, 0, br, c), min_t):                    
                         n_bad_runsb1+=1                    
                     else:                    
-                        list_of_good_runsb1.append(current_runb1)               
+                        list_of_good_runsb1.append(MaskPadding(current_runb1))               
     
                     current_runb2 = np.squeeze(big_matrix[i, 0,1, br, c, :, :])                
-                    if big_matrix[i, 0, 1, br, c, 0, 1200]<min_t:                    
+                    if not IsSuccessfulRun(big_matrix, (i, 0, 1, br, c), min_t):                    
                         n_bad_runsb2+=1                    
                     else:                    
-                        list_of_good_runsb2.append(current_runb2)
+                        list_of_good_runsb2.append(MaskPadding(current_runb2))
                     #-----
                     current_runratio1 = np.squeeze(big_matrix[i, 1, 0, br, c, :, :])                
-                    if big_matrix[i, 1, 0, br, c, 0, 1200]<min_t:                    
+                    if not IsSuccessfulRun(big_matrix, (i, 1, 0, br, c), min_t):                    
                         n_bad_runsratio1+=1                    
                     else:                    
-                        list_of_good_runsratio1.append(current_runratio1)
+                        list_of_good_runsratio1.append(MaskPadding(current_runratio1))
     
                     current_runratio2 = np.squeeze(big_matrix[i, 1, 1, br, c, :, :])                
-                    if big_matrix[i, 1, 1, br, c, 0, 1200]<min_t:                    
+                    if not IsSuccessfulRun(big_matrix, (i, 1, 1, br, c), min_t):                    
                         n_bad_runsratio2+=1                    
                     else:                    
-                        list_of_good_runsratio2.append(current_runratio2)
+                        list_of_good_runsratio2.append(MaskPadding(current_runratio2))
                     #-----
                     current_runf1 = np.squeeze(big_matrix[i, 2, 0, br, c, :, :])                
-                    if big_matrix[i, 2, 0, br, c, 0, 1200]<min_t:                    
+                    if not IsSuccessfulRun(big_matrix, (i, 2, 0, br, c), min_t):                    
                         n_bad_runsf1+=1                    
                     else:                    
-                        list_of_good_runsf1.append(current_runf1)               
+                        list_of_good_runsf1.append(MaskPadding(current_runf1))               
     
                     current_runf2 = np.squeeze(big_matrix[i, 2,1, br, c, :, :])                
-                    if big_matrix[i, 2, 1, br, c, 0, 1200]<min_t:                    
+                    if not IsSuccessfulRun(big_matrix, (i, 2, 1, br, c), min_t):                    
                         n_bad_runsf2+=1                    
                     else:                    
-                        list_of_good_runsf2.append(current_runf2) 
+                        list_of_good_runsf2.append(MaskPadding(current_runf2)) 
                     #-----
                     current_runm1 = np.squeeze(big_matrix[i, 3, 0, br, c, :, :])                
-                    if big_matrix[i, 3, 0, br, c, 0, 1200]<min_t:                    
+                    if not IsSuccessfulRun(big_matrix, (i, 3, 0, br, c), min_t):                    
                         n_bad_runsm1+=1                    
                     else:                    
-                        list_of_good_runsm1.append(current_runm1)               
+                        list_of_good_runsm1.append(MaskPadding(current_runm1))               
     
                     current_runm2 = np.squeeze(big_matrix[i, 3,1, br, c, :, :])                
-                    if big_matrix[i, 3, 1, br, c, 0, 1200]<min_t:                    
+                    if not IsSuccessfulRun(big_matrix, (i, 3, 1, br, c), min_t):                    
                         n_bad_runsm2+=1                    
                     else:                    
-                        list_of_good_runsm2.append(current_runm2) 
+                        list_of_good_runsm2.append(MaskPadding(current_runm2)) 
                     #-----
                     if i==1 or i==2:
                         
@@ -383,10 +427,10 @@ def task1(big_matrix):
                         
                         current_runcomplete = np.squeeze(big_matrix[i, 5, 0, br, cpom, :, :]) 
                         
-                        if big_matrix[i, 5, 0, br, cpom, 0, 1200]<min_t or big_matrix[i, 5, 0, br, cpom, 0, 600]<0.5:                    
+                        if not IsSuccessfulRun(big_matrix, (i, 5, 0, br, cpom), min_t) or MaskPadding(current_runcomplete)[0, 600]<0.5:                    
                             n_bad_runscomplete+=1                    
                         else:                    
-                            list_of_good_runscomplete.append(current_runcomplete) 
+                            list_of_good_runscomplete.append(MaskPadding(current_runcomplete)) 
                         
             n_good = len(list_of_good_runs)
             
@@ -551,31 +595,31 @@ def task1(big_matrix):
             start_average_dot1_mat = np.ones((start_average_dot1_mat.shape[0], start_average_dot1_mat.shape[1]))-start_average_dot1_mat
             start_average_dot1_mat = np.multiply(start_average_dot1_mat, start_average_dot1_mat)
                 
-            start_average_dot1_mean = np.mean(start_average_dot1_mat, axis=1)
+            start_average_dot1_mean = np.nanmean(start_average_dot1_mat, axis=1)
             start_average_dot1_mean = np.sqrt(start_average_dot1_mean)
             
-            start_average_dot1 = np.mean(np.squeeze(start_average_dot1_mean))
+            start_average_dot1 = np.nanmean(np.squeeze(start_average_dot1_mean))
             
             whole_average_dot1_mat = np.array(dot_product_mat)
 
-            whole_average_dot1_mean = np.mean(whole_average_dot1_mat, axis=0)
-            whole_average_dot1 = np.mean(np.squeeze(whole_average_dot1_mean))
+            whole_average_dot1_mean = np.nanmean(whole_average_dot1_mat, axis=0)
+            whole_average_dot1 = np.nanmean(np.squeeze(whole_average_dot1_mean))
             
             whole_average_manip1_mat = np.array(manipulability_mat)
             
-            whole_average_manip1_mean = np.mean(whole_average_manip1_mat, axis=0)
-            whole_average_manip1 = np.mean(np.squeeze(whole_average_manip1_mean))
+            whole_average_manip1_mean = np.nanmean(whole_average_manip1_mat, axis=0)
+            whole_average_manip1 = np.nanmean(np.squeeze(whole_average_manip1_mean))
             
             end_average_manip1_mat = np.array(manipulability_mat)
-            end_average_manip1_mat = end_average_manip1_mat[:, min_t-20:]
+            end_average_manip1_mat = EndWindow(end_average_manip1_mat, 20)
             
-            end_average_manip1_mean = np.mean(end_average_manip1_mat, axis=0)
-            end_average_manip1 = np.mean(np.squeeze(end_average_manip1_mean)) 
+            end_average_manip1_mean = np.nanmean(end_average_manip1_mat, axis=0)
+            end_average_manip1 = np.nanmean(np.squeeze(end_average_manip1_mean)) 
             
             total_planning_time1_mat = np.array(planning_time_mat)
-            total_planning_time1 = np.sum(np.mean(total_planning_time1_mat, axis=0))
+            total_planning_time1 = np.nanmean(np.nansum(total_planning_time1_mat, axis=1))
             
-            average_planning_time1 = np.mean(np.mean(total_planning_time1_mat, axis=0))
+            average_planning_time1 = np.nanmean(np.nanmean(total_planning_time1_mat, axis=0))
             
             if c==0 or c==2:
                 
@@ -591,198 +635,198 @@ def task1(big_matrix):
                     start_average_dot1b1_mat = start_average_dot1b1_mat[:,:initL]                   
                     start_average_dot1b1_mat = np.ones((start_average_dot1b1_mat.shape[0], start_average_dot1b1_mat.shape[1]))-start_average_dot1b1_mat
                     start_average_dot1b1_mat = np.multiply(start_average_dot1b1_mat, start_average_dot1b1_mat)                    
-                    start_average_dot1b1_mean = np.mean(start_average_dot1b1_mat, axis=1)
+                    start_average_dot1b1_mean = np.nanmean(start_average_dot1b1_mat, axis=1)
                     start_average_dot1b1_mean = np.sqrt(start_average_dot1b1_mean)                
-                    start_average_dot1b1 = np.mean(np.squeeze(start_average_dot1b1_mean))                
+                    start_average_dot1b1 = np.nanmean(np.squeeze(start_average_dot1b1_mean))                
                     whole_average_dot1b1_mat = np.array(dot_productb1_mat)    
-                    whole_average_dot1b1_mean = np.mean(whole_average_dot1b1_mat, axis=0)
-                    whole_average_dot1b1 = np.mean(np.squeeze(whole_average_dot1b1_mean))                
+                    whole_average_dot1b1_mean = np.nanmean(whole_average_dot1b1_mat, axis=0)
+                    whole_average_dot1b1 = np.nanmean(np.squeeze(whole_average_dot1b1_mean))                
                     whole_average_manip1b1_mat = np.array(manipulabilityb1_mat)                
-                    whole_average_manip1b1_mean = np.mean(whole_average_manip1b1_mat, axis=0)
-                    whole_average_manip1b1 = np.mean(np.squeeze(whole_average_manip1b1_mean))                
+                    whole_average_manip1b1_mean = np.nanmean(whole_average_manip1b1_mat, axis=0)
+                    whole_average_manip1b1 = np.nanmean(np.squeeze(whole_average_manip1b1_mean))                
                     end_average_manip1b1_mat = np.array(manipulabilityb1_mat)
-                    end_average_manip1b1_mat = end_average_manip1b1_mat[:, min_t-20:]                
-                    end_average_manip1b1_mean = np.mean(end_average_manip1b1_mat, axis=0)
-                    end_average_manip1b1 = np.mean(np.squeeze(end_average_manip1b1_mean))                
+                    end_average_manip1b1_mat = EndWindow(end_average_manip1b1_mat, 20)                
+                    end_average_manip1b1_mean = np.nanmean(end_average_manip1b1_mat, axis=0)
+                    end_average_manip1b1 = np.nanmean(np.squeeze(end_average_manip1b1_mean))                
                     total_planning_time1b1_mat = np.array(planning_timeb1_mat)
-                    total_planning_time1b1 = np.sum(np.mean(total_planning_time1b1_mat, axis=0))                
-                    average_planning_time1b1 = np.mean(np.mean(total_planning_time1b1_mat, axis=0))
+                    total_planning_time1b1 = np.nanmean(np.nansum(total_planning_time1b1_mat, axis=1))                
+                    average_planning_time1b1 = np.nanmean(np.nanmean(total_planning_time1b1_mat, axis=0))
     
                     #-----
                     start_average_dot1b2_mat = np.array(dot_productb2_mat)
                     start_average_dot1b2_mat = start_average_dot1b2_mat[:,:initL]                   
                     start_average_dot1b2_mat = np.ones((start_average_dot1b2_mat.shape[0], start_average_dot1b2_mat.shape[1]))-start_average_dot1b2_mat
                     start_average_dot1b2_mat = np.multiply(start_average_dot1b2_mat, start_average_dot1b2_mat)                    
-                    start_average_dot1b2_mean = np.mean(start_average_dot1b2_mat, axis=1)
+                    start_average_dot1b2_mean = np.nanmean(start_average_dot1b2_mat, axis=1)
                     start_average_dot1b2_mean = np.sqrt(start_average_dot1b2_mean)                
-                    start_average_dot1b2 = np.mean(np.squeeze(start_average_dot1b2_mean))                
+                    start_average_dot1b2 = np.nanmean(np.squeeze(start_average_dot1b2_mean))                
                     whole_average_dot1b2_mat = np.array(dot_productb2_mat)    
-                    whole_average_dot1b2_mean = np.mean(whole_average_dot1b2_mat, axis=0)
-                    whole_average_dot1b2 = np.mean(np.squeeze(whole_average_dot1b2_mean))                
+                    whole_average_dot1b2_mean = np.nanmean(whole_average_dot1b2_mat, axis=0)
+                    whole_average_dot1b2 = np.nanmean(np.squeeze(whole_average_dot1b2_mean))                
                     whole_average_manip1b2_mat = np.array(manipulabilityb2_mat)                
-                    whole_average_manip1b2_mean = np.mean(whole_average_manip1b2_mat, axis=0)
-                    whole_average_manip1b2 = np.mean(np.squeeze(whole_average_manip1b2_mean))                
+                    whole_average_manip1b2_mean = np.nanmean(whole_average_manip1b2_mat, axis=0)
+                    whole_average_manip1b2 = np.nanmean(np.squeeze(whole_average_manip1b2_mean))                
                     end_average_manip1b2_mat = np.array(manipulabilityb2_mat)
-                    end_average_manip1b2_mat = end_average_manip1b2_mat[:, min_t-20:]                
-                    end_average_manip1b2_mean = np.mean(end_average_manip1b2_mat, axis=0)
-                    end_average_manip1b2 = np.mean(np.squeeze(end_average_manip1b2_mean))                
+                    end_average_manip1b2_mat = EndWindow(end_average_manip1b2_mat, 20)                
+                    end_average_manip1b2_mean = np.nanmean(end_average_manip1b2_mat, axis=0)
+                    end_average_manip1b2 = np.nanmean(np.squeeze(end_average_manip1b2_mean))                
                     total_planning_time1b2_mat = np.array(planning_timeb2_mat)
-                    total_planning_time1b2 = np.sum(np.mean(total_planning_time1b2_mat, axis=0))                
-                    average_planning_time1b2 = np.mean(np.mean(total_planning_time1b2_mat, axis=0))
+                    total_planning_time1b2 = np.nanmean(np.nansum(total_planning_time1b2_mat, axis=1))                
+                    average_planning_time1b2 = np.nanmean(np.nanmean(total_planning_time1b2_mat, axis=0))
     
                     #-----
                     start_average_dot1ratio1_mat = np.array(dot_productratio1_mat)
                     start_average_dot1ratio1_mat = start_average_dot1ratio1_mat[:,:initL]                   
                     start_average_dot1ratio1_mat = np.ones((start_average_dot1ratio1_mat.shape[0], start_average_dot1ratio1_mat.shape[1]))-start_average_dot1ratio1_mat
                     start_average_dot1ratio1_mat = np.multiply(start_average_dot1ratio1_mat, start_average_dot1ratio1_mat)                    
-                    start_average_dot1ratio1_mean = np.mean(start_average_dot1ratio1_mat, axis=1)
+                    start_average_dot1ratio1_mean = np.nanmean(start_average_dot1ratio1_mat, axis=1)
                     start_average_dot1ratio1_mean = np.sqrt(start_average_dot1ratio1_mean)                
-                    start_average_dot1ratio1 = np.mean(np.squeeze(start_average_dot1ratio1_mean))                
+                    start_average_dot1ratio1 = np.nanmean(np.squeeze(start_average_dot1ratio1_mean))                
                     whole_average_dot1ratio1_mat = np.array(dot_productratio1_mat)    
-                    whole_average_dot1ratio1_mean = np.mean(whole_average_dot1ratio1_mat, axis=0)
-                    whole_average_dot1ratio1 = np.mean(np.squeeze(whole_average_dot1ratio1_mean))                
+                    whole_average_dot1ratio1_mean = np.nanmean(whole_average_dot1ratio1_mat, axis=0)
+                    whole_average_dot1ratio1 = np.nanmean(np.squeeze(whole_average_dot1ratio1_mean))                
                     whole_average_manip1ratio1_mat = np.array(manipulabilityratio1_mat)                
-                    whole_average_manip1ratio1_mean = np.mean(whole_average_manip1ratio1_mat, axis=0)
-                    whole_average_manip1ratio1 = np.mean(np.squeeze(whole_average_manip1ratio1_mean))                
+                    whole_average_manip1ratio1_mean = np.nanmean(whole_average_manip1ratio1_mat, axis=0)
+                    whole_average_manip1ratio1 = np.nanmean(np.squeeze(whole_average_manip1ratio1_mean))                
                     end_average_manip1ratio1_mat = np.array(manipulabilityratio1_mat)
-                    end_average_manip1ratio1_mat = end_average_manip1ratio1_mat[:, min_t-20:]                
-                    end_average_manip1ratio1_mean = np.mean(end_average_manip1ratio1_mat, axis=0)
-                    end_average_manip1ratio1 = np.mean(np.squeeze(end_average_manip1ratio1_mean))                
+                    end_average_manip1ratio1_mat = EndWindow(end_average_manip1ratio1_mat, 20)                
+                    end_average_manip1ratio1_mean = np.nanmean(end_average_manip1ratio1_mat, axis=0)
+                    end_average_manip1ratio1 = np.nanmean(np.squeeze(end_average_manip1ratio1_mean))                
                     total_planning_time1ratio1_mat = np.array(planning_timeratio1_mat)
-                    total_planning_time1ratio1 = np.sum(np.mean(total_planning_time1ratio1_mat, axis=0))                
-                    average_planning_time1ratio1 = np.mean(np.mean(total_planning_time1ratio1_mat, axis=0))
+                    total_planning_time1ratio1 = np.nanmean(np.nansum(total_planning_time1ratio1_mat, axis=1))                
+                    average_planning_time1ratio1 = np.nanmean(np.nanmean(total_planning_time1ratio1_mat, axis=0))
     
                     #-----
                     start_average_dot1ratio2_mat = np.array(dot_productratio2_mat)
                     start_average_dot1ratio2_mat = start_average_dot1ratio2_mat[:,:initL]                   
                     start_average_dot1ratio2_mat = np.ones((start_average_dot1ratio2_mat.shape[0], start_average_dot1ratio2_mat.shape[1]))-start_average_dot1ratio2_mat
                     start_average_dot1ratio2_mat = np.multiply(start_average_dot1ratio2_mat, start_average_dot1ratio2_mat)                    
-                    start_average_dot1ratio2_mean = np.mean(start_average_dot1ratio2_mat, axis=1)
+                    start_average_dot1ratio2_mean = np.nanmean(start_average_dot1ratio2_mat, axis=1)
                     start_average_dot1ratio2_mean = np.sqrt(start_average_dot1ratio2_mean)                
-                    start_average_dot1ratio2 = np.mean(np.squeeze(start_average_dot1ratio2_mean))                
+                    start_average_dot1ratio2 = np.nanmean(np.squeeze(start_average_dot1ratio2_mean))                
                     whole_average_dot1ratio2_mat = np.array(dot_productratio2_mat)    
-                    whole_average_dot1ratio2_mean = np.mean(whole_average_dot1ratio2_mat, axis=0)
-                    whole_average_dot1ratio2 = np.mean(np.squeeze(whole_average_dot1ratio2_mean))                
+                    whole_average_dot1ratio2_mean = np.nanmean(whole_average_dot1ratio2_mat, axis=0)
+                    whole_average_dot1ratio2 = np.nanmean(np.squeeze(whole_average_dot1ratio2_mean))                
                     whole_average_manip1ratio2_mat = np.array(manipulabilityratio2_mat)                
-                    whole_average_manip1ratio2_mean = np.mean(whole_average_manip1ratio2_mat, axis=0)
-                    whole_average_manip1ratio2 = np.mean(np.squeeze(whole_average_manip1ratio2_mean))                
+                    whole_average_manip1ratio2_mean = np.nanmean(whole_average_manip1ratio2_mat, axis=0)
+                    whole_average_manip1ratio2 = np.nanmean(np.squeeze(whole_average_manip1ratio2_mean))                
                     end_average_manip1ratio2_mat = np.array(manipulabilityratio2_mat)
-                    end_average_manip1ratio2_mat = end_average_manip1ratio2_mat[:, min_t-20:]                
-                    end_average_manip1ratio2_mean = np.mean(end_average_manip1ratio2_mat, axis=0)
-                    end_average_manip1ratio2 = np.mean(np.squeeze(end_average_manip1ratio2_mean))                
+                    end_average_manip1ratio2_mat = EndWindow(end_average_manip1ratio2_mat, 20)                
+                    end_average_manip1ratio2_mean = np.nanmean(end_average_manip1ratio2_mat, axis=0)
+                    end_average_manip1ratio2 = np.nanmean(np.squeeze(end_average_manip1ratio2_mean))                
                     total_planning_time1ratio2_mat = np.array(planning_timeratio2_mat)
-                    total_planning_time1ratio2 = np.sum(np.mean(total_planning_time1ratio2_mat, axis=0))                
-                    average_planning_time1ratio2 = np.mean(np.mean(total_planning_time1ratio2_mat, axis=0))                
+                    total_planning_time1ratio2 = np.nanmean(np.nansum(total_planning_time1ratio2_mat, axis=1))                
+                    average_planning_time1ratio2 = np.nanmean(np.nanmean(total_planning_time1ratio2_mat, axis=0))                
     
                     #-----
                     start_average_dot1m1_mat = np.array(dot_productm1_mat)
                     start_average_dot1m1_mat = start_average_dot1m1_mat[:,:initL]                   
                     start_average_dot1m1_mat = np.ones((start_average_dot1m1_mat.shape[0], start_average_dot1m1_mat.shape[1]))-start_average_dot1m1_mat
                     start_average_dot1m1_mat = np.multiply(start_average_dot1m1_mat, start_average_dot1m1_mat)                    
-                    start_average_dot1m1_mean = np.mean(start_average_dot1m1_mat, axis=1)
+                    start_average_dot1m1_mean = np.nanmean(start_average_dot1m1_mat, axis=1)
                     start_average_dot1m1_mean = np.sqrt(start_average_dot1m1_mean)                
-                    start_average_dot1m1 = np.mean(np.squeeze(start_average_dot1m1_mean))                
+                    start_average_dot1m1 = np.nanmean(np.squeeze(start_average_dot1m1_mean))                
                     whole_average_dot1m1_mat = np.array(dot_productm1_mat)    
-                    whole_average_dot1m1_mean = np.mean(whole_average_dot1m1_mat, axis=0)
-                    whole_average_dot1m1 = np.mean(np.squeeze(whole_average_dot1m1_mean))                
+                    whole_average_dot1m1_mean = np.nanmean(whole_average_dot1m1_mat, axis=0)
+                    whole_average_dot1m1 = np.nanmean(np.squeeze(whole_average_dot1m1_mean))                
                     whole_average_manip1m1_mat = np.array(manipulabilitym1_mat)                
-                    whole_average_manip1m1_mean = np.mean(whole_average_manip1m1_mat, axis=0)
-                    whole_average_manip1m1 = np.mean(np.squeeze(whole_average_manip1m1_mean))                
+                    whole_average_manip1m1_mean = np.nanmean(whole_average_manip1m1_mat, axis=0)
+                    whole_average_manip1m1 = np.nanmean(np.squeeze(whole_average_manip1m1_mean))                
                     end_average_manip1m1_mat = np.array(manipulabilitym1_mat)
-                    end_average_manip1m1_mat = end_average_manip1m1_mat[:, min_t-20:]                
-                    end_average_manip1m1_mean = np.mean(end_average_manip1m1_mat, axis=0)
-                    end_average_manip1m1 = np.mean(np.squeeze(end_average_manip1m1_mean))                
+                    end_average_manip1m1_mat = EndWindow(end_average_manip1m1_mat, 20)                
+                    end_average_manip1m1_mean = np.nanmean(end_average_manip1m1_mat, axis=0)
+                    end_average_manip1m1 = np.nanmean(np.squeeze(end_average_manip1m1_mean))                
                     total_planning_time1m1_mat = np.array(planning_timem1_mat)
-                    total_planning_time1m1 = np.sum(np.mean(total_planning_time1m1_mat, axis=0))                
-                    average_planning_time1m1 = np.mean(np.mean(total_planning_time1m1_mat, axis=0))
+                    total_planning_time1m1 = np.nanmean(np.nansum(total_planning_time1m1_mat, axis=1))                
+                    average_planning_time1m1 = np.nanmean(np.nanmean(total_planning_time1m1_mat, axis=0))
                     
                     #-----
                     start_average_dot1m2_mat = np.array(dot_productm2_mat)
                     start_average_dot1m2_mat = start_average_dot1m2_mat[:,:initL]                   
                     start_average_dot1m2_mat = np.ones((start_average_dot1m2_mat.shape[0], start_average_dot1m2_mat.shape[1]))-start_average_dot1m2_mat
                     start_average_dot1m2_mat = np.multiply(start_average_dot1m2_mat, start_average_dot1m2_mat)                    
-                    start_average_dot1m2_mean = np.mean(start_average_dot1m2_mat, axis=1)
+                    start_average_dot1m2_mean = np.nanmean(start_average_dot1m2_mat, axis=1)
                     start_average_dot1m2_mean = np.sqrt(start_average_dot1m2_mean)                
-                    start_average_dot1m2 = np.mean(np.squeeze(start_average_dot1m2_mean))                
+                    start_average_dot1m2 = np.nanmean(np.squeeze(start_average_dot1m2_mean))                
                     whole_average_dot1m2_mat = np.array(dot_productm2_mat)    
-                    whole_average_dot1m2_mean = np.mean(whole_average_dot1m2_mat, axis=0)
-                    whole_average_dot1m2 = np.mean(np.squeeze(whole_average_dot1m2_mean))                
+                    whole_average_dot1m2_mean = np.nanmean(whole_average_dot1m2_mat, axis=0)
+                    whole_average_dot1m2 = np.nanmean(np.squeeze(whole_average_dot1m2_mean))                
                     whole_average_manip1m2_mat = np.array(manipulabilitym2_mat)                
-                    whole_average_manip1m2_mean = np.mean(whole_average_manip1m2_mat, axis=0)
-                    whole_average_manip1m2 = np.mean(np.squeeze(whole_average_manip1m2_mean))                
+                    whole_average_manip1m2_mean = np.nanmean(whole_average_manip1m2_mat, axis=0)
+                    whole_average_manip1m2 = np.nanmean(np.squeeze(whole_average_manip1m2_mean))                
                     end_average_manip1m2_mat = np.array(manipulabilitym2_mat)
-                    end_average_manip1m2_mat = end_average_manip1m2_mat[:, min_t-20:]                
-                    end_average_manip1m2_mean = np.mean(end_average_manip1m2_mat, axis=0)
-                    end_average_manip1m2 = np.mean(np.squeeze(end_average_manip1m2_mean))                
+                    end_average_manip1m2_mat = EndWindow(end_average_manip1m2_mat, 20)                
+                    end_average_manip1m2_mean = np.nanmean(end_average_manip1m2_mat, axis=0)
+                    end_average_manip1m2 = np.nanmean(np.squeeze(end_average_manip1m2_mean))                
                     total_planning_time1m2_mat = np.array(planning_timem2_mat)
-                    total_planning_time1m2 = np.sum(np.mean(total_planning_time1m2_mat, axis=0))                
-                    average_planning_time1m2 = np.mean(np.mean(total_planning_time1m2_mat, axis=0))
+                    total_planning_time1m2 = np.nanmean(np.nansum(total_planning_time1m2_mat, axis=1))                
+                    average_planning_time1m2 = np.nanmean(np.nanmean(total_planning_time1m2_mat, axis=0))
                     
                     #-----
                     start_average_dot1f1_mat = np.array(dot_productf1_mat)
                     start_average_dot1f1_mat = start_average_dot1f1_mat[:,:initL]                   
                     start_average_dot1f1_mat = np.ones((start_average_dot1f1_mat.shape[0], start_average_dot1f1_mat.shape[1]))-start_average_dot1f1_mat
                     start_average_dot1f1_mat = np.multiply(start_average_dot1f1_mat, start_average_dot1f1_mat)                    
-                    start_average_dot1f1_mean = np.mean(start_average_dot1f1_mat, axis=1)
+                    start_average_dot1f1_mean = np.nanmean(start_average_dot1f1_mat, axis=1)
                     start_average_dot1f1_mean = np.sqrt(start_average_dot1f1_mean)                
-                    start_average_dot1f1 = np.mean(np.squeeze(start_average_dot1f1_mean))                
+                    start_average_dot1f1 = np.nanmean(np.squeeze(start_average_dot1f1_mean))                
                     whole_average_dot1f1_mat = np.array(dot_productf1_mat)    
-                    whole_average_dot1f1_mean = np.mean(whole_average_dot1f1_mat, axis=0)
-                    whole_average_dot1f1 = np.mean(np.squeeze(whole_average_dot1f1_mean))                
+                    whole_average_dot1f1_mean = np.nanmean(whole_average_dot1f1_mat, axis=0)
+                    whole_average_dot1f1 = np.nanmean(np.squeeze(whole_average_dot1f1_mean))                
                     whole_average_manip1f1_mat = np.array(manipulabilityf1_mat)                
-                    whole_average_manip1f1_mean = np.mean(whole_average_manip1f1_mat, axis=0)
-                    whole_average_manip1f1 = np.mean(np.squeeze(whole_average_manip1f1_mean))                
+                    whole_average_manip1f1_mean = np.nanmean(whole_average_manip1f1_mat, axis=0)
+                    whole_average_manip1f1 = np.nanmean(np.squeeze(whole_average_manip1f1_mean))                
                     end_average_manip1f1_mat = np.array(manipulabilityf1_mat)
-                    end_average_manip1f1_mat = end_average_manip1f1_mat[:, min_t-20:]                
-                    end_average_manip1f1_mean = np.mean(end_average_manip1f1_mat, axis=0)
-                    end_average_manip1f1 = np.mean(np.squeeze(end_average_manip1f1_mean))                
+                    end_average_manip1f1_mat = EndWindow(end_average_manip1f1_mat, 20)                
+                    end_average_manip1f1_mean = np.nanmean(end_average_manip1f1_mat, axis=0)
+                    end_average_manip1f1 = np.nanmean(np.squeeze(end_average_manip1f1_mean))                
                     total_planning_time1f1_mat = np.array(planning_timef1_mat)
-                    total_planning_time1f1 = np.sum(np.mean(total_planning_time1f1_mat, axis=0))                
-                    average_planning_time1f1 = np.mean(np.mean(total_planning_time1f1_mat, axis=0))
+                    total_planning_time1f1 = np.nanmean(np.nansum(total_planning_time1f1_mat, axis=1))                
+                    average_planning_time1f1 = np.nanmean(np.nanmean(total_planning_time1f1_mat, axis=0))
                     
                     #-----
                     start_average_dot1f2_mat = np.array(dot_productf2_mat)
                     start_average_dot1f2_mat = start_average_dot1f2_mat[:,:initL]                   
                     start_average_dot1f2_mat = np.ones((start_average_dot1f2_mat.shape[0], start_average_dot1f2_mat.shape[1]))-start_average_dot1f2_mat
                     start_average_dot1f2_mat = np.multiply(start_average_dot1f2_mat, start_average_dot1f2_mat)                    
-                    start_average_dot1f2_mean = np.mean(start_average_dot1f2_mat, axis=1)
+                    start_average_dot1f2_mean = np.nanmean(start_average_dot1f2_mat, axis=1)
                     start_average_dot1f2_mean = np.sqrt(start_average_dot1f2_mean)                
-                    start_average_dot1f2 = np.mean(np.squeeze(start_average_dot1f2_mean))                
+                    start_average_dot1f2 = np.nanmean(np.squeeze(start_average_dot1f2_mean))                
                     whole_average_dot1f2_mat = np.array(dot_productf2_mat)    
-                    whole_average_dot1f2_mean = np.mean(whole_average_dot1f2_mat, axis=0)
-                    whole_average_dot1f2 = np.mean(np.squeeze(whole_average_dot1f2_mean))                
+                    whole_average_dot1f2_mean = np.nanmean(whole_average_dot1f2_mat, axis=0)
+                    whole_average_dot1f2 = np.nanmean(np.squeeze(whole_average_dot1f2_mean))                
                     whole_average_manip1f2_mat = np.array(manipulabilityf2_mat)                
-                    whole_average_manip1f2_mean = np.mean(whole_average_manip1f2_mat, axis=0)
-                    whole_average_manip1f2 = np.mean(np.squeeze(whole_average_manip1f2_mean))                
+                    whole_average_manip1f2_mean = np.nanmean(whole_average_manip1f2_mat, axis=0)
+                    whole_average_manip1f2 = np.nanmean(np.squeeze(whole_average_manip1f2_mean))                
                     end_average_manip1f2_mat = np.array(manipulabilityf2_mat)
-                    end_average_manip1f2_mat = end_average_manip1f2_mat[:, min_t-20:]                
-                    end_average_manip1f2_mean = np.mean(end_average_manip1f2_mat, axis=0)
-                    end_average_manip1f2 = np.mean(np.squeeze(end_average_manip1f2_mean))                
+                    end_average_manip1f2_mat = EndWindow(end_average_manip1f2_mat, 20)                
+                    end_average_manip1f2_mean = np.nanmean(end_average_manip1f2_mat, axis=0)
+                    end_average_manip1f2 = np.nanmean(np.squeeze(end_average_manip1f2_mean))                
                     total_planning_time1f2_mat = np.array(planning_timef2_mat)
-                    total_planning_time1f2 = np.sum(np.mean(total_planning_time1f2_mat, axis=0))                
-                    average_planning_time1f2 = np.mean(np.mean(total_planning_time1f2_mat, axis=0))
+                    total_planning_time1f2 = np.nanmean(np.nansum(total_planning_time1f2_mat, axis=1))                
+                    average_planning_time1f2 = np.nanmean(np.nanmean(total_planning_time1f2_mat, axis=0))
 
                     #-----
                     start_average_dot1complete_mat = np.array(dot_productcomplete_mat)
                     start_average_dot1complete_mat = start_average_dot1complete_mat[:,:initL]                   
                     start_average_dot1complete_mat = np.ones((start_average_dot1complete_mat.shape[0], start_average_dot1complete_mat.shape[1]))-start_average_dot1complete_mat
                     start_average_dot1complete_mat = np.multiply(start_average_dot1complete_mat, start_average_dot1complete_mat)                    
-                    start_average_dot1complete_mean = np.mean(start_average_dot1complete_mat, axis=1)
+                    start_average_dot1complete_mean = np.nanmean(start_average_dot1complete_mat, axis=1)
                     start_average_dot1complete_mean = np.sqrt(start_average_dot1complete_mean)                
-                    start_average_dot1complete = np.mean(np.squeeze(start_average_dot1complete_mean))                
+                    start_average_dot1complete = np.nanmean(np.squeeze(start_average_dot1complete_mean))                
                     whole_average_dot1complete_mat = np.array(dot_productcomplete_mat)    
-                    whole_average_dot1complete_mean = np.mean(whole_average_dot1complete_mat, axis=0)
-                    whole_average_dot1complete = np.mean(np.squeeze(whole_average_dot1complete_mean))                
+                    whole_average_dot1complete_mean = np.nanmean(whole_average_dot1complete_mat, axis=0)
+                    whole_average_dot1complete = np.nanmean(np.squeeze(whole_average_dot1complete_mean))                
                     whole_average_manip1complete_mat = np.array(manipulabilitycomplete_mat)                
-                    whole_average_manip1complete_mean = np.mean(whole_average_manip1complete_mat, axis=0)
-                    whole_average_manip1complete = np.mean(np.squeeze(whole_average_manip1complete_mean))                
+                    whole_average_manip1complete_mean = np.nanmean(whole_average_manip1complete_mat, axis=0)
+                    whole_average_manip1complete = np.nanmean(np.squeeze(whole_average_manip1complete_mean))                
                     end_average_manip1complete_mat = np.array(manipulabilitycomplete_mat)
-                    end_average_manip1complete_mat = end_average_manip1complete_mat[:, min_t-20:]                
-                    end_average_manip1complete_mean = np.mean(end_average_manip1complete_mat, axis=0)
-                    end_average_manip1complete = np.mean(np.squeeze(end_average_manip1complete_mean))                
+                    end_average_manip1complete_mat = EndWindow(end_average_manip1complete_mat, 20)                
+                    end_average_manip1complete_mean = np.nanmean(end_average_manip1complete_mat, axis=0)
+                    end_average_manip1complete = np.nanmean(np.squeeze(end_average_manip1complete_mean))                
                     total_planning_time1complete_mat = np.array(planning_timecomplete_mat)
-                    total_planning_time1complete = np.sum(np.mean(total_planning_time1complete_mat, axis=0))                
-                    average_planning_time1complete = np.mean(np.mean(total_planning_time1complete_mat, axis=0))
+                    total_planning_time1complete = np.nanmean(np.nansum(total_planning_time1complete_mat, axis=1))                
+                    average_planning_time1complete = np.nanmean(np.nanmean(total_planning_time1complete_mat, axis=0))
                     
                     if c==0:
                         caux=0
@@ -897,7 +941,7 @@ def task1(big_matrix):
                 
                 ts1 = np.arange(1, min_t+1)
                 if i==1:
-                    ax1_1.plot(ts1, np.squeeze(np.mean(total_planning_time1_mat, axis=0)),'--', label = legend_name, linewidth=2.5)
+                    ax1_1.plot(ts1, np.squeeze(np.nanmean(total_planning_time1_mat, axis=0)),'--', label = legend_name, linewidth=2.5)
                     ax1_1.axvline(x=initL, linewidth=3, color='k', ls='--')
                     ax1_1.grid('on')
                     ax1_1.set_ylabel(r"$\Delta t_{plan}$", fontsize=22)
@@ -908,7 +952,7 @@ def task1(big_matrix):
                     ax1_1.tick_params(axis='both', which='major', labelsize=15)
                     ax1_1.set_title("Drawer mechanism", fontsize=22)
                 if i==2:
-                    ax1_2.plot(ts1, np.squeeze(np.mean(total_planning_time1_mat, axis=0)),'--', label = legend_name, linewidth=2.5)
+                    ax1_2.plot(ts1, np.squeeze(np.nanmean(total_planning_time1_mat, axis=0)),'--', label = legend_name, linewidth=2.5)
                     ax1_2.axvline(x=initL, linewidth=3, color='k', ls='--')
                     ax1_2.grid('on')
                     ax1_2.set_ylabel(r"$\Delta t_{plan}$", fontsize=22)
@@ -922,71 +966,71 @@ def task1(big_matrix):
                     
             vx_mat = np.array(vel_x_meas_mat)
             
-            vx_mat_mean = np.mean(vx_mat, axis=0)
-            vx_mat_std = np.std(vx_mat, axis=0)
+            vx_mat_mean = np.nanmean(vx_mat, axis=0)
+            vx_mat_std = np.nanstd(vx_mat, axis=0)
             vx_mat_upper_limit = vx_mat_mean + 2*vx_mat_std
             vx_mat_lower_limit = vx_mat_mean - 2*vx_mat_std 
 
             vy_mat = np.array(vel_y_meas_mat)
             
-            vy_mat_mean = np.mean(vy_mat, axis=0)
-            vy_mat_std = np.std(vy_mat, axis=0)
+            vy_mat_mean = np.nanmean(vy_mat, axis=0)
+            vy_mat_std = np.nanstd(vy_mat, axis=0)
             vy_mat_upper_limit = vy_mat_mean + 2*vy_mat_std
             vy_mat_lower_limit = vy_mat_mean - 2*vy_mat_std
 
             vz_mat = np.array(vel_z_meas_mat)
             
-            vz_mat_mean = np.mean(vz_mat, axis=0)
-            vz_mat_std = np.std(vz_mat, axis=0)
+            vz_mat_mean = np.nanmean(vz_mat, axis=0)
+            vz_mat_std = np.nanstd(vz_mat, axis=0)
             vz_mat_upper_limit = vz_mat_mean + 2*vz_mat_std
             vz_mat_lower_limit = vz_mat_mean - 2*vz_mat_std
 
             vabs_mat = np.sqrt(np.multiply(vx_mat,vx_mat)+np.multiply(vy_mat,vy_mat)+np.multiply(vz_mat,vz_mat))            
 
-            vabs_mat_mean = np.mean(vabs_mat, axis=0)
-            vabs_mat_std = np.std(vabs_mat, axis=0)
+            vabs_mat_mean = np.nanmean(vabs_mat, axis=0)
+            vabs_mat_std = np.nanstd(vabs_mat, axis=0)
             vabs_mat_upper_limit = vabs_mat_mean + 2*vabs_mat_std
             vabs_mat_lower_limit = vabs_mat_mean - 2*vabs_mat_std
 
             vxdes_mat = np.array(vel_x_des_mat)
             
-            vxdes_mat_mean = np.mean(vxdes_mat, axis=0)
-            vxdes_mat_std = np.std(vxdes_mat, axis=0)
+            vxdes_mat_mean = np.nanmean(vxdes_mat, axis=0)
+            vxdes_mat_std = np.nanstd(vxdes_mat, axis=0)
             vxdes_mat_upper_limit = vxdes_mat_mean + 2*vxdes_mat_std
             vxdes_mat_lower_limit = vxdes_mat_mean - 2*vxdes_mat_std 
 
             vydes_mat = np.array(vel_y_des_mat)
             
-            vydes_mat_mean = np.mean(vydes_mat, axis=0)
-            vydes_mat_std = np.std(vydes_mat, axis=0)
+            vydes_mat_mean = np.nanmean(vydes_mat, axis=0)
+            vydes_mat_std = np.nanstd(vydes_mat, axis=0)
             vydes_mat_upper_limit = vydes_mat_mean + 2*vydes_mat_std
             vydes_mat_lower_limit = vydes_mat_mean - 2*vydes_mat_std
 
             vzdes_mat = np.array(vel_z_des_mat)
             
-            vzdes_mat_mean = np.mean(vzdes_mat, axis=0)
-            vzdes_mat_std = np.std(vzdes_mat, axis=0)
+            vzdes_mat_mean = np.nanmean(vzdes_mat, axis=0)
+            vzdes_mat_std = np.nanstd(vzdes_mat, axis=0)
             vzdes_mat_upper_limit = vzdes_mat_mean + 2*vzdes_mat_std
             vzdes_mat_lower_limit = vzdes_mat_mean - 2*vzdes_mat_std
 
             rex_mat = np.array(rx_mat)
             
-            rex_mat_mean = np.mean(rex_mat, axis=0)
-            rex_mat_std = np.std(rex_mat, axis=0)
+            rex_mat_mean = np.nanmean(rex_mat, axis=0)
+            rex_mat_std = np.nanstd(rex_mat, axis=0)
             rex_mat_upper_limit = rex_mat_mean + 2*rex_mat_std
             rex_mat_lower_limit = rex_mat_mean - 2*rex_mat_std 
 
             rey_mat = np.array(ry_mat)
             
-            rey_mat_mean = np.mean(rey_mat, axis=0)
-            rey_mat_std = np.std(rey_mat, axis=0)
+            rey_mat_mean = np.nanmean(rey_mat, axis=0)
+            rey_mat_std = np.nanstd(rey_mat, axis=0)
             rey_mat_upper_limit = rey_mat_mean + 2*rey_mat_std
             rey_mat_lower_limit = rey_mat_mean - 2*rey_mat_std 
 
             rez_mat = np.array(rz_mat)
             
-            rez_mat_mean = np.mean(rez_mat, axis=0)
-            rez_mat_std = np.std(rez_mat, axis=0)
+            rez_mat_mean = np.nanmean(rez_mat, axis=0)
+            rez_mat_std = np.nanstd(rez_mat, axis=0)
             rez_mat_upper_limit = rez_mat_mean + 2*rez_mat_std
             rez_mat_lower_limit = rez_mat_mean - 2*rez_mat_std 
             
@@ -1163,28 +1207,28 @@ def task1(big_matrix):
 
             Init1_iteration_times = np.array(planning_time_mat)
             
-            Init1_iteration_times_mean = np.mean(Init1_iteration_times, axis=0)
-            Init1_iteration_times_std = np.std(Init1_iteration_times, axis=0)
+            Init1_iteration_times_mean = np.nanmean(Init1_iteration_times, axis=0)
+            Init1_iteration_times_std = np.nanstd(Init1_iteration_times, axis=0)
             Init1_iteration_times_upper_limit = Init1_iteration_times_mean + 2*Init1_iteration_times_std
             Init1_iteration_times_lower_limit = Init1_iteration_times_mean - 2*Init1_iteration_times_std           
                     
             Init1_manipulability = np.array(manipulability_mat)
             
-            Init1_manipulability_mean = np.mean(Init1_manipulability, axis=0)
-            Init1_manipulability_std = np.std(Init1_manipulability, axis=0)
+            Init1_manipulability_mean = np.nanmean(Init1_manipulability, axis=0)
+            Init1_manipulability_std = np.nanstd(Init1_manipulability, axis=0)
             Init1_manipulability_upper_limit = Init1_manipulability_mean + 2*Init1_manipulability_std
             Init1_manipulability_lower_limit = Init1_manipulability_mean - 2*Init1_manipulability_std            
                     
             Init1_dot = np.array(dot_product_mat)
             Init1_ang = np.squeeze(np.arccos(np.array(dot_product_mat)))*180.0/3.14
             
-            Init1_dot_mean = np.mean(Init1_dot, axis=0) 
-            Init1_dot_std = np.std(Init1_dot, axis=0)
+            Init1_dot_mean = np.nanmean(Init1_dot, axis=0) 
+            Init1_dot_std = np.nanstd(Init1_dot, axis=0)
             Init1_dot_upper_limit = Init1_dot_mean + 2*Init1_dot_std
             Init1_dot_lower_limit = Init1_dot_mean - 2*Init1_dot_std 
             
-            Init1_ang_mean = np.mean(Init1_ang, axis=0)
-            Init1_ang_std = np.std(Init1_ang, axis=0)
+            Init1_ang_mean = np.nanmean(Init1_ang, axis=0)
+            Init1_ang_std = np.nanstd(Init1_ang, axis=0)
             Init1_ang_upper_limit = Init1_ang_mean + 2*Init1_ang_std
             Init1_ang_lower_limit = Init1_ang_mean - 2*Init1_ang_std
             
@@ -1196,58 +1240,58 @@ def task1(big_matrix):
 
                 Init1_manipulabilitym1 = np.array(manipulabilitym1_mat)
             
-                Init1_manipulabilitym1_mean = np.mean(Init1_manipulabilitym1, axis=0)
-                Init1_manipulabilitym1_std = np.std(Init1_manipulabilitym1, axis=0)
+                Init1_manipulabilitym1_mean = np.nanmean(Init1_manipulabilitym1, axis=0)
+                Init1_manipulabilitym1_std = np.nanstd(Init1_manipulabilitym1, axis=0)
                 Init1_manipulabilitym1_upper_limit = Init1_manipulabilitym1_mean + 2*Init1_manipulabilitym1_std
                 Init1_manipulabilitym1_lower_limit = Init1_manipulabilitym1_mean - 2*Init1_manipulabilitym1_std    
                 Init1_manipulabilitym1 = np.array(manipulabilitym1_mat)
 
                 Init1_manipulabilitym2 = np.array(manipulabilitym2_mat)
             
-                Init1_manipulabilitym2_mean = np.mean(Init1_manipulabilitym2, axis=0)
-                Init1_manipulabilitym2_std = np.std(Init1_manipulabilitym2, axis=0)
+                Init1_manipulabilitym2_mean = np.nanmean(Init1_manipulabilitym2, axis=0)
+                Init1_manipulabilitym2_std = np.nanstd(Init1_manipulabilitym2, axis=0)
                 Init1_manipulabilitym2_upper_limit = Init1_manipulabilitym2_mean + 2*Init1_manipulabilitym2_std
                 Init1_manipulabilitym2_lower_limit = Init1_manipulabilitym2_mean - 2*Init1_manipulabilitym2_std
                 
                 Init1_manipulabilityb1 = np.array(manipulabilityb1_mat)
             
-                Init1_manipulabilityb1_mean = np.mean(Init1_manipulabilityb1, axis=0)
-                Init1_manipulabilityb1_std = np.std(Init1_manipulabilityb1, axis=0)
+                Init1_manipulabilityb1_mean = np.nanmean(Init1_manipulabilityb1, axis=0)
+                Init1_manipulabilityb1_std = np.nanstd(Init1_manipulabilityb1, axis=0)
                 Init1_manipulabilityb1_upper_limit = Init1_manipulabilityb1_mean + 2*Init1_manipulabilityb1_std
                 Init1_manipulabilityb1_lower_limit = Init1_manipulabilityb1_mean - 2*Init1_manipulabilityb1_std
                 
                 Init1_manipulabilityb2 = np.array(manipulabilityb2_mat)
             
-                Init1_manipulabilityb2_mean = np.mean(Init1_manipulabilityb2, axis=0)
-                Init1_manipulabilityb2_std = np.std(Init1_manipulabilityb2, axis=0)
+                Init1_manipulabilityb2_mean = np.nanmean(Init1_manipulabilityb2, axis=0)
+                Init1_manipulabilityb2_std = np.nanstd(Init1_manipulabilityb2, axis=0)
                 Init1_manipulabilityb2_upper_limit = Init1_manipulabilityb2_mean + 2*Init1_manipulabilityb2_std
                 Init1_manipulabilityb2_lower_limit = Init1_manipulabilityb2_mean - 2*Init1_manipulabilityb2_std
                 
                 Init1_manipulabilityratio1 = np.array(manipulabilityratio1_mat)
             
-                Init1_manipulabilityratio1_mean = np.mean(Init1_manipulabilityratio1, axis=0)
-                Init1_manipulabilityratio1_std = np.std(Init1_manipulabilityratio1, axis=0)
+                Init1_manipulabilityratio1_mean = np.nanmean(Init1_manipulabilityratio1, axis=0)
+                Init1_manipulabilityratio1_std = np.nanstd(Init1_manipulabilityratio1, axis=0)
                 Init1_manipulabilityratio1_upper_limit = Init1_manipulabilityratio1_mean + 2*Init1_manipulabilityratio1_std
                 Init1_manipulabilityratio1_lower_limit = Init1_manipulabilityratio1_mean - 2*Init1_manipulabilityratio1_std
 
                 Init1_manipulabilityratio2 = np.array(manipulabilityratio2_mat)
             
-                Init1_manipulabilityratio2_mean = np.mean(Init1_manipulabilityratio2, axis=0)
-                Init1_manipulabilityratio2_std = np.std(Init1_manipulabilityratio2, axis=0)
+                Init1_manipulabilityratio2_mean = np.nanmean(Init1_manipulabilityratio2, axis=0)
+                Init1_manipulabilityratio2_std = np.nanstd(Init1_manipulabilityratio2, axis=0)
                 Init1_manipulabilityratio2_upper_limit = Init1_manipulabilityratio2_mean + 2*Init1_manipulabilityratio2_std
                 Init1_manipulabilityratio2_lower_limit = Init1_manipulabilityratio2_mean - 2*Init1_manipulabilityratio2_std
 
                 Init1_manipulabilityf1 = np.array(manipulabilityf1_mat)
             
-                Init1_manipulabilityf1_mean = np.mean(Init1_manipulabilityf1, axis=0)
-                Init1_manipulabilityf1_std = np.std(Init1_manipulabilityf1, axis=0)
+                Init1_manipulabilityf1_mean = np.nanmean(Init1_manipulabilityf1, axis=0)
+                Init1_manipulabilityf1_std = np.nanstd(Init1_manipulabilityf1, axis=0)
                 Init1_manipulabilityf1_upper_limit = Init1_manipulabilityf1_mean + 2*Init1_manipulabilityf1_std
                 Init1_manipulabilityf1_lower_limit = Init1_manipulabilityf1_mean - 2*Init1_manipulabilityf1_std
 
                 Init1_manipulabilityf2 = np.array(manipulabilityf2_mat)
             
-                Init1_manipulabilityf2_mean = np.mean(Init1_manipulabilityf2, axis=0)
-                Init1_manipulabilityf2_std = np.std(Init1_manipulabilityf2, axis=0)
+                Init1_manipulabilityf2_mean = np.nanmean(Init1_manipulabilityf2, axis=0)
+                Init1_manipulabilityf2_std = np.nanstd(Init1_manipulabilityf2, axis=0)
                 Init1_manipulabilityf2_upper_limit = Init1_manipulabilityf2_mean + 2*Init1_manipulabilityf2_std
                 Init1_manipulabilityf2_lower_limit = Init1_manipulabilityf2_mean - 2*Init1_manipulabilityf2_std
                 
@@ -1255,8 +1299,8 @@ def task1(big_matrix):
 
                 Init1_dot_productm1 = np.array(dot_productm1_mat)
             
-                Init1_dot_productm1_mean = np.mean(Init1_dot_productm1, axis=0)
-                Init1_dot_productm1_std = np.std(Init1_dot_productm1, axis=0)
+                Init1_dot_productm1_mean = np.nanmean(Init1_dot_productm1, axis=0)
+                Init1_dot_productm1_std = np.nanstd(Init1_dot_productm1, axis=0)
                 Init1_dot_productm1_upper_limit = Init1_dot_productm1_mean + 2*Init1_dot_productm1_std
                 Init1_dot_productm1_lower_limit = Init1_dot_productm1_mean - 2*Init1_dot_productm1_std 
                 
@@ -1266,8 +1310,8 @@ def task1(big_matrix):
                         
                 Init1_dot_productm2 = np.array(dot_productm2_mat)
             
-                Init1_dot_productm2_mean = np.mean(Init1_dot_productm2, axis=0)
-                Init1_dot_productm2_std = np.std(Init1_dot_productm2, axis=0)
+                Init1_dot_productm2_mean = np.nanmean(Init1_dot_productm2, axis=0)
+                Init1_dot_productm2_std = np.nanstd(Init1_dot_productm2, axis=0)
                 Init1_dot_productm2_upper_limit = Init1_dot_productm2_mean + 2*Init1_dot_productm2_std
                 Init1_dot_productm2_lower_limit = Init1_dot_productm2_mean - 2*Init1_dot_productm2_std
                 
@@ -1277,8 +1321,8 @@ def task1(big_matrix):
                 
                 Init1_dot_productb1 = np.array(dot_productb1_mat)
             
-                Init1_dot_productb1_mean = np.mean(Init1_dot_productb1, axis=0)
-                Init1_dot_productb1_std = np.std(Init1_dot_productb1, axis=0)
+                Init1_dot_productb1_mean = np.nanmean(Init1_dot_productb1, axis=0)
+                Init1_dot_productb1_std = np.nanstd(Init1_dot_productb1, axis=0)
                 Init1_dot_productb1_upper_limit = Init1_dot_productb1_mean + 2*Init1_dot_productb1_std
                 Init1_dot_productb1_lower_limit = Init1_dot_productb1_mean - 2*Init1_dot_productb1_std
 
@@ -1288,8 +1332,8 @@ def task1(big_matrix):
                         
                 Init1_dot_productb2 = np.array(dot_productb2_mat)
             
-                Init1_dot_productb2_mean = np.mean(Init1_dot_productb2, axis=0)
-                Init1_dot_productb2_std = np.std(Init1_dot_productb2, axis=0)
+                Init1_dot_productb2_mean = np.nanmean(Init1_dot_productb2, axis=0)
+                Init1_dot_productb2_std = np.nanstd(Init1_dot_productb2, axis=0)
                 Init1_dot_productb2_upper_limit = Init1_dot_productb2_mean + 2*Init1_dot_productb2_std
                 Init1_dot_productb2_lower_limit = Init1_dot_productb2_mean - 2*Init1_dot_productb2_std
 
@@ -1299,8 +1343,8 @@ def task1(big_matrix):
                         
                 Init1_dot_productratio1 = np.array(dot_productratio1_mat)
             
-                Init1_dot_productratio1_mean = np.mean(Init1_dot_productratio1, axis=0)
-                Init1_dot_productratio1_std = np.std(Init1_dot_productratio1, axis=0)
+                Init1_dot_productratio1_mean = np.nanmean(Init1_dot_productratio1, axis=0)
+                Init1_dot_productratio1_std = np.nanstd(Init1_dot_productratio1, axis=0)
                 Init1_dot_productratio1_upper_limit = Init1_dot_productratio1_mean + 2*Init1_dot_productratio1_std
                 Init1_dot_productratio1_lower_limit = Init1_dot_productratio1_mean - 2*Init1_dot_productratio1_std
                 
@@ -1310,8 +1354,8 @@ def task1(big_matrix):
 
                 Init1_dot_productratio2 = np.array(dot_productratio2_mat)
             
-                Init1_dot_productratio2_mean = np.mean(Init1_dot_productratio2, axis=0)
-                Init1_dot_productratio2_std = np.std(Init1_dot_productratio2, axis=0)
+                Init1_dot_productratio2_mean = np.nanmean(Init1_dot_productratio2, axis=0)
+                Init1_dot_productratio2_std = np.nanstd(Init1_dot_productratio2, axis=0)
                 Init1_dot_productratio2_upper_limit = Init1_dot_productratio2_mean + 2*Init1_dot_productratio2_std
                 Init1_dot_productratio2_lower_limit = Init1_dot_productratio2_mean - 2*Init1_dot_productratio2_std
 
@@ -1321,8 +1365,8 @@ def task1(big_matrix):
                         
                 Init1_dot_productf1 = np.array(dot_productf1_mat)
             
-                Init1_dot_productf1_mean = np.mean(Init1_dot_productf1, axis=0)
-                Init1_dot_productf1_std = np.std(Init1_dot_productf1, axis=0)
+                Init1_dot_productf1_mean = np.nanmean(Init1_dot_productf1, axis=0)
+                Init1_dot_productf1_std = np.nanstd(Init1_dot_productf1, axis=0)
                 Init1_dot_productf1_upper_limit = Init1_dot_productf1_mean + 2*Init1_dot_productf1_std
                 Init1_dot_productf1_lower_limit = Init1_dot_productf1_mean - 2*Init1_dot_productf1_std
 
@@ -1332,8 +1376,8 @@ def task1(big_matrix):
                         
                 Init1_dot_productf2 = np.array(dot_productf2_mat)
             
-                Init1_dot_productf2_mean = np.mean(Init1_dot_productf2, axis=0)
-                Init1_dot_productf2_std = np.std(Init1_dot_productf2, axis=0)
+                Init1_dot_productf2_mean = np.nanmean(Init1_dot_productf2, axis=0)
+                Init1_dot_productf2_std = np.nanstd(Init1_dot_productf2, axis=0)
                 Init1_dot_productf2_upper_limit = Init1_dot_productf2_mean + 2*Init1_dot_productf2_std
                 Init1_dot_productf2_lower_limit = Init1_dot_productf2_mean - 2*Init1_dot_productf2_std
                 
@@ -1598,28 +1642,28 @@ def task1(big_matrix):
         
                     Init1_iteration_timescomplete = np.array(planning_timecomplete_mat)
                     
-                    Init1_iteration_timescomplete_mean = np.mean(Init1_iteration_timescomplete, axis=0)
-                    Init1_iteration_timescomplete_std = np.std(Init1_iteration_timescomplete, axis=0)
+                    Init1_iteration_timescomplete_mean = np.nanmean(Init1_iteration_timescomplete, axis=0)
+                    Init1_iteration_timescomplete_std = np.nanstd(Init1_iteration_timescomplete, axis=0)
                     Init1_iteration_timescomplete_upper_limit = Init1_iteration_timescomplete_mean + 2*Init1_iteration_timescomplete_std
                     Init1_iteration_timescomplete_lower_limit = Init1_iteration_timescomplete_mean - 2*Init1_iteration_timescomplete_std           
                             
                     Init1_manipulabilitycomplete = np.array(manipulabilitycomplete_mat)
                     
-                    Init1_manipulabilitycomplete_mean = np.mean(Init1_manipulabilitycomplete, axis=0)
-                    Init1_manipulabilitycomplete_std = np.std(Init1_manipulabilitycomplete, axis=0)
+                    Init1_manipulabilitycomplete_mean = np.nanmean(Init1_manipulabilitycomplete, axis=0)
+                    Init1_manipulabilitycomplete_std = np.nanstd(Init1_manipulabilitycomplete, axis=0)
                     Init1_manipulabilitycomplete_upper_limit = Init1_manipulabilitycomplete_mean + 2*Init1_manipulabilitycomplete_std
                     Init1_manipulabilitycomplete_lower_limit = Init1_manipulabilitycomplete_mean - 2*Init1_manipulabilitycomplete_std            
                             
                     Init1_dotcomplete = np.array(dot_productcomplete_mat)
                     Init1_angcomplete = np.squeeze(np.arccos(np.array(dot_productcomplete_mat)))*180.0/3.14
                     
-                    Init1_dotcomplete_mean = np.mean(Init1_dotcomplete, axis=0) 
-                    Init1_dotcomplete_std = np.std(Init1_dotcomplete, axis=0)
+                    Init1_dotcomplete_mean = np.nanmean(Init1_dotcomplete, axis=0) 
+                    Init1_dotcomplete_std = np.nanstd(Init1_dotcomplete, axis=0)
                     Init1_dotcomplete_upper_limit = Init1_dotcomplete_mean + 2*Init1_dotcomplete_std
                     Init1_dotcomplete_lower_limit = Init1_dotcomplete_mean - 2*Init1_dotcomplete_std 
                     
-                    Init1_angcomplete_mean = np.mean(Init1_angcomplete, axis=0)
-                    Init1_angcomplete_std = np.std(Init1_angcomplete, axis=0)
+                    Init1_angcomplete_mean = np.nanmean(Init1_angcomplete, axis=0)
+                    Init1_angcomplete_std = np.nanstd(Init1_angcomplete, axis=0)
                     Init1_angcomplete_upper_limit = Init1_angcomplete_mean + 2*Init1_angcomplete_std
                     Init1_angcomplete_lower_limit = Init1_angcomplete_mean - 2*Init1_angcomplete_std
                     
@@ -1887,35 +1931,32 @@ def task1(big_matrix):
                     
         for br in range(7):
             
-            matrix1[c,br,5] = np.mean(matrix1[c,br,:5])
+            matrix1[c,br,5] = np.nanmean(matrix1[c,br,:5])
             if br==6:
                 
                 matrix1[c,br,5] = matrix1[c,br,0]*10/105+matrix1[c,br,1]*20/105+matrix1[c,br,2]*25/105+matrix1[c,br,3]*25/105+matrix1[c,br,4]*25/105
                 
-    fig21.savefig(folder + '//Shorter_fixed_metrics.png')
-    fig22.savefig(folder + '//Shorter_mobile_metrics.png')
-                
-    fig31.savefig(folder + '//Longer_fixed_metrics.png')
-    fig32.savefig(folder + '//Longer_mobile_metrics.png')
-    
-    fig4.savefig(folder + '//velocities_drawer.png')
-    fig5.savefig(folder + '//velocities_room_door.png')
-    
-    fig6.savefig(folder + '//position_mobile_base1.png')
-    fig7.savefig(folder + '//position_mobile_base2.png')
-    
-    fig8.savefig(folder + '//m_drawer.png')
-    fig10.savefig(folder + '//f_drawer.png')
-    fig12.savefig(folder + '//b_drawer.png')
-    fig14.savefig(folder + '//ratio_drawer.png') 
-    
-    fig9.savefig(folder + '//m_door.png')
-    fig11.savefig(folder + '//f_door.png')
-    fig13.savefig(folder + '//b_door.png')
-    fig15.savefig(folder + '//ratio_door.png') 
-
-    fig16.savefig(folder + '//Completerun_fixed.png')    
-    fig17.savefig(folder + '//Completerun_mobile.png')     
+    figure_jobs = [
+        (fig21, 'Shorter_fixed_metrics.png'),
+        (fig22, 'Shorter_mobile_metrics.png'),
+        (fig31, 'Longer_fixed_metrics.png'),
+        (fig32, 'Longer_mobile_metrics.png'),
+        (fig4, 'velocities_drawer.png'),
+        (fig5, 'velocities_room_door.png'),
+        (fig6, 'position_mobile_base1.png'),
+        (fig7, 'position_mobile_base2.png'),
+        (fig8, 'm_drawer.png'),
+        (fig10, 'f_drawer.png'),
+        (fig12, 'b_drawer.png'),
+        (fig14, 'ratio_drawer.png'),
+        (fig9, 'm_door.png'),
+        (fig11, 'f_door.png'),
+        (fig13, 'b_door.png'),
+        (fig15, 'ratio_door.png'),
+        (fig16, 'Completerun_fixed.png'),
+        (fig17, 'Completerun_mobile.png'),
+        (fig1, 'Metrics.png'),
+    ]
     
     np.save(folder + '/Table_1_'+list_of_controllers[0]+'.npy', np.squeeze(matrix1[0,:,:]))
     np.save(folder + '/Table_1_'+list_of_controllers[1]+'.npy', np.squeeze(matrix1[1,:,:])) 
@@ -1971,15 +2012,25 @@ def task1(big_matrix):
             
 
 
-    fig1.savefig(folder + '//' + 'Metrics.png' )  
-    plt.close('all')        
+    #----- Render the figures in parallel. The jobs hold the data and the plot
+    # parameters of the figures, figures whose jobs did not change are kept -----
+    
+    render_figures(figure_jobs, folder, num_workers=num_workers, use_cache=use_cache)
 
 def main():
     
-    #big = AnalyseResultsPybullet()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ingest", action="store_true", help="collect the runs into the results store again")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of processes rendering the figures, default: number of cores")
+    parser.add_argument("--no-cache", action="store_true", help="render all figures, also the unchanged ones")
+    args = parser.parse_args()
+    
+    if args.ingest or not os.path.isfile(RESULTS_STORE):
+        big = AnalyseResultsPybullet()
+    else:
+        big = ResultsStore(RESULTS_STORE)
     
-    big = np.load(os.getcwd()+'/moma/moma_demos/articulated_demo/RESULTS SECTION RUNS/big_matrix.npy')
-    task1(big)
+    task1(big, num_workers=args.workers, use_cache=not args.no_cache)
                 
 
 if __name__ == "__main__":
@@ -0,0 +1,92 @@
+#----- Description -----
+
+# Tunes the parameters of the direction estimator (alpha, mixCoeff, fd1 and
+# buffer_length) on saved runs, without the simulator. The recorded wrench and
+# end effector pose streams of every run are replayed through EstimatorReplay for
+# the whole grid of parameter sets at once, and the parameter sets are ranked by
+# the alignment of the replayed estimates with the actual direction.
+#
+# Only runs saved with the end effector poses and the initial state of the
+# estimator (r_O_ee, quat_O_ee, estimator_*) can be replayed.
+
+#-----------------------
+
+from highlevel_planning.tools.trajectory_logger import RunView
+from highlevel_planning.sim.direction_estimators.estimator_replay import EstimatorReplay
+
+import argparse
+import itertools
+import time
+import numpy as np
+
+#-----------------
+
+REQUIRED_CHANNELS = ["f_wristframe", "r_O_ee", "quat_O_ee", "actual_dir", "estimator_init_dir", "estimator_initN", "estimator_dt"]
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("runs", type=str, nargs="+", help="folders of saved runs (one controller each)")
+    parser.add_argument("--alpha", type=float, nargs="+", default=[0.1])
+    parser.add_argument("--mix", type=float, nargs="+", default=[0.5], help="values of mixCoeff")
+    parser.add_argument("--fd1", type=float, nargs="+", default=[0.1])
+    parser.add_argument("--buffer-length", type=int, nargs="+", default=[100])
+    parser.add_argument("--top", type=int, default=10, help="number of best parameter sets to print")
+    parser.add_argument("-o", "--output", type=str, default=None, help="npz file for the metrics of all parameter sets")
+    args = parser.parse_args()
+
+    grid = np.array(list(itertools.product(args.alpha, args.mix, args.fd1, args.buffer_length)))
+    alpha, mixCoeff, fd1, buffer_length = grid[:, 0], grid[:, 1], grid[:, 2], grid[:, 3].astype(np.int64)
+
+    print("Parameter sets: ", len(grid))
+
+    metrics = dict()
+    num_runs = 0
+    start = time.perf_counter()
+
+    for folder_name in args.runs:
+
+        run = RunView(folder_name)
+
+        missing = [name for name in REQUIRED_CHANNELS if name not in run]
+        if len(missing) > 0:
+            print("Skipping " + folder_name + ", missing: " + ", ".join(missing))
+            continue
+
+        replay = EstimatorReplay(run)
+        estimated_dir = replay.Run(alpha, mixCoeff, fd1, buffer_length)
+
+        for name, values in replay.AlignmentMetrics(estimated_dir).items():
+            metrics[name] = metrics.get(name, 0.0) + values
+
+        num_runs += 1
+
+    if num_runs == 0:
+        print("No run could be replayed")
+        return
+
+    for name in metrics:
+        metrics[name] /= num_runs
+
+    print("Replayed runs:   ", num_runs)
+    print("Replay time [s]: ", time.perf_counter() - start)
+
+    #----- Rank by the mean alignment over the whole run -----
+
+    order = np.argsort(-metrics["mean_dot"])
+
+    print("{:>8} {:>8} {:>8} {:>8} | {:>10} {:>10} {:>10}".format("alpha", "mix", "fd1", "buffer", "mean_dot", "end_dot", "start_rms"))
+
+    for p in order[:args.top]:
+        print("{:8.3f} {:8.3f} {:8.3f} {:8d} | {:10.4f} {:10.4f} {:10.4f}".format(
+            alpha[p], mixCoeff[p], fd1[p], buffer_length[p], metrics["mean_dot"][p], metrics["end_dot"][p], metrics["start_rms"][p]
+        ))
+
+    if args.output is not None:
+        np.savez(args.output, alpha=alpha, mixCoeff=mixCoeff, fd1=fd1, buffer_length=buffer_length, **metrics)
+
+
+if __name__ == "__main__":
+
+    main()
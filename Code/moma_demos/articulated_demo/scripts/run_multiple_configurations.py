@@ -6,6 +6,7 @@ from highlevel_planning.skills.navigate_configurable import SkillNavigate
 from highlevel_planning.skills.grasping import SkillGrasping
 from highlevel_planning.tools.config import ConfigYaml
 from highlevel_planning.tools import run_util_configurable                                
+from highlevel_planning.tools import sweep_util
 
 #----- Controllers -----
 
@@ -22,6 +23,8 @@ from highlevel_planning.sim.direction_estimators.direction_estimation_with_filte
 #----- Additional skills -----
 
 from highlevel_planning.skills.door_opening import SkillTrajectoryPlanning
+from highlevel_planning.sim.termination_monitor import TerminationMonitor
+from highlevel_planning.sim.controllers.step_recorder import ControllerStepRecorder
 
 #----- Utils -----
 
@@ -43,18 +46,14 @@ BASEDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 # This script is to be run if multiple controllers are to be tested for 
 # different initial configurations. The complete procedure is restarted automatically
-# for each starting configuration
+# for each starting configuration. Every configuration runs in its own worker 
+# process with its own pybullet connection, see tools/sweep_util.py. An interrupted
+# sweep can be continued by passing its results folder with '--resume'.
 
 #-----------------------
 
-def main(offsetX, offsetY, offsetAngle, offsetGrasp, name_of_the_object = "cupboard"):
-    
-    Nx =len(offsetX)                                                           # Number of different x axis starting coordinates
-    Ny = len(offsetY)                                                          # Number of different y axis starting coordinates
-    Nang = len(offsetAngle)                                                    # Number of different orientations of the base
-    Noff = len(offsetGrasp)                                                    # Number of different grasping orientations
-    
-    globalFolder = prepare_global_dir()
+def get_object_parameters(name_of_the_object):
+
     N_steps = 1200
 
     if name_of_the_object == "cupboard":
@@ -66,39 +65,148 @@ def main(offsetX, offsetY, offsetAngle, offsetGrasp, name_of_the_object = "cupbo
         
         link_index = 0
         init_direction = np.array([0.0, 0.0, -1.0]).reshape(3,1)
-        offsetPos = [0.0, 0.0, 0.0]
         
     elif name_of_the_object == "slidingdoor":
 
         link_index = 0
         init_direction = np.array([0.0, 0.0, -1.0]).reshape(3,1)
-        offsetPos = [0.0, 0.0, 0.0]
         
     elif name_of_the_object == "slidinglid":
 
         link_index = 0
         init_direction = np.array([0.0, -1.0/2**0.5, -1.0/2**0.5]).reshape(3,1)
-        offsetPos = [0.0, 0.0, 0.0]
         N_steps = 600
 
     elif name_of_the_object == "removablelid":
 
         link_index = 0
         init_direction = np.array([0.0, 0.0, -1.0]).reshape(3,1)
-        offsetPos = [0.0, 0.0, 0.0]
         
     elif name_of_the_object == "dishwasher":
         
         link_index = 0
         init_direction = np.array([0.0, 0.0, -1.0]).reshape(3,1)
-        offsetPos = [0.0, 0.0, 0.0]
         N_steps = 600
         
+    return link_index, init_direction, N_steps
+
+#-------
+def run_configuration(scenName, offsetPos, offsetAng, offsetGr, name_of_the_object, globalFolder, args):
+
+    #----- Executes one configuration of the sweep. It is called in a separate 
+    # worker process, which owns its own pybullet connection -----
+
+    link_index, init_direction, N_steps = get_object_parameters(name_of_the_object)
+    
     initLen = 100
     vRegular = 0.1
     vInit = vRegular/4
+
+    # Load existing simulation data if desired
+    savedir = os.path.join(BASEDIR, "data", "sim")
+    #objects, robot_mdl = run_util_configurable.restore_pybullet_sim(savedir, args)
+    
+    objects = None
+    robot_mdl = None
+    
+    # Load config file
+    cfg = ConfigYaml(os.path.join(BASEDIR, "config", "main.yaml"))
+
+    # ---------- Run examples -----------
+
+    robot, scene = run_util_configurable.setup_pybullet_world(
+            SceneMoveSkill, BASEDIR, savedir, objects, args, cfg, robot_mdl, offsetGr, name_of_the_object, save_world=False
+            )
+    
+    #----- The IK solutions are shared between the configurations of the sweep 
+    # through a cache file in the sweep folder -----
+    
+    ik_cache_path = os.path.join(globalFolder, "ik_cache.npz")
+    robot.trajectory_ik.load(ik_cache_path)
+    
+    try:
+        #----- Special preparation is required for the dishwasher model 
+        # as it tends to open on its own otherwise -----
+        
+        if name_of_the_object == 'dishwasher':
+            
+            target_id = scene.objects[name_of_the_object].model.uid
+            nj = p.getNumJoints(target_id, physicsClientId=robot._world.physics_client)          
+            for counter in range(nj):
+                p.resetJointState(target_id, counter, -0.01, 0.0, physicsClientId=robot._world.physics_client) 
+                
+        list_of_controllers = []
+        fd1 = 1/(50*robot._world.T_s)
+    
+        #----- Object definitions -----
+
+        sk_grasp = SkillGrasping(scene, robot, cfg)
+        sk_nav = SkillNavigate(scene, robot, offsetPos, offsetAng)
+        sk_dir = Estimator(scene, robot, robot._world.T_s, 100, init_direction, initLen, fd1)
+        
+        #----- Controller for the initial direction estimation is always fixed based -----
+        
+        cinit = controller2(scene, robot, robot._world.T_s)
+        
+        #----- Defining all the controllers that we want to test -----
+        
+        c2 = controller1(scene, robot, robot._world.T_s)
+        c1 = controller2(scene, robot, robot._world.T_s)
+        c3 = controller3(scene, robot, robot._world.T_s, noCollision=True)
+        c4 = controller4(scene, robot, robot._world.T_s, noCollision=True, Npolygon=32)
+        c5 = controller5(scene, robot, robot._world.T_s, noCollision=True)
+        
+        list_of_controllers.append(c1)
+        list_of_controllers.append(c2)
+        list_of_controllers.append(c3)
+        list_of_controllers.append(c4)
+        list_of_controllers.append(c5)
+
+        #---------------
+        
+        sk_traj = SkillTrajectoryPlanning(scene, robot, cfg, list_of_controllers, cinit, robot._world.T_s, initLen, vInit, vRegular)
+
+        if not args.no_early_stop:
+            sk_traj.monitor = TerminationMonitor()
+
+        sk_traj.control_decimation = args.control_decimation
+        sk_traj.profiler.enabled = args.profile_latency
+
+        if args.record_controller_steps:
+            sk_traj.step_recorder = ControllerStepRecorder()
+    
+        #----- Run -----
     
-    list_of_failed_names = []
+        sk_traj.Run(num_steps=N_steps, sk_grasp=sk_grasp, sk_dir=sk_dir, sk_nav=sk_nav, target_name=name_of_the_object, link_idx=link_index, grasp_id=0, global_folder=globalFolder, postfix=scenName)
+        robot._world.fast_forward(10)
+    
+    finally:
+        
+        robot.trajectory_ik.save(ik_cache_path)
+        p.disconnect()
+
+#-------
+def main(offsetX, offsetY, offsetAngle, offsetGrasp, name_of_the_object = "cupboard"):
+    
+    Nx =len(offsetX)                                                           # Number of different x axis starting coordinates
+    Ny = len(offsetY)                                                          # Number of different y axis starting coordinates
+    Nang = len(offsetAngle)                                                    # Number of different orientations of the base
+    Noff = len(offsetGrasp)                                                    # Number of different grasping orientations
+    
+    # Command line arguments
+    args = run_util_configurable.parse_arguments()
+    
+    if args.resume is not None:
+        globalFolder = args.resume
+    else:
+        globalFolder = prepare_global_dir()
+    
+    # Several GUI windows at once are not supported, run the workers headless
+    if args.workers != 1 and args.method == "gui":
+        print("Parallel sweep requested, switching from 'gui' to 'direct' mode")
+        args.method = "direct"
+    
+    list_of_scenarios = []
         
     for i in range(Nx):
         for j in range(Ny):
@@ -106,91 +214,18 @@ def main(offsetX, offsetY, offsetAngle, offsetGrasp, name_of_the_object = "cupbo
                 for m in range(Noff):
                 
                     scenName = str(i)+'_'+str(j)+'_'+str(k)+'_'+str(m)
-                    
-                    print(50*'=')
-                    print('Executing combination: ', scenName)
-                    print(50*'=')
-                
-                    offsetPos = [offsetX[i], offsetY[j], 0.0]
-                    offsetAng = offsetAngle[k]
-                    offsetGr = offsetGrasp[m]
                 
-                    try:
-                        # Command line arguments
-                        args = run_util_configurable.parse_arguments()
-
-                        # Load existing simulation data if desired
-                        savedir = os.path.join(BASEDIR, "data", "sim")
-                        #objects, robot_mdl = run_util_configurable.restore_pybullet_sim(savedir, args)
-                        
-                        objects = None
-                        robot_mdl = None
-                        
-                        # Load config file
-                        cfg = ConfigYaml(os.path.join(BASEDIR, "config", "main.yaml"))
-
-                        # ---------- Run examples -----------
-
-                        robot, scene = run_util_configurable.setup_pybullet_world(
-                                SceneMoveSkill, BASEDIR, savedir, objects, args, cfg, robot_mdl, offsetGr, name_of_the_object
-                                )
-                        
-                        #----- Special preparation is required for the dishwasher model 
-                        # as it tends to open on its own otherwise -----
-                        
-                        if name_of_the_object == 'dishwasher':
-                            
-                            target_id = scene.objects[name_of_the_object].model.uid
-                            nj = p.getNumJoints(target_id)          
-                            for counter in range(nj):
-                                p.resetJointState(target_id, counter, -0.01, 0.0) 
-                                
-                        list_of_controllers = []
-                        fd1 = 1/(50*robot._world.T_s)
-                    
-                        #----- Object definitions -----
-        
-                        sk_grasp = SkillGrasping(scene, robot, cfg)
-                        sk_nav = SkillNavigate(scene, robot, offsetPos, offsetAng)
-                        sk_dir = Estimator(scene, robot, robot._world.T_s, 100, init_direction, initLen, fd1)
-                        
-                        #----- Controller for the initial direction estimation is always fixed based -----
-                        
-                        cinit = controller2(scene, robot, robot._world.T_s)
-                        
-                        #----- Defining all the controllers that we want to test -----
-                        
-                        c2 = controller1(scene, robot, robot._world.T_s)
-                        c1 = controller2(scene, robot, robot._world.T_s)
-                        c3 = controller3(scene, robot, robot._world.T_s, noCollision=True)
-                        c4 = controller4(scene, robot, robot._world.T_s, noCollision=True, Npolygon=32)
-                        c5 = controller5(scene, robot, robot._world.T_s, noCollision=True)
-                        
-                        list_of_controllers.append(c1)
-                        list_of_controllers.append(c2)
-                        list_of_controllers.append(c3)
-                        list_of_controllers.append(c4)
-                        list_of_controllers.append(c5)
-
-                        #---------------
-                        
-                        sk_traj = SkillTrajectoryPlanning(scene, robot, cfg, list_of_controllers, cinit, robot._world.T_s, initLen, vInit, vRegular)
-                    
-                        #----- Run -----
-                    
-                        sk_traj.Run(num_steps=N_steps, sk_grasp=sk_grasp, sk_dir=sk_dir, sk_nav=sk_nav, target_name=name_of_the_object, link_idx=link_index, grasp_id=0, global_folder=globalFolder, postfix=scenName)
-                        robot._world.step_seconds(10) 
-                        p.disconnect()
-                    
-                    except:
-                        
-                        list_of_failed_names.append(scenName)
-                        p.disconnect()
-                        continue
-                    
-    print(30*'='+" List of failed experiments "+30*'=')
-    for name in list_of_failed_names:
-        print(name)
+                    kwargs = {
+                        "offsetPos": [offsetX[i], offsetY[j], 0.0],
+                        "offsetAng": offsetAngle[k],
+                        "offsetGr": offsetGrasp[m],
+                        "name_of_the_object": name_of_the_object,
+                        "globalFolder": globalFolder,
+                        "args": args,
+                    }
+                    list_of_scenarios.append((scenName, kwargs))
+    
+    sweep_util.run_sweep(run_configuration, list_of_scenarios, globalFolder, num_workers=args.workers, timeout=args.timeout)
                 
 if __name__ == "__main__":
     
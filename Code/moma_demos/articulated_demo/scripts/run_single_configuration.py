@@ -22,6 +22,8 @@ from highlevel_planning.sim.direction_estimators.direction_estimation_with_filte
 #----- Additional skills -----
 
 from highlevel_planning.skills.door_opening import SkillTrajectoryPlanning
+from highlevel_planning.sim.termination_monitor import TerminationMonitor
+from highlevel_planning.sim.controllers.step_recorder import ControllerStepRecorder
 
 #----- Utils -----
 
@@ -114,9 +116,9 @@ def main(name_of_the_object = "cupboard"):
     if name_of_the_object == 'dishwasher':
         
         target_id = scene.objects[name_of_the_object].model.uid
-        nj = p.getNumJoints(target_id)          
+        nj = p.getNumJoints(target_id, physicsClientId=robot._world.physics_client)          
         for counter in range(nj):
-            p.resetJointState(target_id, counter, -0.01, 0.0) 
+            p.resetJointState(target_id, counter, -0.01, 0.0, physicsClientId=robot._world.physics_client) 
                 
     list_of_controllers = []    
     fd1 = 1/(50*robot._world.T_s)
@@ -148,6 +150,15 @@ def main(name_of_the_object = "cupboard"):
     #---------------
 
     sk_traj = SkillTrajectoryPlanning(scene, robot, cfg, list_of_controllers, cinit, robot._world.T_s, initLen, vInit, vRegular)
+
+    if not args.no_early_stop:
+        sk_traj.monitor = TerminationMonitor()
+
+    sk_traj.control_decimation = args.control_decimation
+    sk_traj.profiler.enabled = args.profile_latency
+
+    if args.record_controller_steps:
+        sk_traj.step_recorder = ControllerStepRecorder()
     
     #----- Run -----
     
@@ -1,6 +1,8 @@
 import pybullet as p
 import numpy as np
 
+from highlevel_planning.tools.door_opening_util import LatencyProfiler
+
 EPS = 1e-6
 DEBUG = True
 
@@ -21,8 +23,28 @@ class ControllerTemplate:
         self.robot = robot
         self.dt = time_step
         
+        #----- With control decimation, the controller is updated every
+        # 'control_decimation' physics ticks and 'dt' is the control period -----
+        
+        self.physics_dt = time_step
+        self.control_decimation = 1
+        
+        #----- Times the stages of PerformOneStep, the door opening skill passes
+        # its own profiler -----
+        
+        self.profiler = LatencyProfiler(enabled=False)
+        
+        self._physics_client = robot._world.physics_client
+        
         self.mode_name = None
         
+        #----- Quantities the controller reads from the infoTuple. Measurements
+        # that are not needed are skipped by the measurement provider -----
+        
+        self.needs_mass_matrix = True
+        self.needs_inverse_dynamics = True
+        self.needs_jacobian = True
+        
         #----- Constraints -----
         
         self.torque_max = np.array([87.0, 87.0, 87.0, 87.0, 12.0, 12.0, 12.0])
@@ -39,6 +61,12 @@ class ControllerTemplate:
         self.q_dot_dot_min = -np.array([15.0, 7.5, 10.0, 12.5, 15.0, 20.0, 20.0])
         
         self.q_mean = np.copy(0.5*(self.q_max+self.q_min))
+        
+        #----- Buffers of the joint centering kernel -----
+        
+        self.num_centered_joints = 6
+        self._q_dot_centering = np.zeros(self.num_centered_joints)
+        self._centering_limits = np.zeros(self.num_centered_joints)
 
         #----- Init Values -----
         
@@ -48,11 +76,11 @@ class ControllerTemplate:
 #-------
     def SetupController(self):
     
-        num_joints = p.getNumJoints(self.robot.model.uid)
+        num_joints = p.getNumJoints(self.robot.model.uid, physicsClientId=self._physics_client)
         
         for i in range(num_joints):
             
-            info = p.getJointInfo(self.robot.model.uid, i)
+            info = p.getJointInfo(self.robot.model.uid, i, physicsClientId=self._physics_client)
             if i in self.robot.joint_idx_arm or i in self.robot.joint_idx_fingers:
                 
                 self.q_dot_max.append(info[11])
@@ -69,20 +97,100 @@ class ControllerTemplate:
         
         self.q_mean = np.copy(0.5*(self.q_max+self.q_min))    
         
+#-------
+    def SetControlDecimation(self, decimation):
+        
+        if decimation < 1:
+            raise ValueError("Invalid control decimation: " + str(decimation))
+        
+        self.control_decimation = int(decimation)
+        self.dt = self.control_decimation*self.physics_dt
+        
+        #----- The joint velocity QP of the torque constrained controllers depends
+        # on the control period -----
+        
+        if hasattr(self, 'qp'):
+            self.qp.SetTimeStep(self.dt)
+        
+#-------
+    def HoldCommand(self):
+        
+        #----- Re-applies the last command before a physics tick without a
+        # controller update. The motor targets of the arm persist in pybullet -----
+        
+        pass
+        
+#-------
+    def StepPhysics(self):
+        
+        #----- Steps the simulation until the next controller update, the last
+        # command is held in between (zero-order hold) -----
+        
+        with self.profiler.Stage('physics_step'):
+            
+            for k in range(self.control_decimation):
+                
+                if k > 0:
+                    self.HoldCommand()
+                    
+                self.robot._world.step_one()
+                self.robot._world.sleep(self.robot._world.T_s)
+        
 #-------
     def ResetDampings(self):
     
-        p.changeDynamics(self.robot.model.uid, -1, linearDamping=0, angularDamping=0, jointDamping=0)
+        p.changeDynamics(self.robot.model.uid, -1, linearDamping=0, angularDamping=0, jointDamping=0, physicsClientId=self._physics_client)
         
         for i in self.robot.joint_idx_arm:
-            p.changeDynamics(self.robot.model.uid, i, linearDamping=0, angularDamping=0, jointDamping=0)
+            p.changeDynamics(self.robot.model.uid, i, linearDamping=0, angularDamping=0, jointDamping=0, physicsClientId=self._physics_client)
         
-        p.setJointMotorControlArray(self.robot.model.uid, self.robot.joint_idx_arm, p.VELOCITY_CONTROL, forces = [0.0]*len(self.robot.joint_idx_arm))
+        p.setJointMotorControlArray(self.robot.model.uid, self.robot.joint_idx_arm, p.VELOCITY_CONTROL, forces = [0.0]*len(self.robot.joint_idx_arm), physicsClientId=self._physics_client)
         
         for i in self.robot.joint_idx_fingers:
-            p.changeDynamics(self.robot.model.uid, i, linearDamping=0, angularDamping=0, jointDamping=0)
+            p.changeDynamics(self.robot.model.uid, i, linearDamping=0, angularDamping=0, jointDamping=0, physicsClientId=self._physics_client)
+        
+        p.setJointMotorControlArray(self.robot.model.uid, self.robot.joint_idx_fingers, p.VELOCITY_CONTROL, forces = [0.0]*len(self.robot.joint_idx_fingers), physicsClientId=self._physics_client)        
+        
+#-------
+    def CenteringJointVel(self, q, gamma=0.1):
+    
+        #----- Joint velocities that drive the first joints towards the middle of their 
+        # range, saturated at the joint velocity limits. q is either a single joint 
+        # configuration or a batch of shape (N, num_joints), e.g. for the offline 
+        # replay of recorded runs. The result of a single configuration is written
+        # to a preallocated buffer, which is overwritten in the next call -----
+        
+        n = self.num_centered_joints
+        q = np.asarray(q)
+        
+        if q.ndim == 1:
+            q_dot_des = self._q_dot_centering
+            limits = self._centering_limits
+        else:
+            q_dot_des = np.zeros(q.shape[:-1] + (n,))
+            limits = np.zeros(q.shape[:-1] + (n,))
+            
+        np.subtract(self.q_mean[:n], q[..., :n], out=q_dot_des)
+        
+        np.copyto(limits, np.abs(self.q_dot_max[:n]))
+        np.copyto(limits, np.abs(self.q_dot_min[:n]), where=q_dot_des<0)
+        
+        #----- sign(q_mean - q)*min(limit, gamma/dt*|q_mean - q|) -----
+        
+        q_dot_des *= gamma/self.dt
+        np.clip(q_dot_des, -limits, limits, out=q_dot_des)
+        
+        return q_dot_des
+        
+#-------
+    def CenteringEEVel(self, J_b_ee, q_dot_des):
+    
+        #----- Planar EE velocity caused by the joint centering velocities. Also 
+        # accepts batches of shape (N, 6, 7) and (N, 6) -----
+        
+        n = self.num_centered_joints
         
-        p.setJointMotorControlArray(self.robot.model.uid, self.robot.joint_idx_fingers, p.VELOCITY_CONTROL, forces = [0.0]*len(self.robot.joint_idx_fingers))        
+        return np.matmul(J_b_ee[..., :2, :n], q_dot_des[..., :n, np.newaxis])[..., 0]
         
 #-------
     def GetCurrOptSol(self):
@@ -26,17 +26,27 @@ class Controller(ControllerTemplate):
         
         self.mode_name = "fixed_base_cartesian_velocity_control"
         
+        #----- The built in Cartesian controller does not use the dynamics -----
+        
+        self.needs_mass_matrix = False
+        self.needs_inverse_dynamics = False
+        
 #-------
     def PerformOneStep(self, veldesEE_ee, infoTuple=None):
         
-        self.q_dot_optimal = infoTuple[4]
+        self.q_dot_optimal = np.copy(infoTuple[4])
         
-        p.setJointMotorControlArray(self.robot.model.uid, self.robot.joint_idx_fingers, p.TORQUE_CONTROL, forces=[-25.0]*2)
+        with self.profiler.Stage('motor_command'):
+            p.setJointMotorControlArray(self.robot.model.uid, self.robot.joint_idx_fingers, p.TORQUE_CONTROL, forces=[-25.0]*2, physicsClientId=self._physics_client)
         
         vLindesEE_ee = np.squeeze(veldesEE_ee[:3])
         vAngdesEE_ee = np.squeeze(veldesEE_ee[3:])
         
-        self.robot.task_space_velocity_control(vLindesEE_ee, vAngdesEE_ee, 1)
+        #----- The Cartesian velocity controller of the robot steps the simulation
+        # itself, its joint velocity commands are part of the physics step -----
+        
+        with self.profiler.Stage('physics_step'):
+            self.robot.task_space_velocity_control(vLindesEE_ee, vAngdesEE_ee, self.control_decimation)
         
 
         
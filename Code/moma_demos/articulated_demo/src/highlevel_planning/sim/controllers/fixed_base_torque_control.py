@@ -6,6 +6,7 @@ from highlevel_planning.tools.door_opening_util import *
 from quadprog import solve_qp
 
 from highlevel_planning.sim.controllers.controller import ControllerTemplate
+from highlevel_planning.sim.controllers.qp_workspace import QPWorkspace
 
 EPS = 1e-6
 DEBUG = True
@@ -20,53 +21,26 @@ DEBUG = True
 
 class Controller(ControllerTemplate):
 
-    def __init__(self, scene, robot, time_step):
+    def __init__(self, scene, robot, time_step, qp_backend='quadprog'):
         
         super(Controller, self).__init__(scene, robot, time_step)
         
+        self.qp = QPWorkspace(self, backend=qp_backend)
+        
+        #----- The mass matrix is only used by the torque minimization (task 2), 
+        # which is disabled in PerformOneStep -----
+        
+        self.needs_mass_matrix = False
+        
         self.mode_name = 'fixed_base_torque_control'
 
 #-------
     def PrepareTask1(self, J_b_ee, vdesEE_b, M, b, q, q_dot, tau_prev):
         
-        #----- Joint impedance parameters taken from the franka_ros package -----
-    
-        Kp = np.zeros((7,7))
-        Kp[0, 0] = 600
-        Kp[1, 1] = 600
-        Kp[2, 2] = 600
-        Kp[3, 3] = 600
-        Kp[4, 4] = 250
-        Kp[5, 5] = 150
-        Kp[6, 6] = 50
-        
-        Kd = np.zeros((7,7))
-        Kd[0, 0] = 50
-        Kd[1, 1] = 50
-        Kd[2, 2] = 50
-        Kd[3, 3] = 20
-        Kd[4, 4] = 20
-        Kd[5, 5] = 20
-        Kd[6, 6] = 10
-        
-        Aux = Kp*self.dt + Kd
-        
-        A = J_b_ee
-        y = vdesEE_b
+        #----- The matrices are preallocated in the QP workspace and only the
+        # state dependent parts are updated in place -----
         
-        G1 = np.matmul(np.transpose(A), A) + 0.0001**2*np.eye(len(q))
-        a1 = np.matmul(np.transpose(A), y)        
-        
-        C1 = np.transpose(np.concatenate((Aux, -Aux, np.eye(len(q)), -np.eye(len(q))), axis=0))
-        
-        ineq1 = -self.torque_max[:len(q)] - b + np.matmul(Kd, q_dot)
-        ineq2 = -self.torque_max[:len(q)] + b - np.matmul(Kd, q_dot)
-        ineq3 = np.maximum(np.maximum(self.q_dot_min[:len(q)], (1/self.dt)*(self.q_min[:len(q)] - q)), self.dt*self.q_dot_dot_min + q_dot)
-        ineq4 = -np.minimum(np.minimum(self.q_dot_max[:len(q)], (1/self.dt)*(self.q_max[:len(q)] - q)), self.dt*self.q_dot_dot_max + q_dot)
-        
-        b1 = np.concatenate((ineq1, ineq2, ineq3, ineq4), axis=0)
-        
-        return G1, a1, C1, b1
+        return self.qp.UpdateTask1(J_b_ee, vdesEE_b, b, q, q_dot)
         
 #-------
     def PrepareTask2(self, M, b, q, q_dot, tau_prev, sol1, Null1):
@@ -108,9 +82,9 @@ class Controller(ControllerTemplate):
         
         vdesEE_b = np.concatenate((vLindesEE_b, vAngdesEE_b), axis=0)
         
-        G1, a1, C1, b1 = self.PrepareTask1(J_b_ee, vdesEE_b[:J_b_ee.shape[0]], M, b, q, q_dot, tau_prev)
+        self.PrepareTask1(J_b_ee, vdesEE_b[:J_b_ee.shape[0]], M, b, q, q_dot, tau_prev)
         
-        sol1,_,_,_,_,_ = solve_qp(G1, a1, C1, b1)
+        sol1 = self.qp.SolveTask1()
         
         q_dot_optimal = np.array(sol1)
 
@@ -153,14 +127,15 @@ class Controller(ControllerTemplate):
         b = b[:7]
         J_b_ee = J_b_ee[:, :7]
         
-        self.q_dot_optimal = self.CalculateDesiredJointVel(veldesEE_ee, J_b_ee, M, b, q, q_dot, C_O_b, C_O_ee, tau_prev, False)
-        
-        p.setJointMotorControlArray(self.robot.model.uid, self.robot.joint_idx_fingers, p.TORQUE_CONTROL, forces=[-25.0]*2)
+        with self.profiler.Stage('qp_solve'):
+            self.q_dot_optimal = self.CalculateDesiredJointVel(veldesEE_ee, J_b_ee, M, b, q, q_dot, C_O_b, C_O_ee, tau_prev, False)
         
-        p.setJointMotorControlArray(self.robot.model.uid, self.robot.joint_idx_arm, p.VELOCITY_CONTROL, targetVelocities=list(self.q_dot_optimal[:7]))
+        with self.profiler.Stage('motor_command'):
+            p.setJointMotorControlArray(self.robot.model.uid, self.robot.joint_idx_fingers, p.TORQUE_CONTROL, forces=[-25.0]*2, physicsClientId=self._physics_client)
+            
+            p.setJointMotorControlArray(self.robot.model.uid, self.robot.joint_idx_arm, p.VELOCITY_CONTROL, targetVelocities=list(self.q_dot_optimal[:7]), physicsClientId=self._physics_client)
         
-        self.robot._world.step_one()
-        self.robot._world.sleep(self.robot._world.T_s)
+        self.StepPhysics()
         
                 
         
@@ -8,6 +8,7 @@ from cvxopt import matrix, solvers
 from quadprog import solve_qp
 
 from highlevel_planning.sim.controllers.controller import ControllerTemplate
+from highlevel_planning.sim.controllers.qp_workspace import QPWorkspace
 
 EPS = 1e-6
 DEBUG = True
@@ -24,9 +25,16 @@ DEBUG = True
 
 class Controller(ControllerTemplate):
 
-    def __init__(self, scene, robot, time_step, noCollision=True):
+    def __init__(self, scene, robot, time_step, noCollision=True, qp_backend='quadprog'):
     
         super(Controller, self).__init__(scene, robot, time_step)
+        
+        self.qp = QPWorkspace(self, backend=qp_backend)
+        
+        #----- The mass matrix is only used by the torque minimization (task 2), 
+        # which is disabled in PerformOneStep -----
+        
+        self.needs_mass_matrix = False
              
         self.noCollision = noCollision
         
@@ -43,44 +51,10 @@ class Controller(ControllerTemplate):
 #-------
     def PrepareTask1(self, J_b_ee, vdesEE_b, M, b, q, q_dot, tau_prev):
         
-        #----- Joint impedance parameters taken from the franka_ros package -----
-    
-        Kp = np.zeros((7,7))
-        Kp[0, 0] = 600
-        Kp[1, 1] = 600
-        Kp[2, 2] = 600
-        Kp[3, 3] = 600
-        Kp[4, 4] = 250
-        Kp[5, 5] = 150
-        Kp[6, 6] = 50
-        
-        Kd = np.zeros((7,7))
-        Kd[0, 0] = 50
-        Kd[1, 1] = 50
-        Kd[2, 2] = 50
-        Kd[3, 3] = 20
-        Kd[4, 4] = 20
-        Kd[5, 5] = 20
-        Kd[6, 6] = 10
-        
-        Aux = Kp*self.dt + Kd
-        
-        A = J_b_ee
-        y = vdesEE_b
+        #----- The matrices are preallocated in the QP workspace and only the
+        # state dependent parts are updated in place -----
         
-        G1 = np.matmul(np.transpose(A), A) + 0.0001**2*np.eye(len(q))
-        a1 = np.matmul(np.transpose(A), y)        
-        
-        C1 = np.transpose(np.concatenate((Aux, -Aux, np.eye(len(q)), -np.eye(len(q))), axis=0))
-        
-        ineq1 = -self.torque_max[:len(q)] - b + np.matmul(Kd, q_dot)
-        ineq2 = -self.torque_max[:len(q)] + b - np.matmul(Kd, q_dot)
-        ineq3 = np.maximum(np.maximum(self.q_dot_min[:len(q)], (1/self.dt)*(self.q_min[:len(q)] - q)), self.dt*self.q_dot_dot_min + q_dot)
-        ineq4 = -np.minimum(np.minimum(self.q_dot_max[:len(q)], (1/self.dt)*(self.q_max[:len(q)] - q)), self.dt*self.q_dot_dot_max + q_dot)
-        
-        b1 = np.concatenate((ineq1, ineq2, ineq3, ineq4), axis=0)
-        
-        return G1, a1, C1, b1
+        return self.qp.UpdateTask1(J_b_ee, vdesEE_b, b, q, q_dot)
         
 #-------
     def PrepareTask2(self, M, b, q, q_dot, tau_prev, sol1, Null1):
@@ -94,23 +68,8 @@ class Controller(ControllerTemplate):
         
         #-----------------------
     
-        Kp = np.zeros((7,7))
-        Kp[0, 0] = 600
-        Kp[1, 1] = 600
-        Kp[2, 2] = 600
-        Kp[3, 3] = 600
-        Kp[4, 4] = 250
-        Kp[5, 5] = 150
-        Kp[6, 6] = 50
-        
-        Kd = np.zeros((7,7))
-        Kd[0, 0] = 50
-        Kd[1, 1] = 50
-        Kd[2, 2] = 50
-        Kd[3, 3] = 20
-        Kd[4, 4] = 20
-        Kd[5, 5] = 20
-        Kd[6, 6] = 10
+        Kp = self.qp.Kp
+        Kd = self.qp.Kd
         
         A = Null1
         
@@ -141,9 +100,9 @@ class Controller(ControllerTemplate):
         
         vdesEE_b = np.concatenate((vLindesEE_b, vAngdesEE_b), axis=0)
         
-        G1, a1, C1, b1 = self.PrepareTask1(J_b_ee, vdesEE_b[:J_b_ee.shape[0]], M, b, q, q_dot, tau_prev)
+        self.PrepareTask1(J_b_ee, vdesEE_b[:J_b_ee.shape[0]], M, b, q, q_dot, tau_prev)
         
-        sol1,_,_,_,_,_ = solve_qp(G1, a1, C1, b1)
+        sol1 = self.qp.SolveTask1()
         
         q_dot_optimal = np.array(sol1)
 
@@ -199,29 +158,9 @@ class Controller(ControllerTemplate):
             
             scaleFactor = 1.0
             
-        q_dot_des = []
-        gamma = 0.1
-        
-        for i in range(len(self.q_mean[:6])):
-            
-            q_k = q[i]
-            q_mean = self.q_mean[i]
-            sign = np.sign(q_mean - q_k)
-            
-            if sign<0:
-                
-                q_dot_abs = min([abs(self.q_dot_min[i]), gamma*(1/self.dt)*abs(q_mean - q_k)])
-                
-            else:
-                
-                q_dot_abs = min([abs(self.q_dot_max[i]), gamma*(1/self.dt)*abs(q_mean - q_k)])
-
-                
-            q_dot_des.append(sign*q_dot_abs)
-            
-        q_dot_des = np.array(q_dot_des)
+        q_dot_des = self.CenteringJointVel(q)
         
-        vmean = np.matmul(J_b_ee[:2, :6], q_dot_des[:6])
+        vmean = self.CenteringEEVel(J_b_ee, q_dot_des)
         
         if abs(scaleFactor)>0:
             
@@ -261,6 +200,14 @@ class Controller(ControllerTemplate):
                 
         return vLinBase_b, vAngBase_b, vEE_ee                    
                                         
+#-------
+    def HoldCommand(self):
+        
+        #----- The base velocity is given in the base frame, it is re-applied
+        # for the current orientation of the base -----
+        
+        self.robot.velocity_setter()
+        
 #-------            
     def PerformOneStep(self, veldesEE_ee, infoTuple=None):
     
@@ -281,18 +228,20 @@ class Controller(ControllerTemplate):
         b = b[:7]
         J_b_ee = J_b_ee[:, :7]
         
-        vLinBase_b, vAngBase_b, vEE_ee = self.SplitVelocity(veldesEE_ee, J_b_ee, C_O_b, C_O_ee, r_O_ee, v, q)
-        
-        self.q_dot_optimal = self.CalculateDesiredJointVel(vEE_ee, J_b_ee, M, b, q, q_dot, C_O_b, C_O_ee, tau_prev, False)
+        with self.profiler.Stage('velocity_split'):
+            vLinBase_b, vAngBase_b, vEE_ee = self.SplitVelocity(veldesEE_ee, J_b_ee, C_O_b, C_O_ee, r_O_ee, v, q)
         
-        p.setJointMotorControlArray(self.robot.model.uid, self.robot.joint_idx_fingers, p.TORQUE_CONTROL, forces=[-25.0]*2)
+        with self.profiler.Stage('qp_solve'):
+            self.q_dot_optimal = self.CalculateDesiredJointVel(vEE_ee, J_b_ee, M, b, q, q_dot, C_O_b, C_O_ee, tau_prev, False)
         
-        p.setJointMotorControlArray(self.robot.model.uid, self.robot.joint_idx_arm, p.VELOCITY_CONTROL, targetVelocities=list(self.q_dot_optimal[:7]))
-        self.robot.update_velocity(vLinBase_b, vAngBase_b[2])                             
-        self.robot.velocity_setter()        
+        with self.profiler.Stage('motor_command'):
+            p.setJointMotorControlArray(self.robot.model.uid, self.robot.joint_idx_fingers, p.TORQUE_CONTROL, forces=[-25.0]*2, physicsClientId=self._physics_client)
+            
+            p.setJointMotorControlArray(self.robot.model.uid, self.robot.joint_idx_arm, p.VELOCITY_CONTROL, targetVelocities=list(self.q_dot_optimal[:7]), physicsClientId=self._physics_client)
+            self.robot.update_velocity(vLinBase_b, vAngBase_b[2])                             
+            self.robot.velocity_setter()        
         
-        self.robot._world.step_one()
-        self.robot._world.sleep(self.robot._world.T_s)
+        self.StepPhysics()
         
                 
         
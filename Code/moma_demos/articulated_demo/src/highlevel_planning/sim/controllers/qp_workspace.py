@@ -0,0 +1,228 @@
+import numpy as np
+
+from quadprog import solve_qp
+
+EPS = 1e-6
+DEBUG = True
+
+#----- Description -----
+
+# Reusable workspace for the joint velocity QP (task 1) that all the torque
+# constrained velocity controllers solve in every control tick. All the matrices
+# are allocated once and only the state dependent parts (the cost and the bounds
+# ineq1..ineq4) are refreshed in place.
+#
+# Since the joint impedance gains are diagonal, every constraint of the QP acts
+# on a single joint velocity, i.e. the problem is a box constrained QP. The
+# 'active_set' backend exploits this: it starts from the set of joints that were
+# saturated in the previous solution and only solves the reduced system of the
+# free joints. Between two ticks the active set rarely changes, so it typically
+# converges after one or two reduced solves. If it does not converge within
+# 'max_iter' iterations, it falls back to quadprog, hence the result is always
+# the solution of the same QP. The 'quadprog' backend solves every tick from
+# scratch, like the original implementation.
+
+#-----------------------
+
+#----- Joint impedance parameters taken from the franka_ros package -----
+
+KP_DIAG = np.array([600.0, 600.0, 600.0, 600.0, 250.0, 150.0, 50.0])
+KD_DIAG = np.array([50.0, 50.0, 50.0, 20.0, 20.0, 20.0, 10.0])
+
+QP_BACKENDS = ['quadprog', 'active_set']
+
+class QPWorkspace:
+
+    def __init__(self, controller, backend='quadprog', max_iter=10, tol=1e-9):
+
+        if backend not in QP_BACKENDS:
+            raise ValueError("Unknown QP backend: " + str(backend))
+
+        self.controller = controller
+        self.backend = backend
+        self.max_iter = max_iter
+        self.tol = tol
+
+        n = len(KP_DIAG)
+        self.n = n
+
+        self.Kp = np.diag(KP_DIAG)
+        self.Kd = np.diag(KD_DIAG)
+        self.kd_diag = np.copy(KD_DIAG)
+
+        self.SetTimeStep(controller.dt)
+
+        self.G1 = np.zeros((n, n))
+        self.a1 = np.zeros(n)
+        self.b1 = np.zeros(4*n)
+
+        self.ineq1 = self.b1[:n]
+        self.ineq2 = self.b1[n:2*n]
+        self.ineq3 = self.b1[2*n:3*n]
+        self.ineq4 = self.b1[3*n:]
+
+        self.lower = np.zeros(n)
+        self.upper = np.zeros(n)
+        self.x = np.zeros(n)
+        self.grad = np.zeros(n)
+
+        self._kd_q_dot = np.zeros(n)
+        self._tmp = np.zeros(n)
+
+        #----- Previous solution, used for warm starting -----
+
+        self.x_prev = None
+
+        #----- Statistics -----
+
+        self.num_solves = 0
+        self.num_iterations = 0
+        self.num_fallbacks = 0
+
+#-------
+    def SetTimeStep(self, dt):
+
+        #----- The constraint matrix does not depend on the state, only on the
+        # control period. Rebuilt when the control decimation changes -----
+
+        n = self.n
+
+        self.aux_diag = KP_DIAG*dt + KD_DIAG
+
+        Aux = np.diag(self.aux_diag)
+
+        self.C1 = np.ascontiguousarray(np.transpose(np.concatenate((Aux, -Aux, np.eye(n), -np.eye(n)), axis=0)))
+
+#-------
+    def UpdateTask1(self, J_b_ee, vdesEE_b, b, q, q_dot):
+
+        #----- Refreshes the cost and the bounds of task 1 in place -----
+
+        ctrl = self.controller
+        n = self.n
+        dt = ctrl.dt
+
+        np.matmul(np.transpose(J_b_ee), J_b_ee, out=self.G1)
+        self.G1.flat[::n+1] += 0.0001**2
+        np.matmul(np.transpose(J_b_ee), vdesEE_b, out=self.a1)
+
+        np.multiply(self.kd_diag, q_dot, out=self._kd_q_dot)
+
+        # ineq1 = -torque_max - b + Kd*q_dot
+        np.subtract(self._kd_q_dot, b, out=self.ineq1)
+        self.ineq1 -= ctrl.torque_max[:n]
+
+        # ineq2 = -torque_max + b - Kd*q_dot
+        np.subtract(b, self._kd_q_dot, out=self.ineq2)
+        self.ineq2 -= ctrl.torque_max[:n]
+
+        # ineq3 = max(q_dot_min, (q_min - q)/dt, dt*q_dot_dot_min + q_dot)
+        np.subtract(ctrl.q_min[:n], q, out=self._tmp)
+        self._tmp *= 1/dt
+        np.maximum(ctrl.q_dot_min[:n], self._tmp, out=self.ineq3)
+        np.multiply(ctrl.q_dot_dot_min, dt, out=self._tmp)
+        self._tmp += q_dot
+        np.maximum(self.ineq3, self._tmp, out=self.ineq3)
+
+        # ineq4 = -min(q_dot_max, (q_max - q)/dt, dt*q_dot_dot_max + q_dot)
+        np.subtract(ctrl.q_max[:n], q, out=self._tmp)
+        self._tmp *= 1/dt
+        np.minimum(ctrl.q_dot_max[:n], self._tmp, out=self.ineq4)
+        np.multiply(ctrl.q_dot_dot_max, dt, out=self._tmp)
+        self._tmp += q_dot
+        np.minimum(self.ineq4, self._tmp, out=self.ineq4)
+        np.negative(self.ineq4, out=self.ineq4)
+
+        return self.G1, self.a1, self.C1, self.b1
+
+#-------
+    def SolveTask1(self):
+
+        #----- Solves the QP prepared by the last call of UpdateTask1 -----
+
+        self.num_solves += 1
+
+        if self.backend == 'active_set':
+            sol = self.SolveActiveSet()
+        else:
+            sol = self.SolveQuadprog()
+
+        if self.x_prev is None:
+            self.x_prev = np.zeros(self.n)
+
+        self.x_prev[:] = sol
+
+        return sol
+
+#-------
+    def SolveQuadprog(self):
+
+        sol,_,_,_,_,_ = solve_qp(self.G1, self.a1, self.C1, self.b1)
+
+        return sol
+
+#-------
+    def SolveActiveSet(self):
+
+        #----- Bounds on the joint velocities implied by the four constraint blocks -----
+
+        lower = self.lower
+        upper = self.upper
+
+        np.divide(self.ineq1, self.aux_diag, out=lower)
+        np.maximum(lower, self.ineq3, out=lower)
+
+        np.divide(self.ineq2, self.aux_diag, out=upper)
+        np.maximum(upper, self.ineq4, out=upper)
+        np.negative(upper, out=upper)
+
+        #----- Inconsistent bounds are reported by quadprog as before -----
+
+        if np.any(lower > upper) or self.x_prev is None:
+            self.num_fallbacks += 1
+            return self.SolveQuadprog()
+
+        #----- Warm start with the active set of the previous solution -----
+
+        at_lower = self.x_prev <= lower
+        at_upper = np.logical_and(self.x_prev >= upper, np.logical_not(at_lower))
+
+        G = self.G1
+        a = self.a1
+        x = self.x
+        grad = self.grad
+
+        for _ in range(self.max_iter):
+
+            self.num_iterations += 1
+
+            np.copyto(x, lower, where=at_lower)
+            np.copyto(x, upper, where=at_upper)
+
+            free = np.logical_not(np.logical_or(at_lower, at_upper))
+
+            if np.any(free):
+                fixed = np.logical_not(free)
+                rhs = a[free] - np.matmul(G[np.ix_(free, fixed)], x[fixed])
+                x[free] = np.linalg.solve(G[np.ix_(free, free)], rhs)
+
+            np.matmul(G, x, out=grad)
+            grad -= a
+
+            #----- Primal-dual update of the active set. A joint stays at its bound
+            # as long as the multiplier (the gradient) has the right sign, and free
+            # joints that violate a bound are moved to it -----
+
+            new_lower = np.logical_or(np.logical_and(at_lower, grad > -self.tol), x < lower - self.tol)
+            new_upper = np.logical_or(np.logical_and(at_upper, grad < self.tol), x > upper + self.tol)
+            new_upper = np.logical_and(new_upper, np.logical_not(new_lower))
+
+            if np.array_equal(new_lower, at_lower) and np.array_equal(new_upper, at_upper):
+                return np.copy(x)
+
+            at_lower = new_lower
+            at_upper = new_upper
+
+        self.num_fallbacks += 1
+
+        return self.SolveQuadprog()
@@ -0,0 +1,181 @@
+import os
+import numpy as np
+
+from scipy.spatial.transform import Rotation as R
+
+from highlevel_planning.tools.door_opening_util import LatencyProfiler
+from highlevel_planning.sim.surrogate import SurrogateRobot
+from highlevel_planning.tools.trajectory_logger import TrajectoryLogger
+
+EPS = 1e-6
+DEBUG = True
+
+STEP_FILE_NAME = "controller_steps.npz"
+
+#----- Description -----
+
+# Recording and offline replay of the inputs of the controllers. The recorder
+# captures the (veldesEE_ee, infoTuple) stream that SkillTrajectoryPlanning.Run
+# passes to 'PerformOneStep' in every control tick of a reference run, together
+# with the measured position of the arm base (panda_link0), which 'SplitVelocity'
+# reads from the simulator. The stream is saved with the run (STEP_FILE_NAME).
+#
+# The replay feeds the recorded stream through 'SplitVelocity' (moving base
+# controllers only) and 'CalculateDesiredJointVel' of any controller, without a
+# physics server. The motor commands and the physics step of 'PerformOneStep' are
+# skipped, hence the fixed base Cartesian controller, which only commands the
+# built in controller of pybullet, cannot be replayed. The replay is open loop:
+# every controller solves exactly the problems of the recorded run. The
+# controllers keep warm start state between ticks, so the ticks are replayed in
+# order on a fresh controller.
+
+#-----------------------
+
+class ControllerStepRecorder:
+
+    def __init__(self):
+
+        self.logger = None
+
+#-------
+    def Reset(self, controller, num_steps=1000):
+
+        self.logger = TrajectoryLogger(capacity=num_steps)
+
+        self.logger.set_constant('physics_dt', controller.physics_dt)
+        self.logger.set_constant('control_decimation', controller.control_decimation)
+
+#-------
+    def Clear(self):
+
+        #----- Nothing is saved until the next Reset -----
+
+        self.logger = None
+
+#-------
+    def Record(self, veldesEE_ee, infoTuple, r_O_b):
+
+        M, b, J_b_ee, q, q_dot, C_O_b, C_O_ee, r_O_ee, v, tau_prev = infoTuple
+
+        self.logger.record(
+            veldesEE_ee=veldesEE_ee, M=M, b=b, J_b_ee=J_b_ee, q=q, q_dot=q_dot,
+            quat_O_b=C_O_b.as_quat(), r_O_b=r_O_b, quat_O_ee=C_O_ee.as_quat(),
+            r_O_ee=r_O_ee, v=v, tau_prev=tau_prev
+        )
+
+#-------
+    def Save(self, folder_name):
+
+        if self.logger is None:
+            return
+
+        if not os.path.isdir(folder_name):
+            os.makedirs(folder_name)
+
+        np.savez(os.path.join(folder_name, STEP_FILE_NAME), **self.logger.as_dict())
+
+#-----------------------
+
+def LoadControllerSteps(folder_name):
+
+    #----- Returns a dict with the recorded channels of the run saved in folder_name -----
+
+    with np.load(os.path.join(folder_name, STEP_FILE_NAME)) as data:
+        return {name: data[name] for name in data.files}
+
+#-----------------------
+
+class ControllerStepReplay:
+
+    def __init__(self, steps):
+
+        #----- 'steps' are the channels of a recorded run, see LoadControllerSteps -----
+
+        self.veldesEE_ee = np.asarray(steps['veldesEE_ee'], dtype=np.float64)
+        self.M = np.asarray(steps['M'], dtype=np.float64)
+        self.b = np.asarray(steps['b'], dtype=np.float64)
+        self.J_b_ee = np.asarray(steps['J_b_ee'], dtype=np.float64)
+        self.q = np.asarray(steps['q'], dtype=np.float64)
+        self.q_dot = np.asarray(steps['q_dot'], dtype=np.float64)
+        self.r_O_ee = np.asarray(steps['r_O_ee'], dtype=np.float64)
+        self.v = np.asarray(steps['v'], dtype=np.float64)
+        self.tau_prev = np.asarray(steps['tau_prev'], dtype=np.float64)
+        self.r_O_b = np.asarray(steps['r_O_b'], dtype=np.float64)
+
+        self.physics_dt = float(steps['physics_dt'])
+        self.control_decimation = int(steps['control_decimation'])
+
+        self.num_steps = self.v.shape[0]
+
+        #----- The rotations are created once, so that the replay only times the
+        # controllers -----
+
+        self.C_O_b = [R.from_quat(quat) for quat in steps['quat_O_b']]
+        self.C_O_ee = [R.from_quat(quat) for quat in steps['quat_O_ee']]
+
+        #----- Like the surrogate, the replay is not connected to a physics server,
+        # the robot only holds the arm base pose of the replayed tick -----
+
+        self.robot = SurrogateRobot()
+
+#-------
+    def MakeController(self, controller_class, **kwargs):
+
+        #----- A controller for the replay, with the control period of the recorded run -----
+
+        controller = controller_class(None, self.robot, self.physics_dt, **kwargs)
+        controller.SetControlDecimation(self.control_decimation)
+
+        return controller
+
+#-------
+    def Run(self, controller):
+
+        #----- Replays all the ticks through the controller. Returns the commanded
+        # joint velocities and base velocities of every tick, NaN where the solver
+        # failed, and the profiler with the 'velocity_split' and 'qp_solve' timings -----
+
+        q_dot_optimal = np.full((self.num_steps, 7), np.nan)
+        vLinBase_b = np.full((self.num_steps, 3), np.nan)
+
+        profiler = LatencyProfiler()
+        controller.profiler = profiler
+
+        moving_base = hasattr(controller, 'SplitVelocity')
+
+        for k in range(self.num_steps):
+
+            profiler.NextIteration(k)
+
+            self.robot.SetBasePose(self.r_O_b[k], self.C_O_b[k])
+
+            #----- Same slicing as in PerformOneStep -----
+
+            q = self.q[k, :7]
+            q_dot = self.q_dot[k, :7]
+            M = self.M[k, :7, :7]
+            b = self.b[k, :7]
+            J_b_ee = self.J_b_ee[k, :, :7]
+
+            try:
+                if moving_base:
+
+                    with profiler.Stage('velocity_split'):
+                        vLinBase_b[k], _, vEE_ee = controller.SplitVelocity(self.veldesEE_ee[k], J_b_ee, self.C_O_b[k], self.C_O_ee[k], self.r_O_ee[k], self.v[k], q)
+
+                else:
+
+                    vLinBase_b[k] = 0.0
+                    vEE_ee = self.veldesEE_ee[k]
+
+                with profiler.Stage('qp_solve'):
+                    controller.q_dot_optimal = controller.CalculateDesiredJointVel(vEE_ee, J_b_ee, M, b, q, q_dot, self.C_O_b[k], self.C_O_ee[k], self.tau_prev[k], False)
+
+                q_dot_optimal[k] = controller.q_dot_optimal
+
+            except Exception as e:
+
+                if DEBUG:
+                    print("Replay of tick " + str(k) + " failed: " + str(e))
+
+        return q_dot_optimal, vLinBase_b, profiler
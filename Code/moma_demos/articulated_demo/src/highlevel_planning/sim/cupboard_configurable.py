@@ -21,8 +21,8 @@ class Cupboard:
 
         drawer_link_idx = []
         self.handle_link_idx = [0] * 4
-        for i in range(p.getNumJoints(self.model.uid)):
-            info = p.getJointInfo(self.model.uid, i)
+        for i in range(p.getNumJoints(self.model.uid, physicsClientId=world.physics_client)):
+            info = p.getJointInfo(self.model.uid, i, physicsClientId=world.physics_client)
             joint_name = info[1] if type(info[1]) is str else info[1].decode("utf-8")
             # print(info)
             if "drawer_joint" in joint_name and len(joint_name) == 13:
@@ -32,7 +32,8 @@ class Cupboard:
                 self.handle_link_idx[handle_num - 1] = info[16]
         for i in drawer_link_idx:
             p.setJointMotorControl2(
-                self.model.uid, i, controlMode=p.VELOCITY_CONTROL, force=0.0
+                self.model.uid, i, controlMode=p.VELOCITY_CONTROL, force=0.0,
+                physicsClientId=world.physics_client,
             )
 
     def get_info(self):
@@ -49,6 +49,14 @@ class SkillUnconstrainedDirectionEstimation:
         self.objPoseBuffer = deque(maxlen=self.bufferLength)
         self.measuredForcesBuffer = deque(maxlen=self.bufferLength)        
         
+#-------
+    def SetTimeStep(self, time_step):
+    
+        #----- Period of the estimate updates, e.g. the control period with
+        # control decimation -----
+        
+        self.dt = time_step
+        
 #-------
     def SetupEstimationProcedure(self, approached, target_name, link_idx, grasp_id, sk_grasp, sk_nav=None, nav_min_dist=1.0):
     
@@ -101,7 +109,7 @@ class SkillUnconstrainedDirectionEstimation:
 #-------
     def UpdateBuffers(self, f_wristframe, pose):
         print("Pose: "+str(pose))
-        self.objPoseBuffer.append(pose)
+        self.objPoseBuffer.append(np.array(pose))
         self.measuredForcesBuffer.append(np.array(f_wristframe).reshape(3,1))
             
         
@@ -10,6 +10,8 @@ from highlevel_planning.sim.direction_estimators.direction_estimation import Ski
 EPS = 1e-6
 DEBUG = True
 
+PCA_MODES = ['svd', 'rolling']
+
 #----- Description -----
 
 # This class performs the online direction estimation update procedure. It performs 
@@ -18,14 +20,26 @@ DEBUG = True
 # desired end effector velocity (linear + angular) and transfers it to the velocity
 # planner module that performs the velocity split and planning within hardware 
 # constraints.
+#
+# The fixed-grasp based estimate is the principal direction of the buffered
+# object poses. In the 'svd' mode it is computed from the SVD of the centered
+# poses in every tick, in the 'rolling' mode from the 3x3 covariance of the poses,
+# which is updated in O(1) per pose, so the cost does not grow with the buffer
+# length.
 
 #-----------------------
 
 class Estimator(SkillUnconstrainedDirectionEstimation):
 
-    def __init__(self, scene, robot, time_step, buffer_length, init_direction, initN=100, fd1=0.1):
+    def __init__(self, scene, robot, time_step, buffer_length, init_direction, initN=100, fd1=0.1, pca_mode='svd'):
         
         super(Estimator, self).__init__(scene, robot, time_step, buffer_length, init_direction, initN=100)
+        
+        if pca_mode not in PCA_MODES:
+            raise ValueError("Unknown PCA mode: " + str(pca_mode))
+        
+        self.pca_mode = pca_mode
+        self.poseStats = RollingPoseStatistics(buffer_length) if pca_mode == 'rolling' else None
     
         #----- Butterworth filter parameters -----
         
@@ -45,6 +59,31 @@ class Estimator(SkillUnconstrainedDirectionEstimation):
         
         self.SetupButterworthFilter()
         
+#-------
+    def reset(self):
+        
+        super(Estimator, self).reset()
+        
+        if self.poseStats is not None:
+            self.poseStats.Reset()
+            
+#-------
+    def SetTimeStep(self, time_step):
+        
+        #----- The filter coefficients depend on the update period -----
+        
+        super(Estimator, self).SetTimeStep(time_step)
+        
+        self.SetupButterworthFilter()
+        
+#-------
+    def UpdateBuffers(self, f_wristframe, pose):
+        
+        super(Estimator, self).UpdateBuffers(f_wristframe, pose)
+        
+        if self.poseStats is not None:
+            self.poseStats.Push(pose)
+        
 #-------
     def SetupButterworthFilter(self):
         
@@ -63,21 +102,20 @@ class Estimator(SkillUnconstrainedDirectionEstimation):
         
         #----- Fixed-grasp based estimator -----
         
-        sample = np.copy(np.array(self.objPoseBuffer[0]).reshape(1,3))
-        
-        X = np.copy(sample)
-        
-        for i in range(1,len(self.objPoseBuffer)):
+        if self.pca_mode == 'rolling':
             
-            sample = np.copy(np.array(self.objPoseBuffer[i]).reshape(1,3))
-            X = np.concatenate((X, sample), axis=0)
-        
-        data_mean = np.mean(X, axis=0)    
-        X_centered = X - data_mean
-        u, s, vh = LA.svd(X_centered,  full_matrices=False)
-        vh = vh.T
-        
-        v1 = vh[:,0]
+            v1 = self.poseStats.PrincipalDirection()
+            
+        else:
+            
+            X = np.array(self.objPoseBuffer).reshape(-1,3)
+            
+            data_mean = np.mean(X, axis=0)    
+            X_centered = X - data_mean
+            u, s, vh = LA.svd(X_centered,  full_matrices=False)
+            vh = vh.T
+            
+            v1 = vh[:,0]
         
         e = np.sign(np.dot(v1, self.vec))*v1
         
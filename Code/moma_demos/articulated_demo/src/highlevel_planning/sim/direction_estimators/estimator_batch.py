@@ -0,0 +1,206 @@
+import numpy as np
+from numpy import linalg as LA
+
+import math
+
+EPS = 1e-6
+DEBUG = True
+
+#----- Description -----
+
+# Online direction estimation of the Estimator class
+# (direction_estimation_with_filter_and_abs_force_estimation) for a batch of runs
+# that are stepped together, e.g. the runs of the surrogate experiment. The update
+# equations are the same as in 'UpdateEstimate', evaluated for all the runs at
+# once, with the runs along the leading axis of all the arrays. alpha, mixCoeff and
+# fd1 can differ between the runs, the buffer length and initN are shared.
+#
+# The rotations are given as matrices (N, 3, 3). The fixed-grasp based estimate is
+# the principal direction of the buffered poses, computed from their covariance
+# like in the 'rolling' mode of the Estimator: the sums of the poses and of their
+# outer products are updated in O(1) per pose, relative to an origin close to the
+# poses, and recomputed from the buffer once every 'buffer_length' poses.
+
+#-----------------------
+
+class BatchEstimator:
+
+    def __init__(self, time_step, buffer_length, init_direction, num_runs, initN=100, fd1=0.1, alpha=0.1, mixCoeff=0.5):
+
+        #----- init_direction is a direction in the end effector frame, shared by
+        # all the runs (3,) or one per run (N, 3). fd1, alpha and mixCoeff are
+        # scalars or arrays of length N -----
+
+        self.dt = time_step
+        self.bufferLength = int(buffer_length)
+        self.initN = int(initN)
+        self.num_runs = int(num_runs)
+
+        self.initDir = np.array(np.broadcast_to(np.reshape(init_direction, (-1, 3)), (self.num_runs, 3)), dtype=np.float64)
+
+        self.fd1 = np.broadcast_to(np.asarray(fd1, dtype=np.float64), (self.num_runs,))
+        self.alpha = np.broadcast_to(np.asarray(alpha, dtype=np.float64), (self.num_runs,))[:, np.newaxis]
+        self.mixCoeff = np.broadcast_to(np.asarray(mixCoeff, dtype=np.float64), (self.num_runs,))[:, np.newaxis]
+
+        self.SetupButterworthFilter()
+        self.reset()
+
+#-------
+    def reset(self):
+
+        self.directionVector = np.copy(self.initDir)
+        self.counter = 0
+
+        self.vec = None
+
+        self.y_k_1 = np.copy(self.initDir)
+        self.y_k_2 = np.copy(self.initDir)
+        self.x_k_1 = np.copy(self.initDir)
+        self.x_k_2 = np.copy(self.initDir)
+
+        #----- Ring buffer of the poses, the oldest pose is at 'head' once the
+        # buffer is full -----
+
+        self.objPoseBuffer = np.zeros((self.num_runs, self.bufferLength, 3))
+        self.numPoses = 0
+        self.numUpdates = 0
+        self.head = 0
+
+        self.origin = None
+        self.S1 = np.zeros((self.num_runs, 3))
+        self.S2 = np.zeros((self.num_runs, 3, 3))
+
+#-------
+    def SetupButterworthFilter(self):
+
+        wd1 = 2*math.pi*self.fd1
+
+        a = np.tan(0.5*wd1*self.dt)
+        den = a**2 + a*2**0.5 + 1
+
+        self.x_k_coeff = (a**2/den)[:, np.newaxis]
+        self.x_k_1_coeff = 2*self.x_k_coeff
+        self.x_k_2_coeff = self.x_k_coeff
+        self.y_k_1_coeff = (-(2*a**2 - 2)/den)[:, np.newaxis]
+        self.y_k_2_coeff = (-(a**2 - a*2**0.5 + 1)/den)[:, np.newaxis]
+
+#-------
+    def UpdateBuffers(self, f_wristframe, pose):
+
+        #----- The forces are not used by the estimate, the argument only keeps
+        # the interface of the Estimator -----
+
+        pose = np.asarray(pose, dtype=np.float64)
+
+        if self.origin is None:
+            self.origin = np.copy(pose)
+
+        if self.numPoses == self.bufferLength:
+            x_old = self.objPoseBuffer[:, self.head] - self.origin
+            self.S1 -= x_old
+            self.S2 -= x_old[:, :, np.newaxis]*x_old[:, np.newaxis, :]
+        else:
+            self.numPoses += 1
+
+        self.objPoseBuffer[:, self.head] = pose
+        self.head = (self.head + 1) % self.bufferLength
+
+        x = pose - self.origin
+        self.S1 += x
+        self.S2 += x[:, :, np.newaxis]*x[:, np.newaxis, :]
+
+        self.numUpdates += 1
+
+        if self.numUpdates % self.bufferLength == 0:
+            self.Recompute()
+
+#-------
+    def Recompute(self):
+
+        #----- Removes the accumulated rounding errors of the sums and moves the
+        # origin to the mean of the buffer -----
+
+        X = self.objPoseBuffer[:, :self.numPoses]
+
+        self.origin = np.mean(X, axis=1)
+        X = X - self.origin[:, np.newaxis, :]
+
+        self.S1 = np.sum(X, axis=1)
+        self.S2 = np.matmul(np.transpose(X, (0, 2, 1)), X)
+
+#-------
+    def GetDirectionsFromPoses(self):
+
+        #----- Fixed-grasp based estimates of all the runs in the world frame (N, 3) -----
+
+        mean = self.S1/self.numPoses
+        cov = self.S2/self.numPoses - mean[:, :, np.newaxis]*mean[:, np.newaxis, :]
+
+        w, V = LA.eigh(cov)
+        v1 = V[:, :, -1]
+
+        return np.sign(np.sum(v1*self.vec, axis=1))[:, np.newaxis]*v1
+
+#-------
+    def UpdateEstimate(self, f_wristframe, C_O_ee):
+
+        #----- f_wristframe (N, 3) and C_O_ee (N, 3, 3) -----
+
+        self.counter += 1
+
+        #----- Gravity direction in the end effector frame, C_O_ee.inv().apply(e_z) -----
+
+        gravity_dir = C_O_ee[:, 2, :]
+
+        if self.counter == self.initN:
+
+            newest = (self.head - 1) % self.bufferLength
+            oldest = self.head if self.numPoses == self.bufferLength else 0
+
+            self.vec = self.objPoseBuffer[:, newest] - self.objPoseBuffer[:, oldest]
+
+        #----- Haptic based estimator -----
+
+        d = self.directionVector
+
+        error = f_wristframe - d*np.sum(d*f_wristframe, axis=1, keepdims=True)
+        error = error - gravity_dir*np.sum(gravity_dir*error, axis=1, keepdims=True)
+        error = error/LA.norm(error, axis=1, keepdims=True)
+
+        newDirVec = d - self.alpha*error
+        newDirVec = newDirVec/LA.norm(newDirVec, axis=1, keepdims=True)
+
+        if self.counter > self.initN:
+
+            eFromPoses = np.matmul(np.transpose(C_O_ee, (0, 2, 1)), self.GetDirectionsFromPoses()[:, :, np.newaxis])[:, :, 0]
+
+            e = self.mixCoeff*newDirVec + (1.0 - self.mixCoeff)*eFromPoses
+            newDirVec = e/LA.norm(e, axis=1, keepdims=True)
+
+        if self.counter > 3:
+            directionVector = self.x_k_coeff*newDirVec + self.x_k_1_coeff*self.x_k_1 + self.x_k_2_coeff*self.x_k_2 + self.y_k_1_coeff*self.y_k_1 + self.y_k_2_coeff*self.y_k_2
+        else:
+            directionVector = newDirVec
+
+        self.x_k_2 = self.x_k_1
+        self.x_k_1 = newDirVec
+
+        self.y_k_2 = self.y_k_1
+        self.y_k_1 = directionVector
+
+        self.directionVector = directionVector/LA.norm(directionVector, axis=1, keepdims=True)
+
+#-------
+    def GetPlannedVelocities(self, v):
+
+        #----- Desired end effector velocities (N, 6) in the end effector frame,
+        # v is a scalar or an array of length N -----
+
+        vdesEE_ee = np.reshape(v, (-1, 1))*self.directionVector
+
+        return np.concatenate((vdesEE_ee, np.zeros((self.num_runs, 3))), axis=1)
+
+#-------
+    def GetCurrEstimate(self):
+
+        return np.copy(self.directionVector)
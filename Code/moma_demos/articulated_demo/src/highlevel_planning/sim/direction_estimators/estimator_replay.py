@@ -0,0 +1,191 @@
+import numpy as np
+from numpy import linalg as LA
+
+import math
+
+from scipy.spatial.transform import Rotation as R
+
+EPS = 1e-6
+DEBUG = True
+
+#----- Description -----
+
+# Offline replay of the direction estimation of the Estimator class
+# (direction_estimation_with_filter_and_abs_force_estimation) on the wrench and
+# end effector pose streams recorded in a saved run, without the simulator. The
+# update equations are the same as in 'UpdateEstimate', but they are evaluated
+# for a whole set of parameter combinations (alpha, mixCoeff, fd1, buffer_length)
+# at once, with the parameter sets along the leading axis of all the arrays.
+#
+# The replay is open loop: the recorded poses and forces are the ones of the run
+# and do not react to the replayed estimates. The fixed-grasp based estimate only
+# depends on the poses and the buffer length, hence it is computed once for every
+# buffer length from running sums of the poses.
+
+#-----------------------
+
+class EstimatorReplay:
+
+    def __init__(self, run, initN=None, dt=None):
+
+        #----- 'run' is a saved run, e.g. a RunView. initN and dt default to the
+        # values saved with the run -----
+
+        self.f_wristframe = np.reshape(np.asarray(run['f_wristframe'], dtype=np.float64), (-1, 3))
+        self.r_O_ee = np.reshape(np.asarray(run['r_O_ee'], dtype=np.float64), (-1, 3))
+        self.actual_dir = np.reshape(np.asarray(run['actual_dir'], dtype=np.float64), (-1, 3))
+
+        self.init_dir = np.reshape(np.asarray(run['estimator_init_dir'], dtype=np.float64), 3)
+        self.initN = int(run['estimator_initN']) if initN is None else int(initN)
+        self.dt = float(run['estimator_dt']) if dt is None else float(dt)
+
+        self.num_steps = self.f_wristframe.shape[0]
+
+        #----- C_ee_O of every tick as a matrix, i.e. C_O_ee.inv() -----
+
+        C_O_ee = R.from_quat(np.reshape(np.asarray(run['quat_O_ee'], dtype=np.float64), (-1, 4)))
+
+        self.C_ee_O = np.zeros((self.num_steps, 3, 3))
+        for i in range(3):
+            self.C_ee_O[:, :, i] = C_O_ee.apply(np.eye(3)[i], inverse=True)
+
+        self.gravity_dir = self.C_ee_O[:, :, 2]
+
+#-------
+    def GetDirectionsFromPoses(self, buffer_length):
+
+        #----- Fixed-grasp based estimate of every tick in the end effector frame,
+        # shape (num_steps, 3). In tick t, the buffer holds the poses of the ticks
+        # max(0, t-buffer_length) ... t-1 -----
+
+        T = self.num_steps
+        X = self.r_O_ee - np.mean(self.r_O_ee, axis=0)
+
+        S1 = np.zeros((T+1, 3))
+        S2 = np.zeros((T+1, 3, 3))
+        S1[1:] = np.cumsum(X, axis=0)
+        S2[1:] = np.cumsum(X[:, :, np.newaxis]*X[:, np.newaxis, :], axis=0)
+
+        t = np.arange(T)
+        start = np.maximum(0, t - buffer_length)
+        n = np.maximum(t - start, 1)[:, np.newaxis]
+
+        mean = (S1[t] - S1[start])/n
+        cov = (S2[t] - S2[start])/n[:, :, np.newaxis] - mean[:, :, np.newaxis]*mean[:, np.newaxis, :]
+
+        w, V = LA.eigh(cov)
+        v1 = V[:, :, -1]
+
+        #----- The sign is fixed by the displacement over the buffer when the
+        # estimator switches to the fixed-grasp based estimate -----
+
+        if self.initN - 1 < T and self.initN >= 2:
+            t0 = self.initN - 1
+            vec = self.r_O_ee[t0-1] - self.r_O_ee[max(0, t0 - buffer_length)]
+        else:
+            vec = np.zeros(3)
+
+        v1 = np.sign(np.matmul(v1, vec))[:, np.newaxis]*v1
+
+        return np.einsum('tij,tj->ti', self.C_ee_O, v1)
+
+#-------
+    def Run(self, alpha, mixCoeff, fd1, buffer_length):
+
+        #----- Replays the estimator for P parameter sets, every argument is a
+        # scalar or an array of length P. Returns the estimates of every tick in
+        # the world frame, shape (P, num_steps, 3) -----
+
+        alpha, mixCoeff, fd1, buffer_length = np.broadcast_arrays(
+            np.atleast_1d(alpha).astype(np.float64), np.atleast_1d(mixCoeff).astype(np.float64),
+            np.atleast_1d(fd1).astype(np.float64), np.atleast_1d(buffer_length).astype(np.int64)
+        )
+
+        P = len(alpha)
+        T = self.num_steps
+
+        alpha = alpha[:, np.newaxis]
+        mixCoeff = mixCoeff[:, np.newaxis]
+
+        #----- Butterworth filter coefficients, see Estimator.SetupButterworthFilter -----
+
+        wd1 = 2*math.pi*fd1
+        a = np.tan(0.5*wd1*self.dt)
+        den = a**2 + a*2**0.5 + 1
+
+        x_k_coeff = (a**2/den)[:, np.newaxis]
+        x_k_1_coeff = 2*x_k_coeff
+        x_k_2_coeff = x_k_coeff
+        y_k_1_coeff = (-(2*a**2 - 2)/den)[:, np.newaxis]
+        y_k_2_coeff = (-(a**2 - a*2**0.5 + 1)/den)[:, np.newaxis]
+
+        #----- Fixed-grasp based estimates for every buffer length -----
+
+        lengths, length_idx = np.unique(buffer_length, return_inverse=True)
+        eFromPoses = np.stack([self.GetDirectionsFromPoses(L) for L in lengths], axis=0)
+
+        #----- Filter states -----
+
+        directionVector = np.tile(self.init_dir, (P, 1))
+        x_k_1 = np.copy(directionVector)
+        x_k_2 = np.copy(directionVector)
+        y_k_1 = np.copy(directionVector)
+        y_k_2 = np.copy(directionVector)
+
+        e_ee = np.zeros((P, T, 3))
+
+        for t in range(T):
+
+            counter = t + 1
+
+            f = self.f_wristframe[t]
+            g = self.gravity_dir[t]
+
+            #----- Haptic based estimator -----
+
+            error = f[np.newaxis, :] - directionVector*np.matmul(directionVector, f)[:, np.newaxis]
+            error = error - g[np.newaxis, :]*np.matmul(error, g)[:, np.newaxis]
+            error = error/LA.norm(error, axis=1, keepdims=True)
+
+            newDirVec = directionVector - alpha*error
+            newDirVec = newDirVec/LA.norm(newDirVec, axis=1, keepdims=True)
+
+            if counter > self.initN:
+
+                e = mixCoeff*newDirVec + (1.0 - mixCoeff)*eFromPoses[length_idx, t]
+                newDirVec = e/LA.norm(e, axis=1, keepdims=True)
+
+            if counter > 3:
+                directionVector = x_k_coeff*newDirVec + x_k_1_coeff*x_k_1 + x_k_2_coeff*x_k_2 + y_k_1_coeff*y_k_1 + y_k_2_coeff*y_k_2
+            else:
+                directionVector = newDirVec
+
+            x_k_2 = x_k_1
+            x_k_1 = newDirVec
+
+            y_k_2 = y_k_1
+            y_k_1 = directionVector
+
+            directionVector = directionVector/LA.norm(directionVector, axis=1, keepdims=True)
+
+            e_ee[:, t, :] = directionVector
+
+        #----- To the world frame, like the logged 'estimated_dir' -----
+
+        return np.einsum('tji,ptj->pti', self.C_ee_O, e_ee)
+
+#-------
+    def AlignmentMetrics(self, estimated_dir, initL=None):
+
+        #----- Alignment of the estimates (P, num_steps, 3) with the actual
+        # direction, the same metrics as in complete_analysis -----
+
+        initL = self.initN if initL is None else initL
+
+        dot = np.einsum('pti,ti->pt', estimated_dir, self.actual_dir)
+
+        return {
+            "start_rms": np.sqrt(np.mean((1.0 - dot[:, :initL])**2, axis=1)),
+            "mean_dot": np.mean(dot, axis=1),
+            "end_dot": np.mean(dot[:, -20:], axis=1),
+        }
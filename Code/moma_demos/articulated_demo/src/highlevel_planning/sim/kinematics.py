@@ -0,0 +1,297 @@
+import threading
+import xml.etree.ElementTree as ET
+
+import numpy as np
+from scipy.spatial.transform import Rotation as R
+
+
+# Forward kinematics of the arm, either with KDL for single configurations or with
+# NumPy for whole joint trajectories (N x num_joints) in one call, e.g. to validate
+# trajectories or to pre-check the configurations of a sweep. The NumPy chain also
+# gives the geometric Jacobian and the rigid body mass matrix and gravity torques
+# of its links, which the surrogate simulator uses instead of pybullet.
+
+
+class KDLForwardKinematics(object):
+    """
+    Forward kinematics of a KDL chain. The solver keeps internal state while
+    evaluating a configuration, so a solver must not be shared between threads.
+    Every thread gets its own solver and buffers, which are created on the first
+    call from that thread and reused afterwards.
+    """
+
+    def __init__(self, kdl_chain):
+        self.kdl_chain = kdl_chain
+        self.num_joints = kdl_chain.getNrOfJoints()
+        self._local = threading.local()
+
+    def _solver(self):
+        local = self._local
+        if not hasattr(local, "solver"):
+            import PyKDL
+
+            local.solver = PyKDL.ChainFkSolverPos_recursive(self.kdl_chain)
+            local.joints = PyKDL.JntArray(self.num_joints)
+            local.frame = PyKDL.Frame()
+        return local.solver, local.joints, local.frame
+
+    def fk_matrix(self, joint_states):
+        """ Returns the translation and the rotation matrix of the tip frame. """
+        assert len(joint_states) == self.num_joints
+        solver, joints, frame = self._solver()
+        for i in range(self.num_joints):
+            joints[i] = joint_states[i]
+
+        ret = solver.JntToCart(joints, frame)
+        if ret != 0:
+            error_str = solver.strError(ret)
+            raise RuntimeError(f"FK solver returned: {error_str}")
+        transl = np.array([frame.p[i] for i in range(3)])
+        rot_mat = np.array([[frame.M[i, j] for j in range(3)] for i in range(3)])
+        return transl, rot_mat
+
+    def fk(self, joint_states):
+        """ Returns the translation and the orientation (quaternion xyzw) of the tip frame. """
+        transl, rot_mat = self.fk_matrix(joint_states)
+        return transl, R.from_matrix(rot_mat).as_quat()
+
+
+def _origin_trafo(element):
+    trafo = np.eye(4)
+    origin = element.find("origin")
+    if origin is not None:
+        xyz = [float(v) for v in origin.get("xyz", "0 0 0").split()]
+        rpy = [float(v) for v in origin.get("rpy", "0 0 0").split()]
+        # URDF rpy are fixed axis rotations about x, then y, then z
+        trafo[:3, :3] = R.from_euler("xyz", rpy).as_matrix()
+        trafo[:3, 3] = xyz
+    return trafo
+
+
+def _cross(a, b):
+    # Row-wise cross product of N x 3 arrays, np.cross has a large overhead for the
+    # small arrays of a single configuration
+    return np.stack(
+        (
+            a[:, 1] * b[:, 2] - a[:, 2] * b[:, 1],
+            a[:, 2] * b[:, 0] - a[:, 0] * b[:, 2],
+            a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0],
+        ),
+        axis=1,
+    )
+
+
+class ChainForwardKinematics(object):
+    """
+    Vectorized forward kinematics of the serial chain from base_link to tip_link of
+    a URDF file. Supports revolute, continuous, prismatic and fixed joints. The
+    fixed transformations between the joints are merged when the chain is loaded,
+    so evaluating a configuration only costs one product of 4x4 matrices per
+    moving joint, done for all the configurations at once.
+    """
+
+    def __init__(self, urdf_path, base_link, tip_link):
+        root = ET.parse(urdf_path).getroot()
+
+        # URDF files of this project contain joint elements nested in links (for
+        # the visualization), only use the top level joints
+        link_of_name = {link.get("name"): link for link in root.findall("link")}
+        joint_of_child = dict()
+        for joint in root.findall("joint"):
+            joint_of_child[joint.find("child").get("link")] = joint
+
+        chain = []
+        link = tip_link
+        while link != base_link:
+            if link not in joint_of_child:
+                raise ValueError("No chain from " + base_link + " to " + tip_link)
+            joint = joint_of_child[link]
+            chain.append(joint)
+            link = joint.find("parent").get("link")
+        chain.reverse()
+
+        # Merge the fixed trafos: T = F_0 * J_0(q_0) * F_1 * J_1(q_1) * ... * F_n
+        self.joint_names = []
+        self.joint_types = []
+        self.axes = []
+        self.fixed_trafos = []
+
+        # Inertial parameters of the child link of every moving joint, in the frame
+        # of that link. Links attached with fixed joints are not included
+        self.link_masses = []
+        self.link_coms = []
+        self.link_inertias = []
+
+        trafo = np.eye(4)
+        for joint in chain:
+            trafo = np.matmul(trafo, _origin_trafo(joint))
+            joint_type = joint.get("type")
+            if joint_type == "fixed":
+                continue
+            if joint_type not in ("revolute", "continuous", "prismatic"):
+                raise ValueError("Unsupported joint type: " + str(joint_type))
+
+            axis = joint.find("axis")
+            axis = np.array([float(v) for v in axis.get("xyz").split()]) if axis is not None else np.array([1.0, 0.0, 0.0])
+
+            self.joint_names.append(joint.get("name"))
+            self.joint_types.append(joint_type)
+            self.axes.append(axis / np.linalg.norm(axis))
+            self.fixed_trafos.append(trafo)
+            trafo = np.eye(4)
+
+            inertial = link_of_name[joint.find("child").get("link")].find("inertial")
+            if inertial is None:
+                self.link_masses.append(0.0)
+                self.link_coms.append(np.zeros(3))
+                self.link_inertias.append(np.zeros((3, 3)))
+            else:
+                com_trafo = _origin_trafo(inertial)
+                i = inertial.find("inertia")
+                inertia = np.array(
+                    [
+                        [float(i.get("ixx", 0)), float(i.get("ixy", 0)), float(i.get("ixz", 0))],
+                        [float(i.get("ixy", 0)), float(i.get("iyy", 0)), float(i.get("iyz", 0))],
+                        [float(i.get("ixz", 0)), float(i.get("iyz", 0)), float(i.get("izz", 0))],
+                    ]
+                )
+                self.link_masses.append(float(inertial.find("mass").get("value")))
+                self.link_coms.append(com_trafo[:3, 3])
+                self.link_inertias.append(
+                    np.matmul(com_trafo[:3, :3], np.matmul(inertia, com_trafo[:3, :3].T))
+                )
+        self.fixed_trafos.append(trafo)
+
+        self.num_joints = len(self.joint_names)
+
+    def _forward(self, q):
+        # Returns the trafos of the joint frames (before the joint motion) and of the
+        # link frames (after it), both N x num_joints x 4 x 4, and of the tip frame
+        num_configs = q.shape[0]
+
+        joint_frames = np.zeros((num_configs, self.num_joints, 4, 4))
+        link_frames = np.zeros((num_configs, self.num_joints, 4, 4))
+        trafo = np.broadcast_to(self.fixed_trafos[0], (num_configs, 4, 4))
+
+        for i in range(self.num_joints):
+            joint_trafo = np.zeros((num_configs, 4, 4))
+            joint_trafo[:, 3, 3] = 1.0
+            axis = self.axes[i]
+
+            if self.joint_types[i] == "prismatic":
+                joint_trafo[:, 0, 0] = joint_trafo[:, 1, 1] = joint_trafo[:, 2, 2] = 1.0
+                joint_trafo[:, :3, 3] = q[:, i, np.newaxis] * axis
+            else:
+                # Rodrigues' formula
+                c = np.cos(q[:, i])[:, np.newaxis, np.newaxis]
+                s = np.sin(q[:, i])[:, np.newaxis, np.newaxis]
+                skew = np.array(
+                    [
+                        [0.0, -axis[2], axis[1]],
+                        [axis[2], 0.0, -axis[0]],
+                        [-axis[1], axis[0], 0.0],
+                    ]
+                )
+                joint_trafo[:, :3, :3] = c * np.eye(3) + s * skew + (1.0 - c) * np.outer(axis, axis)
+
+            joint_frames[:, i] = trafo
+            trafo = np.matmul(trafo, joint_trafo)
+            link_frames[:, i] = trafo
+            trafo = np.matmul(trafo, self.fixed_trafos[i + 1])
+
+        return joint_frames, link_frames, trafo
+
+    def _prepare(self, joint_states):
+        q = np.asarray(joint_states, dtype=np.float64)
+        single = q.ndim == 1
+        q = np.atleast_2d(q)
+        assert q.shape[1] == self.num_joints
+        return q, single
+
+    def _point_jacobian(self, joint_frames, points, num_joints):
+        # Geometric Jacobian (N x 6 x num_joints) of the points (N x 3), only the
+        # first num_joints joints move the points
+        num_configs = points.shape[0]
+        jac = np.zeros((num_configs, 6, self.num_joints))
+
+        for i in range(num_joints):
+            axis_base = np.matmul(joint_frames[:, i, :3, :3], self.axes[i])
+            if self.joint_types[i] == "prismatic":
+                jac[:, :3, i] = axis_base
+            else:
+                jac[:, :3, i] = _cross(axis_base, points - joint_frames[:, i, :3, 3])
+                jac[:, 3:, i] = axis_base
+        return jac
+
+    def fk_batch(self, joint_states):
+        """
+        Args:
+            joint_states (array): Configurations, shape (N, num_joints) or (num_joints,).
+
+        Returns:
+            Homogeneous transformations of the tip frame, shape (N, 4, 4) or (4, 4).
+        """
+        q, single = self._prepare(joint_states)
+        _, _, trafo = self._forward(q)
+        return trafo[0] if single else trafo
+
+    def jacobian(self, joint_states, tip_offset=None, return_tip=False):
+        """
+        Geometric Jacobian of the tip frame origin, or of the point tip_offset given in
+        the tip frame, expressed in the base frame. Shape (N, 6, num_joints) or
+        (6, num_joints), linear part first. With return_tip, the trafo of the tip frame
+        (as from fk_batch) is returned as well.
+        """
+        q, single = self._prepare(joint_states)
+        joint_frames, _, trafo = self._forward(q)
+        points = trafo[:, :3, 3]
+        if tip_offset is not None:
+            points = points + np.matmul(trafo[:, :3, :3], tip_offset)
+        jac = self._point_jacobian(joint_frames, points, self.num_joints)
+        if single:
+            jac, trafo = jac[0], trafo[0]
+        return (jac, trafo) if return_tip else jac
+
+    def dynamics(self, joint_states, gravity=(0.0, 0.0, -9.81)):
+        """
+        Mass matrix (N x num_joints x num_joints) and gravity torques (N x num_joints)
+        of the links of the chain, with the base at rest and gravity given in the base
+        frame. The gravity torques are the torques that hold the chain against gravity,
+        like an inverse dynamics call with zero joint velocities and accelerations.
+        """
+        q, single = self._prepare(joint_states)
+        joint_frames, link_frames, _ = self._forward(q)
+        num_configs = q.shape[0]
+
+        mass_matrix = np.zeros((num_configs, self.num_joints, self.num_joints))
+        gravity_torques = np.zeros((num_configs, self.num_joints))
+        gravity = np.asarray(gravity, dtype=np.float64)
+
+        for k in range(self.num_joints):
+            if self.link_masses[k] == 0.0:
+                continue
+            rot = link_frames[:, k, :3, :3]
+            com = link_frames[:, k, :3, 3] + np.matmul(rot, self.link_coms[k])
+            jac = self._point_jacobian(joint_frames, com, k + 1)
+            jac_lin = jac[:, :3]
+            jac_ang = jac[:, 3:]
+
+            inertia = np.matmul(rot, np.matmul(self.link_inertias[k], np.transpose(rot, (0, 2, 1))))
+            mass_matrix += self.link_masses[k] * np.matmul(np.transpose(jac_lin, (0, 2, 1)), jac_lin)
+            mass_matrix += np.matmul(np.transpose(jac_ang, (0, 2, 1)), np.matmul(inertia, jac_ang))
+            gravity_torques -= self.link_masses[k] * np.matmul(gravity, jac_lin)
+
+        if single:
+            return mass_matrix[0], gravity_torques[0]
+        return mass_matrix, gravity_torques
+
+    def fk(self, joint_states):
+        """
+        Returns the translations (N, 3) and orientations (quaternions xyzw, N x 4)
+        of the tip frame, or a single translation and orientation for a single
+        configuration.
+        """
+        trafo = self.fk_batch(joint_states)
+        if trafo.ndim == 2:
+            return trafo[:3, 3], R.from_matrix(trafo[:3, :3]).as_quat()
+        return trafo[:, :3, 3], R.from_matrix(trafo[:, :3, :3]).as_quat()
@@ -0,0 +1,152 @@
+import pybullet as p
+import numpy as np
+
+from scipy.spatial.transform import Rotation as R
+
+EPS = 1e-6
+DEBUG = True
+
+#----- Description -----
+
+# This class mimics reading the on-board sensors of the robot in PyBullet. The
+# indices of the motor joints and of the links of interest are looked up once,
+# and every read goes into a preallocated state buffer. Quantities that the
+# active controller does not need (see the 'needs_*' flags of ControllerTemplate)
+# are not computed and set to NaN instead.
+#
+# Note that the arrays of the buffer are overwritten by the next read, hence they
+# have to be copied if they are kept beyond the current control tick.
+
+#-----------------------
+
+class MeasurementBuffer:
+
+    def __init__(self, num_motor_joints):
+
+        n = num_motor_joints
+
+        self.q = np.zeros(n)
+        self.q_dot = np.zeros(n)
+        self.tau = np.zeros(n)
+
+        self.M = np.zeros((n, n))
+        self.b = np.zeros(n)
+        self.J_b_ee = np.zeros((6, n))
+
+        self.r_O_b = np.zeros(3)
+        self.quat_O_b = np.zeros(4)
+        self.r_O_ee = np.zeros(3)
+        self.quat_O_ee = np.zeros(4)
+
+        self.lin_vEE_O = np.zeros(3)
+        self.ang_vEE_O = np.zeros(3)
+        self.lin_vBase_O = np.zeros(3)
+        self.ang_vBase_O = np.zeros(3)
+
+#-----------------------
+
+class MeasurementProviderPybullet:
+
+    def __init__(self, robot):
+
+        self.robot = robot
+        self._physics_client = robot._world.physics_client
+
+        #----- Joint and link indices are fixed once the robot is loaded -----
+
+        self.uid = robot.model.uid
+        self.motor_joint_idx = list(robot.motor_joint_idx)
+        self.wrist_joint_idx = robot.joint_idx_hand
+        self.link_idx = [robot.arm_base_link_idx, robot.link_name_to_index["panda_default_EE"]]
+        self.ee_link_idx = robot.arm_ee_link_idx
+
+        self.num_motor_joints = len(self.motor_joint_idx)
+
+        #----- The wrist sensor is read together with the motor joints -----
+
+        self.read_joint_idx = self.motor_joint_idx + [self.wrist_joint_idx]
+
+        self.zero_vec = [0.0]*self.num_motor_joints
+        self.local_pos = [0.0, 0.0, 0.0]
+
+        self.state = MeasurementBuffer(self.num_motor_joints)
+
+#-------
+    def Read(self, controller=None):
+
+        #----- Reads the current state into the buffer. If a controller is given,
+        # only the dynamic quantities it needs are computed -----
+
+        needs_mass_matrix = True if controller is None else controller.needs_mass_matrix
+        needs_inverse_dynamics = True if controller is None else controller.needs_inverse_dynamics
+        needs_jacobian = True if controller is None else controller.needs_jacobian
+
+        s = self.state
+        n = self.num_motor_joints
+
+        #----- Link poses and velocities -----
+
+        link_states = p.getLinkStates(self.uid, linkIndices=self.link_idx, computeLinkVelocity=1, computeForwardKinematics=True,
+            physicsClientId=self._physics_client
+        )
+
+        s.r_O_b[:] = link_states[0][4]
+        s.quat_O_b[:] = link_states[0][5]
+        s.r_O_ee[:] = link_states[1][4]
+        s.quat_O_ee[:] = link_states[1][5]
+        s.lin_vEE_O[:] = link_states[1][6]
+        s.ang_vEE_O[:] = link_states[1][7]
+
+        lin_vBase_O, ang_vBase_O = p.getBaseVelocity(self.uid, physicsClientId=self._physics_client)
+        s.lin_vBase_O[:] = lin_vBase_O
+        s.ang_vBase_O[:] = ang_vBase_O
+
+        #----- Joint states and wrist forces in one call -----
+
+        joint_states = p.getJointStates(self.uid, self.read_joint_idx, physicsClientId=self._physics_client)
+
+        for i in range(n):
+            s.q[i] = joint_states[i][0]
+            s.q_dot[i] = joint_states[i][1]
+            s.tau[i] = joint_states[i][3]
+
+        f_t = joint_states[n][2]
+        f_wristframe = np.array(f_t[:3])
+        t_wristframe = np.array(f_t[3:])
+
+        #----- Dynamics -----
+
+        q = s.q.tolist()
+
+        if needs_inverse_dynamics:
+            s.b[:] = p.calculateInverseDynamics(self.uid, q, s.q_dot.tolist(), self.zero_vec, physicsClientId=self._physics_client)
+        else:
+            s.b.fill(np.nan)
+
+        if needs_mass_matrix:
+            s.M[:] = p.calculateMassMatrix(self.uid, q, physicsClientId=self._physics_client)
+        else:
+            s.M.fill(np.nan)
+
+        if needs_jacobian:
+            lin, ang = p.calculateJacobian(self.uid, self.ee_link_idx, self.local_pos, q, self.zero_vec, self.zero_vec, physicsClientId=self._physics_client)
+            s.J_b_ee[:3, :] = lin
+            s.J_b_ee[3:, :] = ang
+        else:
+            s.J_b_ee.fill(np.nan)
+
+        return s, f_wristframe, t_wristframe
+
+#-------
+    def GetMeasurements(self, controller=None):
+
+        #----- Returns the measurements in the format of SkillTrajectoryPlanning.GetMeasurements -----
+
+        s, f_wristframe, t_wristframe = self.Read(controller)
+
+        C_O_b = R.from_quat(s.quat_O_b)
+        C_O_ee = R.from_quat(s.quat_O_ee)
+
+        return (s.M, s.b, s.J_b_ee, s.q, s.q_dot, C_O_b, s.r_O_b, C_O_ee, s.r_O_ee, s.tau, s.lin_vEE_O, s.ang_vEE_O, s.lin_vBase_O, s.ang_vBase_O,
+            f_wristframe, t_wristframe
+        )
@@ -28,9 +28,9 @@ class RemovableLid:
         door_link_idx = []
         self.handle_link_idx = [] 
         
-        for i in range(p.getNumJoints(self.model.uid)):
+        for i in range(p.getNumJoints(self.model.uid, physicsClientId=world.physics_client)):
             
-            info = p.getJointInfo(self.model.uid, i)
+            info = p.getJointInfo(self.model.uid, i, physicsClientId=world.physics_client)
             joint_name = info[1] if type(info[1]) is str else info[1].decode("utf-8")
 
             if "lid_joint" in joint_name:
@@ -42,7 +42,8 @@ class RemovableLid:
         for i in door_link_idx:
             
             p.setJointMotorControl2(
-                self.model.uid, i, controlMode=p.VELOCITY_CONTROL, force=0.0
+                self.model.uid, i, controlMode=p.VELOCITY_CONTROL, force=0.0,
+                physicsClientId=world.physics_client,
             )
 
     def get_info(self):
@@ -4,15 +4,14 @@ import numpy as np
 from math import pi as m_pi
 import math
 from highlevel_planning.tools.util import (
-    IKError,
-    quat_from_mat,
     homogenous_trafo,
     invert_hom_trafo,
 )
 from trac_ik_python.trac_ik import IK
 from scipy.spatial.transform import Rotation as R
 from kdl_parser_py.urdf import treeFromFile
-import PyKDL
+from highlevel_planning.sim.kinematics import KDLForwardKinematics, ChainForwardKinematics
+from highlevel_planning.sim.trajectory_ik import TrajectoryIK
 from rc.controllers import CartesianVelocityControllerKDL
 
 
@@ -34,10 +33,20 @@ class RobotArm(object):
             "panda_link0", "panda_link8", urdf_string=urdf_string, solve_type="Speed"
         )
 
+        # Cached IK for single poses and Cartesian paths. Paths are solved at every
+        # ik_sample_steps-th time step and interpolated in between. The cache is
+        # shared by all arms of the process built from the same model
+        self.trajectory_ik = TrajectoryIK(self.ik_solver, cache_name=self.urdf_path)
+        self.ik_sample_steps = 12
+
         # Set up FK solver
         flag, kdl_tree = treeFromFile(self.urdf_path)
         self.kdl_chain = kdl_tree.getChain("panda_link0", "panda_link8")
         self.num_arm_joints = self.kdl_chain.getNrOfJoints()
+        self.fk_solver = KDLForwardKinematics(self.kdl_chain)
+
+        # Vectorized FK of the same chain, for many configurations at once
+        self.chain_fk = ChainForwardKinematics(self.urdf_path, "panda_link0", "panda_link8")
 
         # Specify start command
         self.start_cmd = np.array(
@@ -101,7 +110,7 @@ class RobotArm(object):
     ):
         orient_des_rot = R.from_quat(orient_des)
         pos_ee = pos_des - np.matmul(
-            orient_des_rot.as_dcm(), np.array([0.0, 0.0, 0.103])
+            orient_des_rot.as_matrix(), np.array([0.0, 0.0, 0.103])
         )
 
         current_cmd = np.array(self.get_joints())
@@ -115,18 +124,14 @@ class RobotArm(object):
 
         diff_pos = (pos_ee - current_pos) / float(duration * self._world.f_s)
         diff_orient = (orient_des - current_orient) / float(duration * self._world.f_s)
-        fail_count = 0
-        for i in range(1, int(math.ceil(duration * self._world.f_s))):
-            pos = current_pos + i * diff_pos
-            orient = current_orient + i * diff_orient
-            cmd = self.ik(pos, orient)
-            if cmd.tolist() is None or cmd is None:
-                fail_count += 1
-                if fail_count > 10:
-                    raise IKError
-                continue
-            else:
-                fail_count = 0
+        steps = np.arange(1, int(math.ceil(duration * self._world.f_s)))[:, np.newaxis]
+        path = self.trajectory_ik.solve_path(
+            current_pos + steps * diff_pos,
+            current_orient + steps * diff_orient,
+            current_cmd,
+            self.ik_sample_steps,
+        )
+        for cmd in path:
             self.set_joints(cmd.tolist())
             self._world.step_one()
             self._world.sleep(self._world.T_s)
@@ -137,23 +142,17 @@ class RobotArm(object):
         return True
 
     def transition_function(self, fcn, t_fin):
-        t = 0
-        fail_count = 0
-        while t < t_fin:
-            pos, orient = fcn(t)
-            cmd = self.ik(pos, orient)
-            if np.any(np.equal(cmd, None)) or cmd is None or cmd.tolist() is None:
-                # print("No IK solution found...")
-                fail_count += 1
-                if fail_count > 10:
-                    raise IKError
-                continue
-            else:
-                fail_count = 0
+        poses = [fcn(t) for t in np.arange(0.0, t_fin, self._world.T_s)]
+        path = self.trajectory_ik.solve_path(
+            [pose[0] for pose in poses],
+            [pose[1] for pose in poses],
+            self.get_joints(),
+            self.ik_sample_steps,
+        )
+        for cmd in path:
             self.set_joints(cmd.tolist())
             self._world.step_one()
             self._world.sleep(self._world.T_s)
-            t += self._world.T_s
         pos, orient = fcn(t_fin)
         cmd = self.ik(pos, orient)
         self.set_joints(cmd.tolist())
@@ -168,37 +167,17 @@ class RobotArm(object):
 
     def ik(self, pos, orient):
         seed_state = self.get_joints()
-        orient = orient / np.linalg.norm(orient)
-        sol = self.ik_solver.get_ik(
-            seed_state,
-            pos[0],
-            pos[1],
-            pos[2],
-            orient[0],
-            orient[1],
-            orient[2],
-            orient[3],
-        )
+        sol = self.trajectory_ik.solve(pos, orient, seed_state)
         return np.array(sol)
 
     def fk(self, joint_states):
-        assert len(joint_states) == self.num_arm_joints
         # Inspired by https://github.com/wuphilipp/sawyer_kdl/blob/master/scripts/sawyer_jacobian.py
-        joints = PyKDL.JntArray(self.num_arm_joints)
-        for i in range(len(joint_states)):
-            joints[i] = joint_states[i]
-        frame = PyKDL.Frame()
-
-        # Need to create a new solver every time because somehow the internal state gets messed up
-        kdl_fk_solver = PyKDL.ChainFkSolverPos_recursive(self.kdl_chain)
-        ret = kdl_fk_solver.JntToCart(joints, frame)
-        if ret != 0:
-            error_str = kdl_fk_solver.strError(ret)
-            raise RuntimeError(f"FK solver returned: {error_str}")
-        transl = np.array([val for val in frame.p])
-        rot_mat = np.array([[frame.M[i, j] for j in range(3)] for i in range(3)])
-        orient = quat_from_mat(rot_mat)
-        return transl, orient
+        # The solver is not shared between threads, see KDLForwardKinematics
+        return self.fk_solver.fk(joint_states)
+
+    def fk_batch(self, joint_states):
+        # joint_states is N x num_arm_joints, returns positions N x 3 and orientations N x 4
+        return self.chain_fk.fk(np.reshape(joint_states, (-1, self.num_arm_joints)))
 
     def to_start(self):
         self.transition_cmd_to(self.start_cmd)
@@ -220,12 +199,19 @@ class RobotArmPybullet(RobotArm):
 
         self.model = robot_model
 
+        # All pybullet calls go to the client of the world this robot lives in
+        self._physics_client = self._world.physics_client
+
         self.joint_idx_arm = [1, 2, 3, 4, 5, 6, 7]
         self.joint_idx_fingers = [0, 0]
         self.joint_idx_hand = 0
         self.arm_base_link_idx = -100
         self.arm_ee_link_idx = -100
         self.link_name_to_index = None
+        self.motor_joint_idx = None
+
+        # Cartesian velocity controller, see velocity_controller
+        self._velocity_ctrl = None
 
         # Set up velocity setting for driving
         self._world.velocity_setter = self.velocity_setter
@@ -240,11 +226,15 @@ class RobotArmPybullet(RobotArm):
                 orientation=[0.0, 0.0, 0.0, 1.0],
             )
 
-        self.link_name_to_index = {p.getBodyInfo(self.model.uid)[0]: -1}
+        self.link_name_to_index = {p.getBodyInfo(self.model.uid, physicsClientId=self._physics_client)[0]: -1}
 
-        self.num_joints = p.getNumJoints(self.model.uid)
+        self.num_joints = p.getNumJoints(self.model.uid, physicsClientId=self._physics_client)
+        self.motor_joint_idx = []
         for i in range(self.num_joints):
-            info = p.getJointInfo(self.model.uid, i)
+            info = p.getJointInfo(self.model.uid, i, physicsClientId=self._physics_client)
+            # Joints that are not fixed have a position index
+            if info[3] > -1:
+                self.motor_joint_idx.append(i)
             joint_name = info[1] if type(info[1]) is str else info[1].decode("utf-8")
             # print(joint_name, info[16])  # Use this to print all joint names.
             if "panda_joint" in joint_name and len(joint_name) == 12:
@@ -265,7 +255,7 @@ class RobotArmPybullet(RobotArm):
             self.link_name_to_index[_name] = i
 
         p.enableJointForceTorqueSensor(
-            self.model.uid, self.joint_idx_hand, enableSensor=1
+            self.model.uid, self.joint_idx_hand, enableSensor=1, physicsClientId=self._physics_client
         )
 
         # Force fingers to move symmetrically
@@ -278,8 +268,9 @@ class RobotArmPybullet(RobotArm):
             jointAxis=[1, 0, 0],
             parentFramePosition=[0, 0, 0],
             childFramePosition=[0, 0, 0],
+            physicsClientId=self._physics_client,
         )
-        p.changeConstraint(c, gearRatio=-1, erp=0.1, maxForce=50)
+        p.changeConstraint(c, gearRatio=-1, erp=0.1, maxForce=50, physicsClientId=self._physics_client)
 
         self.apply_colors()
 
@@ -301,7 +292,7 @@ class RobotArmPybullet(RobotArm):
 
     def apply_color(self, link_name, rgba):
         link_idx = self.link_name_to_index[link_name]
-        p.changeVisualShape(self.model.uid, linkIndex=link_idx, rgbaColor=rgba)
+        p.changeVisualShape(self.model.uid, linkIndex=link_idx, rgbaColor=rgba, physicsClientId=self._physics_client)
 
     def set_joints(self, desired):
         if desired is None:
@@ -311,73 +302,101 @@ class RobotArmPybullet(RobotArm):
             self.joint_idx_arm,
             p.POSITION_CONTROL,
             targetPositions=desired,
+            physicsClientId=self._physics_client,
         )
 
-    def task_space_velocity_control(
-        self, velocity_translation, velocity_rotation, num_steps
-    ):
+    def velocity_controller(self):
+        # Built on the first use, parsing the URDF is expensive
+        if self._velocity_ctrl is None:
+            self._velocity_ctrl = CartesianVelocityControllerKDL()
+            self._velocity_ctrl.init_from_urdf_file(self.urdf_path, "panda_link0", "panda_hand")
+        return self._velocity_ctrl
+
+    def stream_task_space_velocity(self, velocity_translation, velocity_rotation):
         """
-        Takes a desired end-effector velocity, computes necessary joint velocities and applies them.
-        Needs to be called at every time step.
+        Applies a desired end-effector velocity (in hand frame) for one time step
+        and steps the simulation. The arm keeps the commanded joint velocities
+        until the next command or until stop_arm is called.
 
-        Args:
-            velocity ([type]): [description]
-            :param num_steps:
-            :param velocity_rotation:
-            :param velocity_translation:
+        Returns:
+            The commanded joint velocities.
         """
+        ctrl = self.velocity_controller()
 
-        ctrl = CartesianVelocityControllerKDL()
-        ctrl.init_from_urdf_file(self.urdf_path, "panda_link0", "panda_hand")
+        mpos, _, _ = self.get_motor_joint_states()
 
-        for _ in range(num_steps):
-            mpos, _, _ = self.get_motor_joint_states()
+        # Convert velocity from hand frame to base frame
+        link_poses = p.getLinkStates(
+            self.model.uid,
+            linkIndices=[
+                self.arm_base_link_idx,
+                self.link_name_to_index["panda_hand"],
+            ],
+            physicsClientId=self._physics_client,
+        )
+        base_r = R.from_quat(link_poses[0][5])
+        ee_r = R.from_quat(link_poses[1][5])
 
-            # Convert velocity from hand frame to base frame
-            link_poses = p.getLinkStates(
-                self.model.uid,
-                linkIndices=[
-                    self.arm_base_link_idx,
-                    self.link_name_to_index["panda_hand"],
-                ],
-            )
-            base_r = R.from_quat(link_poses[0][5])
-            ee_r = R.from_quat(link_poses[1][5])
+        velocity_translation_baseframe = base_r.inv().apply(
+            ee_r.apply(velocity_translation)
+        )
+        velocity_rotation_baseframe = base_r.inv().apply(
+            ee_r.apply(velocity_rotation)
+        )
 
-            velocity_translation_baseframe = base_r.inv().apply(
-                ee_r.apply(velocity_translation)
-            )
-            velocity_rotation_baseframe = base_r.inv().apply(
-                ee_r.apply(velocity_rotation)
-            )
+        cmd = ctrl.compute_command(
+            velocity_translation_baseframe, velocity_rotation_baseframe, mpos[0:7]
+        )
 
-            cmd = ctrl.compute_command(
-                velocity_translation_baseframe, velocity_rotation_baseframe, mpos[0:7]
-            )
+        # Apply them
+        p.setJointMotorControlArray(
+            self.model.uid,
+            self.joint_idx_arm,
+            p.VELOCITY_CONTROL,
+            targetVelocities=list(cmd),
+            physicsClientId=self._physics_client,
+        )
 
-            # Apply them
-            p.setJointMotorControlArray(
-                self.model.uid,
-                self.joint_idx_arm,
-                p.VELOCITY_CONTROL,
-                targetVelocities=list(cmd),
-            )
+        self._world.step_one()
+        self._world.sleep(self._world.T_s)
 
-            self._world.step_one()
-            self._world.sleep(self._world.T_s)
+        return cmd
 
-        # Stop the arm
+    def stop_arm(self):
         p.setJointMotorControlArray(
             self.model.uid,
             self.joint_idx_arm,
             p.VELOCITY_CONTROL,
-            targetVelocities=[0.0] * len(cmd),
+            targetVelocities=[0.0] * len(self.joint_idx_arm),
+            physicsClientId=self._physics_client,
         )
 
+    def task_space_velocity_control(
+        self, velocity_translation, velocity_rotation, num_steps
+    ):
+        """
+        Takes a desired end-effector velocity, computes necessary joint velocities and applies them
+        for num_steps time steps. Stops the arm afterwards.
+
+        Args:
+            velocity_translation: Translational velocity (3,) in hand frame, or one
+                velocity per time step (num_steps x 3).
+            velocity_rotation: Rotational velocity (3,) in hand frame, or one velocity
+                per time step (num_steps x 3).
+            num_steps: Number of time steps.
+        """
+        velocity_translation = np.broadcast_to(velocity_translation, (num_steps, 3))
+        velocity_rotation = np.broadcast_to(velocity_rotation, (num_steps, 3))
+
+        for k in range(num_steps):
+            self.stream_task_space_velocity(velocity_translation[k], velocity_rotation[k])
+
+        self.stop_arm()
+
     def get_joints(self):
         if self.model is None:
             return [0.0] * self.ik_solver.number_of_joints
-        temp = p.getJointStates(self.model.uid, self.joint_idx_arm)
+        temp = p.getJointStates(self.model.uid, self.joint_idx_arm, physicsClientId=self._physics_client)
         pos = [a[0] for a in temp]
         return pos
 
@@ -388,6 +407,7 @@ class RobotArmPybullet(RobotArm):
             self.joint_idx_fingers,
             p.POSITION_CONTROL,
             targetPositions=pos,
+            physicsClientId=self._physics_client,
         )
 
     def close_gripper(self):
@@ -399,24 +419,21 @@ class RobotArmPybullet(RobotArm):
             p.POSITION_CONTROL,
             targetPositions=pos,
             forces=forces,
+            physicsClientId=self._physics_client,
         )
 
     def get_motor_joint_states(self):
+        # The indices of the motor joints are collected once in reset()
         joint_states = p.getJointStates(
-            self.model.uid, range(p.getNumJoints(self.model.uid))
+            self.model.uid, self.motor_joint_idx, physicsClientId=self._physics_client
         )
-        joint_infos = [
-            p.getJointInfo(self.model.uid, i)
-            for i in range(p.getNumJoints(self.model.uid))
-        ]
-        joint_states = [j for j, i in zip(joint_states, joint_infos) if i[3] > -1]
         joint_positions = [state[0] for state in joint_states]
         joint_velocities = [state[1] for state in joint_states]
         joint_torques = [state[3] for state in joint_states]
         return joint_positions, joint_velocities, joint_torques
 
     def check_grasp(self):
-        gripper_state = p.getJointStates(self.model.uid, self.joint_idx_fingers)
+        gripper_state = p.getJointStates(self.model.uid, self.joint_idx_fingers, physicsClientId=self._physics_client)
         assert len(gripper_state) == 2
 
         # dist_threshold = 0.01
@@ -447,7 +464,7 @@ class RobotArmPybullet(RobotArm):
 
     def velocity_setter(self):
         # Determine current robot pose
-        _, orient = p.getBasePositionAndOrientation(self.model.uid)
+        _, orient = p.getBasePositionAndOrientation(self.model.uid, physicsClientId=self._physics_client)
         orient = R.from_quat(orient)
         # euler = orient.as_euler('xyz', degrees=True)
 
@@ -455,16 +472,16 @@ class RobotArmPybullet(RobotArm):
         vel_trans_world = orient.apply(self.velocity_trans)
         
         # vel_rot doesn't need to be converted, since body and world z axis coincide.
-        p.resetBaseVelocity(self.model.uid, vel_trans_world.tolist(), [0.0, 0.0, self.velocity_turn])
+        p.resetBaseVelocity(self.model.uid, vel_trans_world.tolist(), [0.0, 0.0, self.velocity_turn], physicsClientId=self._physics_client)
 
     def get_wrist_force_torque(self):
-        _, _, f_t, _ = p.getJointState(self.model.uid, self.joint_idx_hand)
+        _, _, f_t, _ = p.getJointState(self.model.uid, self.joint_idx_hand, physicsClientId=self._physics_client)
         forces = np.array(f_t[:3])
         torques = np.array(f_t[3:])
         return forces, torques
 
     def get_link_pose(self, link_name):
-        ret = p.getLinkState(self.model.uid, self.link_name_to_index[link_name])
+        ret = p.getLinkState(self.model.uid, self.link_name_to_index[link_name], physicsClientId=self._physics_client)
         pos = np.array(ret[4])
         orient = np.array(ret[5])
         return pos, orient
@@ -0,0 +1,514 @@
+import os
+import numpy as np
+from numpy import linalg as LA
+
+from scipy.spatial.transform import Rotation as R
+
+from highlevel_planning.sim.kinematics import ChainForwardKinematics
+
+EPS = 1e-6
+DEBUG = True
+
+OBJECT_JOINT_TYPES = ['prismatic', 'revolute']
+
+#----- Description -----
+
+# Pure NumPy surrogate of the door opening experiment, for testing and tuning the
+# direction estimators and the velocity planners without pybullet. A batch of N
+# runs is simulated at once: every state is an array with the runs along the
+# leading axis, and the rotations are matrices (N, 3, 3). The robot is kinematic:
+# the commanded arm joint velocities and base velocities are integrated exactly.
+# The grasped handle is a point on a prismatic or revolute joint with mass (m),
+# viscous damping (beta) and Coulomb friction (f), and it is coupled to the end
+# effector by a spring. The spring force is what the wrist sensor reads. The
+# stiffness of the spring along the motion of the handle is 'c1c2' times the
+# stiffness across it.
+#
+# The measurements have the same channels as SkillTrajectoryPlanning.GetMeasurements
+# (9 motor joints, with the fingers at rest), for all the runs. The Jacobian, the
+# mass matrix and the gravity torques are computed from the arm links of the URDF,
+# the Coriolis terms and the hand and fingers are neglected.
+#
+# The closed loop runs with a BatchEstimator. The commands come from a resolved
+# rate law of the arm for all the runs at once, from a batched 'command_fcn', or
+# from one controller of the repo per run (see MakeController), through
+# 'SplitVelocity' and 'CalculateDesiredJointVel' like in the replay of recorded
+# runs. The controllers solve one problem per run and tick, hence this is the
+# slow path.
+
+#-----------------------
+
+def _Apply(C, v):
+
+    #----- Rotates the vectors v (N, 3) with the matrices C (N, 3, 3) -----
+
+    return np.matmul(C, v[:, :, np.newaxis])[:, :, 0]
+
+def _ApplyInverse(C, v):
+
+    return np.matmul(v[:, np.newaxis, :], C)[:, 0, :]
+
+#-----------------------
+
+class ArticulatedObjectModel:
+
+    def __init__(self, joint_type='prismatic', axis=(1.0, 0.0, 0.0), hinge_offset=(0.0, 0.4, 0.0), m=1.0, beta=5.0, f=1.0,
+        stiffness=2000.0, c1c2=1.0, joint_limits=(0.0, np.inf), num_runs=None):
+
+        #----- For a prismatic joint, 'axis' is the direction of motion of the
+        # handle. For a revolute joint, it is the hinge axis and 'hinge_offset' is
+        # the vector from the handle to the hinge. Both are given in the world
+        # frame, the object is placed at the handle in 'Reset'.
+        #
+        # Every parameter is either shared by all the runs or given per run:
+        # joint_type a string or N strings, axis and hinge_offset (3,) or (N, 3),
+        # joint_limits (2,) or (N, 2), the others scalars or arrays of length N.
+        # num_runs defaults to the number of runs of the parameters -----
+
+        joint_type = np.atleast_1d(joint_type)
+
+        for name in np.unique(joint_type):
+            if name not in OBJECT_JOINT_TYPES:
+                raise ValueError("Unknown object joint type: " + str(name))
+
+        axis = np.reshape(np.asarray(axis, dtype=np.float64), (-1, 3))
+        hinge_offset = np.reshape(np.asarray(hinge_offset, dtype=np.float64), (-1, 3))
+        joint_limits = np.reshape(np.asarray(joint_limits, dtype=np.float64), (-1, 2))
+        scalars = [np.atleast_1d(np.asarray(x, dtype=np.float64)) for x in (m, beta, f, stiffness, c1c2)]
+
+        if num_runs is None:
+            num_runs = max([len(joint_type), len(axis), len(hinge_offset), len(joint_limits)] + [len(x) for x in scalars])
+
+        self.num_runs = num_runs
+
+        N = self.num_runs
+
+        self.revolute = np.broadcast_to(joint_type == 'revolute', (N,)).copy()
+        self.axis = np.broadcast_to(axis/LA.norm(axis, axis=1, keepdims=True), (N, 3)).copy()
+
+        self.m, self.beta, self.f, self.stiffness, self.c1c2 = [np.broadcast_to(x, (N,)).copy() for x in scalars]
+        self.joint_limits = np.broadcast_to(joint_limits, (N, 2)).copy()
+
+        #----- Only the part of the offset orthogonal to the hinge axis matters.
+        # The lever of a prismatic joint is 1 -----
+
+        hinge_offset = np.broadcast_to(hinge_offset, (N, 3))
+
+        self.hinge_offset = hinge_offset - np.sum(hinge_offset*self.axis, axis=1, keepdims=True)*self.axis
+        self.radius = np.where(self.revolute, LA.norm(self.hinge_offset, axis=1), 1.0)
+
+        self.handle0 = np.zeros((N, 3))
+        self.s = np.zeros(N)
+        self.s_dot = np.zeros(N)
+
+#-------
+    def Reset(self, handle_pos, s=0.0, s_dot=0.0):
+
+        #----- handle_pos (N, 3) is the position of the handle at s = 0 -----
+
+        self.handle0 = np.array(np.broadcast_to(handle_pos, (self.num_runs, 3)), dtype=np.float64)
+        self.s = np.array(np.broadcast_to(s, (self.num_runs,)), dtype=np.float64)
+        self.s_dot = np.array(np.broadcast_to(s_dot, (self.num_runs,)), dtype=np.float64)
+
+#-------
+    def RotatedOffset(self):
+
+        #----- The hinge offset rotated about the hinge axis by s. The offset is
+        # orthogonal to the axis, so Rodrigues' formula has no axial term -----
+
+        c = np.cos(self.s)[:, np.newaxis]
+        s = np.sin(self.s)[:, np.newaxis]
+
+        return c*self.hinge_offset + s*np.cross(self.axis, self.hinge_offset)
+
+#-------
+    def HandlePosition(self):
+
+        prismatic = self.handle0 + self.s[:, np.newaxis]*self.axis
+        revolute = self.handle0 + self.hinge_offset - self.RotatedOffset()
+
+        return np.where(self.revolute[:, np.newaxis], revolute, prismatic)
+
+#-------
+    def Tangent(self):
+
+        #----- Unit direction in which the handle moves for increasing s -----
+
+        revolute = np.cross(self.axis, -self.RotatedOffset())/self.radius[:, np.newaxis]
+
+        return np.where(self.revolute[:, np.newaxis], revolute, self.axis)
+
+#-------
+    def GraspForce(self, r_O_ee):
+
+        #----- Force of the end effector on the handle, in the world frame -----
+
+        t = self.Tangent()
+        d = r_O_ee - self.HandlePosition()
+        d_t = np.sum(d*t, axis=1, keepdims=True)*t
+
+        return self.stiffness[:, np.newaxis]*(self.c1c2[:, np.newaxis]*d_t + (d - d_t))
+
+#-------
+    def Step(self, force_O, dt):
+
+        #----- Semi-implicit Euler step of the joints under the forces on the
+        # handles. The damping is treated implicitly, the friction can stop a joint
+        # but never reverses its motion -----
+
+        lever = self.radius
+
+        inertia = self.m*lever**2
+        friction = self.f*lever
+
+        impulse = inertia*self.s_dot + dt*lever*np.sum(force_O*self.Tangent(), axis=1)
+        impulse = np.where(np.abs(impulse) <= dt*friction, 0.0, impulse - np.sign(impulse)*dt*friction)
+
+        self.s_dot = impulse/(inertia + dt*self.beta)
+        self.s = self.s + dt*self.s_dot
+
+        at_limit = (self.s < self.joint_limits[:, 0]) | (self.s > self.joint_limits[:, 1])
+
+        self.s = np.clip(self.s, self.joint_limits[:, 0], self.joint_limits[:, 1])
+        self.s_dot = np.where(at_limit, 0.0, self.s_dot)
+
+#-----------------------
+
+class _SurrogateWorld:
+
+    #----- The surrogate is not connected to a physics server -----
+
+    physics_client = None
+
+#-----------------------
+
+class SurrogateRobot:
+
+    #----- The parts of the robot that the controllers read outside of the motor
+    # commands, with the arm base pose of the current tick -----
+
+    def __init__(self):
+
+        self._world = _SurrogateWorld()
+
+        self.r_O_b = np.zeros(3)
+        self.C_O_b = R.identity()
+
+#-------
+    def SetBasePose(self, r_O_b, C_O_b):
+
+        self.r_O_b = r_O_b
+        self.C_O_b = C_O_b
+
+#-------
+    def convert_pos_to_robot_frame(self, r_O_O_target):
+
+        #----- Same result as RobotArm.convert_pos_to_robot_frame (homogeneous) -----
+
+        return np.append(self.C_O_b.apply(np.asarray(r_O_O_target) - self.r_O_b, inverse=True), 1.0)
+
+#-----------------------
+
+class SurrogateDoorOpening:
+
+    def __init__(self, obj, base_dir, time_step=1.0/240.0, q_init=None, r_O_b=(0.0, 0.0, 0.49), yaw_b=0.0,
+        force_noise=0.05, seed=0):
+
+        #----- One run per run of 'obj'. q_init (7,) or (N, 7), r_O_b (3,) or
+        # (N, 3) and yaw_b are shared by the runs or given per run -----
+
+        self.obj = obj
+        self.num_runs = obj.num_runs
+        self.dt = time_step
+
+        urdf_path = os.path.join(base_dir, "data/models/box_panda_hand_pb.urdf")
+        self.chain = ChainForwardKinematics(urdf_path, "panda_link0", "panda_link8")
+
+        #----- Pose of panda_default_EE in panda_link8, see the URDF -----
+
+        self.C_8_ee = R.from_euler('z', -0.25*np.pi).as_matrix()
+        self.r_8_ee = np.array([0.0, 0.0, 0.103])
+
+        self.num_motor_joints = self.chain.num_joints + 2
+
+        N = self.num_runs
+
+        q_init = np.array([0.0, -np.pi/4.0, 0.0, -3.0*np.pi/4.0, 0.0, np.pi/2.0, np.pi/4.0]) if q_init is None else np.asarray(q_init, dtype=np.float64)
+
+        self.q_init = np.broadcast_to(q_init, (N, self.chain.num_joints)).copy()
+        self.r_O_b_init = np.broadcast_to(np.asarray(r_O_b, dtype=np.float64), (N, 3)).copy()
+        self.yaw_b_init = np.broadcast_to(np.asarray(yaw_b, dtype=np.float64), (N,)).copy()
+
+        self.q_dot_max = np.array([2.1750, 2.1750, 2.1750, 2.1750, 2.6100, 2.6100, 2.6100])
+
+        #----- Standard deviation [N] of the noise of the wrist force sensor. The
+        # estimators normalize the force error, so they need a nonzero force even
+        # while the grasp spring is at rest -----
+
+        self.force_noise = force_noise
+        self.seed = seed
+
+        self.Reset()
+
+#-------
+    def Reset(self):
+
+        #----- Puts the robots to their initial state and the handles of the
+        # objects into the end effectors -----
+
+        N = self.num_runs
+
+        self.rng = np.random.default_rng(self.seed)
+
+        self.q = np.zeros((N, self.num_motor_joints))
+        self.q[:, :7] = self.q_init
+        self.q_dot = np.zeros((N, self.num_motor_joints))
+
+        self.r_O_b = np.copy(self.r_O_b_init)
+        self.yaw_b = np.copy(self.yaw_b_init)
+        self.vLinBase_b = np.zeros((N, 3))
+        self.vAngBase = np.zeros(N)
+
+        self.Kinematics()
+        self.obj.Reset(self.r_O_ee)
+
+#-------
+    def Kinematics(self):
+
+        #----- Updates the poses, the Jacobians and the end effector velocities -----
+
+        n = self.chain.num_joints
+        N = self.num_runs
+
+        c = np.cos(self.yaw_b)
+        s = np.sin(self.yaw_b)
+
+        self.C_O_b = np.zeros((N, 3, 3))
+        self.C_O_b[:, 0, 0] = c
+        self.C_O_b[:, 0, 1] = -s
+        self.C_O_b[:, 1, 0] = s
+        self.C_O_b[:, 1, 1] = c
+        self.C_O_b[:, 2, 2] = 1.0
+
+        J_ee, T_b_8 = self.chain.jacobian(self.q[:, :n], tip_offset=self.r_8_ee, return_tip=True)
+
+        C_b_8 = T_b_8[:, :3, :3]
+
+        C_b_ee = np.matmul(C_b_8, self.C_8_ee)
+        r_b_ee = T_b_8[:, :3, 3] + np.matmul(C_b_8, self.r_8_ee)
+
+        self.C_O_ee = np.matmul(self.C_O_b, C_b_ee)
+        self.r_O_ee = self.r_O_b + _Apply(self.C_O_b, r_b_ee)
+
+        #----- The fingers do not move the end effector -----
+
+        self.J_b_ee = np.zeros((N, 6, self.num_motor_joints))
+        self.J_b_ee[:, :, :n] = J_ee
+
+        vEE_b = np.matmul(J_ee, self.q_dot[:, :n, np.newaxis])[:, :, 0]
+
+        lin_vBase_O = _Apply(self.C_O_b, self.vLinBase_b)
+        ang_vBase_O = np.zeros((N, 3))
+        ang_vBase_O[:, 2] = self.vAngBase
+
+        self.lin_vEE_O = lin_vBase_O + _Apply(self.C_O_b, vEE_b[:, :3]) + np.cross(ang_vBase_O, self.r_O_ee - self.r_O_b)
+        self.ang_vEE_O = ang_vBase_O + _Apply(self.C_O_b, vEE_b[:, 3:])
+
+#-------
+    def GetMeasurements(self, controllers=None, dynamics=True):
+
+        #----- Same channels as SkillTrajectoryPlanning.GetMeasurements, for all
+        # the runs, with the rotations as matrices. Like the pybullet
+        # measurements, the dynamics are only computed if a controller needs
+        # them, and not at all without 'dynamics' -----
+
+        n = self.chain.num_joints
+        N = self.num_runs
+
+        needs_dynamics = dynamics and (controllers is None or any(c.needs_mass_matrix or c.needs_inverse_dynamics for c in controllers))
+
+        M = np.full((N, self.num_motor_joints, self.num_motor_joints), np.nan)
+        b = np.full((N, self.num_motor_joints), np.nan)
+        tau = np.zeros((N, self.num_motor_joints))
+
+        force_O = self.obj.GraspForce(self.r_O_ee)
+
+        #----- Joint torques that push the handles with force_O -----
+
+        tau[:, :n] = _ApplyInverse(self.J_b_ee[:, :3, :n], _ApplyInverse(self.C_O_b, force_O))
+
+        if needs_dynamics:
+            M_arm, g_arm = self.chain.dynamics(self.q[:, :n])
+            M = np.tile(np.eye(self.num_motor_joints), (N, 1, 1))
+            M[:, :n, :n] = M_arm
+            b = np.zeros((N, self.num_motor_joints))
+            b[:, :n] = g_arm
+            tau[:, :n] += g_arm
+
+        f_wristframe = _ApplyInverse(self.C_O_ee, force_O) + self.force_noise*self.rng.standard_normal((N, 3))
+        t_wristframe = np.zeros((N, 3))
+
+        ang_vBase_O = np.zeros((N, 3))
+        ang_vBase_O[:, 2] = self.vAngBase
+
+        return (M, b, np.copy(self.J_b_ee), np.copy(self.q), np.copy(self.q_dot), np.copy(self.C_O_b), np.copy(self.r_O_b), np.copy(self.C_O_ee),
+            np.copy(self.r_O_ee), tau, np.copy(self.lin_vEE_O), np.copy(self.ang_vEE_O), _Apply(self.C_O_b, self.vLinBase_b), ang_vBase_O,
+            f_wristframe, t_wristframe
+        )
+
+#-------
+    def GetInfoTuples(self, measurements, v):
+
+        #----- The infoTuples that SkillTrajectoryPlanning.Run passes to
+        # PerformOneStep, one per run, with scipy rotations -----
+
+        M, b, J_b_ee, q, q_dot, C_O_b, r_O_b, C_O_ee, r_O_ee, mtorq = measurements[:10]
+
+        C_O_b = R.from_matrix(C_O_b)
+        C_O_ee = R.from_matrix(C_O_ee)
+        v = np.broadcast_to(v, (self.num_runs,))
+
+        return [(M[i], b[i], J_b_ee[i], q[i], q_dot[i], C_O_b[i], C_O_ee[i], r_O_ee[i], v[i], mtorq[i, :7]) for i in range(self.num_runs)]
+
+#-------
+    def GetActualDirection(self):
+
+        return self.obj.Tangent()
+
+#-------
+    def ApplyCommand(self, q_dot_arm, vLinBase_b=None, vAngBase=0.0):
+
+        n = self.chain.num_joints
+
+        self.q_dot[:, :n] = np.clip(np.reshape(q_dot_arm, (self.num_runs, -1))[:, :n], -self.q_dot_max, self.q_dot_max)
+        self.vLinBase_b = np.zeros((self.num_runs, 3)) if vLinBase_b is None else np.array(np.broadcast_to(vLinBase_b, (self.num_runs, 3)), dtype=np.float64)
+        self.vAngBase = np.array(np.broadcast_to(vAngBase, (self.num_runs,)), dtype=np.float64)
+
+#-------
+    def Step(self):
+
+        #----- Integrates the commanded velocities over one time step, then moves
+        # the objects under the forces of the end effectors -----
+
+        n = self.chain.num_joints
+
+        self.q[:, :n] += self.dt*self.q_dot[:, :n]
+        self.r_O_b += self.dt*_Apply(self.C_O_b, self.vLinBase_b)
+        self.yaw_b += self.dt*self.vAngBase
+
+        self.Kinematics()
+
+        self.obj.Step(self.obj.GraspForce(self.r_O_ee), self.dt)
+
+#-------
+    def ResolvedRateCommand(self, veldesEE_ee, damping=1e-3):
+
+        #----- Arm joint velocities (N, 7) for the desired end effector velocities
+        # (N, 6) in the end effector frame, with damped least squares. The bases
+        # stand still -----
+
+        n = self.chain.num_joints
+
+        C_b_ee = np.matmul(np.transpose(self.C_O_b, (0, 2, 1)), self.C_O_ee)
+        vEE_b = np.concatenate((_Apply(C_b_ee, veldesEE_ee[:, :3]), _Apply(C_b_ee, veldesEE_ee[:, 3:])), axis=1)
+
+        J = self.J_b_ee[:, :, :n]
+        JJt = np.matmul(J, np.transpose(J, (0, 2, 1))) + damping*np.eye(6)
+
+        return _ApplyInverse(J, LA.solve(JJt, vEE_b[:, :, np.newaxis])[:, :, 0])
+
+#-------
+    def MakeController(self, controller_class, **kwargs):
+
+        #----- A controller of the repo for one run of the surrogate. It reads
+        # the arm base pose from a SurrogateRobot, which is updated in every tick -----
+
+        return controller_class(None, SurrogateRobot(), self.dt, **kwargs)
+
+#-------
+    def ControllerCommand(self, controllers, veldesEE_ee, infoTuples):
+
+        #----- Commands of one controller per run, made by MakeController, with
+        # the same slicing as in PerformOneStep. Returns (q_dot_arm, vLinBase_b,
+        # vAngBase) of all the runs -----
+
+        N = self.num_runs
+
+        q_dot_arm = np.zeros((N, 7))
+        vLinBase_b = np.zeros((N, 3))
+        vAngBase = np.zeros(N)
+
+        for i, (controller, infoTuple) in enumerate(zip(controllers, infoTuples)):
+
+            M, b, J_b_ee, q, q_dot, C_O_b, C_O_ee, r_O_ee, v, tau_prev = infoTuple
+
+            q = q[:7]
+            q_dot = q_dot[:7]
+            M = M[:7, :7]
+            b = b[:7]
+            J_b_ee = J_b_ee[:, :7]
+
+            controller.robot.SetBasePose(self.r_O_b[i], C_O_b)
+
+            if hasattr(controller, 'SplitVelocity'):
+                vLinBase_b[i], vAngBase_b, vEE_ee = controller.SplitVelocity(veldesEE_ee[i], J_b_ee, C_O_b, C_O_ee, r_O_ee, v, q)
+                vAngBase[i] = vAngBase_b[2]
+            else:
+                vEE_ee = veldesEE_ee[i]
+
+            controller.q_dot_optimal = controller.CalculateDesiredJointVel(vEE_ee, J_b_ee, M, b, q, q_dot, C_O_b, C_O_ee, tau_prev, False)
+
+            q_dot_arm[i] = np.squeeze(controller.q_dot_optimal)[:7]
+
+        return q_dot_arm, vLinBase_b, vAngBase
+
+#-------
+    def Rollout(self, estimator, num_steps, v=0.05, command_fcn=None, controllers=None):
+
+        #----- Closed loop door opening of all the runs with a BatchEstimator, in
+        # the same order as SkillTrajectoryPlanning.Run. command_fcn(veldesEE_ee,
+        # measurements) returns (q_dot_arm, vLinBase_b, vAngBase) of all the runs.
+        # Without it, the commands are the ones of 'controllers' (one per run, see
+        # MakeController), or the resolved rate commands of the arms if there are
+        # no controllers either. Returns the logged channels, with the runs along
+        # the leading axis -----
+
+        N = self.num_runs
+
+        log = {
+            "estimated_dir": np.zeros((N, num_steps, 3)),
+            "actual_dir": np.zeros((N, num_steps, 3)),
+            "f_wristframe": np.zeros((N, num_steps, 3)),
+            "r_O_ee": np.zeros((N, num_steps, 3)),
+            "object_pos": np.zeros((N, num_steps)),
+        }
+
+        for k in range(num_steps):
+
+            measurements = self.GetMeasurements(controllers, dynamics=command_fcn is not None or controllers is not None)
+            C_O_ee = measurements[7]
+            r_O_ee = measurements[8]
+            f_wristframe = measurements[14]
+
+            estimator.UpdateEstimate(f_wristframe, C_O_ee)
+
+            veldesEE_ee = estimator.GetPlannedVelocities(v)
+
+            if command_fcn is not None:
+                self.ApplyCommand(*command_fcn(veldesEE_ee, measurements))
+            elif controllers is not None:
+                self.ApplyCommand(*self.ControllerCommand(controllers, veldesEE_ee, self.GetInfoTuples(measurements, v)))
+            else:
+                self.ApplyCommand(self.ResolvedRateCommand(veldesEE_ee))
+
+            self.Step()
+
+            estimator.UpdateBuffers(f_wristframe, r_O_ee)
+
+            log["estimated_dir"][:, k] = _Apply(C_O_ee, estimator.directionVector)
+            log["actual_dir"][:, k] = self.GetActualDirection()
+            log["f_wristframe"][:, k] = f_wristframe
+            log["r_O_ee"][:, k] = r_O_ee
+            log["object_pos"][:, k] = self.obj.s
+
+        return log
@@ -0,0 +1,224 @@
+from numpy import linalg as LA
+
+EPS = 1e-6
+DEBUG = True
+
+#----- Outcomes of a door opening run. The outcome code that is saved with a run
+# is the index in this list -----
+
+OUTCOMES = ['completed', 'joint_limit', 'grasp_lost', 'force_saturation', 'estimate_diverged', 'error']
+
+SUCCESSFUL_OUTCOMES = ['completed', 'joint_limit']
+
+#----- Description -----
+
+# Early termination of the door opening runs. The monitor is updated once per
+# controller update with the quantities of that update and evaluates a list of
+# criteria. Every criterion fires its outcome once its condition held for
+# 'hold_time' seconds, i.e. for that many consecutive updates, so a single outlier
+# does not stop a run. The first criterion that fires decides the outcome and stops
+# the run, a run that is not stopped ends with the outcome 'completed'.
+#
+# The times are converted to numbers of updates in 'Reset', with the period of the
+# controller updates of the run (the physics time step times the control
+# decimation), so the criteria do not depend on the update rate.
+#
+# The quantities of an update are passed as a dict, criteria only read the entries
+# they need:
+#
+#   'it'               index of the controller update in the run
+#   'obj_joint_pos'    position of the joint that moves the grasped link
+#   'obj_joint_limits' (lower, upper) of that joint, None if it has no limits
+#   'grasp'            result of robot.check_grasp()
+#   'f_wristframe'     measured wrist force
+#   'dot'              alignment of the estimated and the actual direction
+#
+# New criteria derive from TerminationCriterion and implement 'Check'.
+
+#-----------------------
+
+class TerminationCriterion:
+
+    def __init__(self, outcome, hold_time=0.0):
+
+        if outcome not in OUTCOMES:
+            raise ValueError("Unknown outcome: " + str(outcome))
+
+        self.outcome = outcome
+        self.hold_time = hold_time
+        self.hold_updates = 1
+        self.count = 0
+
+#-------
+    def Reset(self, update_period):
+
+        #----- At least one update, a condition that holds in a single update is
+        # enough for a hold time shorter than the update period -----
+
+        self.hold_updates = max(1, int(round(self.hold_time/update_period)))
+        self.count = 0
+
+#-------
+    def Check(self, info):
+
+        #----- Returns True if the condition of the criterion holds in this update -----
+
+        raise NotImplementedError
+
+#-------
+    def Update(self, info):
+
+        if self.Check(info):
+            self.count += 1
+        else:
+            self.count = 0
+
+        return self.count >= self.hold_updates
+
+#-----------------------
+
+class JointLimitCriterion(TerminationCriterion):
+
+    def __init__(self, margin=0.02, hold_time=0.05):
+
+        super(JointLimitCriterion, self).__init__('joint_limit', hold_time)
+
+        #----- Fraction of the joint range -----
+
+        self.margin = margin
+        self.start_pos = None
+
+#-------
+    def Reset(self, update_period):
+
+        super(JointLimitCriterion, self).Reset(update_period)
+        self.start_pos = None
+
+#-------
+    def Check(self, info):
+
+        limits = info.get('obj_joint_limits')
+        pos = info.get('obj_joint_pos')
+
+        if limits is None or pos is None:
+            return False
+
+        lower, upper = limits
+
+        if self.start_pos is None:
+            self.start_pos = pos
+
+        #----- The object is opened towards the limit that is further away from
+        # its position at the start of the run -----
+
+        margin = self.margin*(upper - lower)
+
+        if upper - self.start_pos >= self.start_pos - lower:
+            return pos >= upper - margin
+
+        return pos <= lower + margin
+
+#-----------------------
+
+class GraspCriterion(TerminationCriterion):
+
+    def __init__(self, hold_time=0.1):
+
+        super(GraspCriterion, self).__init__('grasp_lost', hold_time)
+
+#-------
+    def Check(self, info):
+
+        grasp = info.get('grasp')
+
+        return grasp is not None and not grasp
+
+#-----------------------
+
+class ForceSaturationCriterion(TerminationCriterion):
+
+    def __init__(self, max_force=150.0, hold_time=0.1):
+
+        super(ForceSaturationCriterion, self).__init__('force_saturation', hold_time)
+
+        self.max_force = max_force
+
+#-------
+    def Check(self, info):
+
+        f_wristframe = info.get('f_wristframe')
+
+        return f_wristframe is not None and LA.norm(f_wristframe) > self.max_force
+
+#-----------------------
+
+class AlignmentCriterion(TerminationCriterion):
+
+    def __init__(self, min_dot=0.0, start_time=0.8, hold_time=0.5):
+
+        super(AlignmentCriterion, self).__init__('estimate_diverged', hold_time)
+
+        #----- The estimate is only judged once the initial phase of the estimator
+        # is over, 'start_time' seconds after the start of the run -----
+
+        self.min_dot = min_dot
+        self.start_time = start_time
+        self.start_it = 0
+
+#-------
+    def Reset(self, update_period):
+
+        super(AlignmentCriterion, self).Reset(update_period)
+        self.start_it = int(round(self.start_time/update_period))
+
+#-------
+    def Check(self, info):
+
+        dot = info.get('dot')
+
+        return dot is not None and info.get('it', 0) >= self.start_it and dot < self.min_dot
+
+#-----------------------
+
+class TerminationMonitor:
+
+    def __init__(self, criteria=None):
+
+        if criteria is None:
+            criteria = [JointLimitCriterion(), GraspCriterion(), ForceSaturationCriterion(), AlignmentCriterion()]
+
+        self.criteria = criteria
+
+        self.outcome = 'completed'
+
+#-------
+    def Reset(self, update_period):
+
+        #----- update_period is the time [s] between two controller updates -----
+
+        for criterion in self.criteria:
+            criterion.Reset(update_period)
+
+        self.outcome = 'completed'
+
+#-------
+    def NeedsGrasp(self):
+
+        #----- check_grasp queries the simulator, hence it is only called if a
+        # criterion reads it -----
+
+        return any(isinstance(criterion, GraspCriterion) for criterion in self.criteria)
+
+#-------
+    def Update(self, info):
+
+        #----- Returns True if the run has to be stopped after this tick -----
+
+        for criterion in self.criteria:
+
+            if criterion.Update(info):
+
+                self.outcome = criterion.outcome
+                return True
+
+        return False
@@ -0,0 +1,211 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from highlevel_planning.tools.util import IKError
+
+
+# IK for whole Cartesian paths. A path is only solved at every sample_steps-th
+# pose (and at its last pose), each solve seeded with the solution of the previous
+# sample, and the joint commands in between are interpolated linearly. Every solve
+# goes through an LRU cache, keyed on the target pose and the seed quantized to a
+# fixed resolution.
+#
+# A robot is created for every configuration of a sweep, each in a freshly spawned
+# worker process. Caches created with a cache_name are therefore kept in a module
+# level store, shared by all TrajectoryIK objects of the process with the same name
+# and resolutions, and can be loaded from and saved to an npz file, e.g. in the
+# folder of the sweep. Every worker loads the file before its run and merges its
+# new solutions into it afterwards, so the same approach repeated in many
+# configurations of a sweep is only solved once.
+
+_SHARED_CACHES = dict()
+
+
+class TrajectoryIK(object):
+    def __init__(
+        self,
+        ik_solver,
+        cache_size=32768,
+        pos_resolution=1e-4,
+        orient_resolution=1e-4,
+        seed_resolution=1e-3,
+        cache_name=None,
+    ):
+        self.ik_solver = ik_solver
+        self.cache_size = cache_size
+        self.pos_resolution = pos_resolution
+        self.orient_resolution = orient_resolution
+        self.seed_resolution = seed_resolution
+
+        # Solvers of the same robot share the cache of the process
+        if cache_name is None:
+            self._cache = OrderedDict()
+        else:
+            self._cache = _SHARED_CACHES.setdefault(
+                (cache_name, self._resolutions()), OrderedDict()
+            )
+        self.hits = 0
+        self.misses = 0
+
+    def _resolutions(self):
+        return (self.pos_resolution, self.orient_resolution, self.seed_resolution)
+
+    def _key(self, pos, orient, seed):
+        # q and -q are the same orientation
+        if orient[3] < 0.0:
+            orient = -orient
+        return (
+            tuple(np.round(np.asarray(pos) / self.pos_resolution).astype(np.int64)),
+            tuple(np.round(orient / self.orient_resolution).astype(np.int64)),
+            tuple(np.round(np.asarray(seed) / self.seed_resolution).astype(np.int64)),
+        )
+
+    def solve(self, pos, orient, seed):
+        """ Returns the joint positions for the pose, or None if no solution was found. """
+        orient = np.asarray(orient, dtype=np.float64)
+        orient = orient / np.linalg.norm(orient)
+        key = self._key(pos, orient, seed)
+
+        sol = self._cache.get(key)
+        if sol is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return np.copy(sol)
+
+        self.misses += 1
+        sol = self.ik_solver.get_ik(
+            list(seed),
+            pos[0],
+            pos[1],
+            pos[2],
+            orient[0],
+            orient[1],
+            orient[2],
+            orient[3],
+        )
+
+        # Failures are not cached, the solver may succeed on the next attempt
+        if sol is None:
+            return None
+
+        sol = np.array(sol)
+        self._insert(key, sol)
+        return np.copy(sol)
+
+    def _insert(self, key, sol):
+        self._cache[key] = sol
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _read_file(self, path):
+        """ Returns the cache entries stored in the file, as a list of (key, solution). """
+        if not os.path.isfile(path):
+            return []
+        with np.load(path) as data:
+            # Keys quantized at other resolutions can not be compared
+            if not np.allclose(data["resolutions"], self._resolutions()):
+                return []
+            return [
+                ((tuple(pos), tuple(orient), tuple(seed)), sol)
+                for pos, orient, seed, sol in zip(
+                    data["pos_keys"].tolist(),
+                    data["orient_keys"].tolist(),
+                    data["seed_keys"].tolist(),
+                    data["solutions"],
+                )
+            ]
+
+    def load(self, path):
+        """ Adds the solutions saved in the npz file to the cache. Returns their number. """
+        entries = self._read_file(path)
+        for key, sol in entries:
+            if key not in self._cache:
+                self._insert(key, sol)
+        return len(entries)
+
+    def save(self, path):
+        """
+        Merges the cache into the npz file. The file is replaced atomically, so
+        workers that read it while it is written see either the old or the new
+        version. Entries of concurrent writers may be lost, which only costs
+        the solves to find them again.
+        """
+        entries = OrderedDict(self._read_file(path))
+        entries.update(self._cache)
+        if len(entries) == 0:
+            return
+
+        keys = list(entries.keys())
+        tmp_path = path + ".tmp" + str(os.getpid()) + ".npz"
+        np.savez(
+            tmp_path,
+            resolutions=np.array(self._resolutions()),
+            pos_keys=np.array([k[0] for k in keys], dtype=np.int64),
+            orient_keys=np.array([k[1] for k in keys], dtype=np.int64),
+            seed_keys=np.array([k[2] for k in keys], dtype=np.int64),
+            solutions=np.array(list(entries.values())),
+        )
+        os.replace(tmp_path, path)
+
+    def solve_path(self, positions, orients, seed, sample_steps=12, max_failed_samples=10):
+        """
+        Args:
+            positions (array): Target positions, N x 3.
+            orients (array): Target orientations (quaternions xyzw), N x 4.
+            seed (array): Joint positions to seed the first solve with.
+            sample_steps (int): Number of path poses per IK solve.
+            max_failed_samples (int): Number of consecutive samples without IK
+                solution after which the path is given up.
+
+        Returns:
+            Joint positions for every pose of the path, N x num_joints.
+        """
+        num_poses = len(positions)
+        if num_poses == 0:
+            return np.zeros((0, len(seed)))
+
+        sample_idx = list(range(0, num_poses, max(int(sample_steps), 1)))
+        if sample_idx[-1] != num_poses - 1:
+            sample_idx.append(num_poses - 1)
+
+        solved_idx = []
+        solutions = []
+        fail_count = 0
+        for i in sample_idx:
+            sol = self.solve(positions[i], orients[i], seed)
+            if sol is None:
+                fail_count += 1
+                if fail_count > max_failed_samples:
+                    raise IKError
+                continue
+            fail_count = 0
+            solved_idx.append(i)
+            solutions.append(sol)
+            seed = sol
+
+        if len(solutions) == 0:
+            raise IKError
+
+        # Poses before the first or after the last solved sample keep its solution
+        solutions = np.array(solutions)
+        path = np.zeros((num_poses, solutions.shape[1]))
+        for j in range(solutions.shape[1]):
+            path[:, j] = np.interp(np.arange(num_poses), solved_idx, solutions[:, j])
+        return path
+
+    def statistics(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / float(total) if total > 0 else 0.0,
+            "cache_entries": len(self._cache),
+        }
+
+    def clear(self):
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
@@ -6,9 +6,13 @@ import time
 from math import ceil
 import atexit
 
+# Debug drawing: "off" draws nothing, "throttled" redraws every item at most
+# visualization_rate times per simulated second, "full" draws every call
+VISUALIZATION_MODES = ["off", "throttled", "full"]
+
 
 class World(object):
-    def __init__(self, sleep=True):
+    def __init__(self, sleep=True, visualization="full", visualization_rate=10.0):
         self.sleep_flag = sleep
 
         self.sim_time = 0.0
@@ -28,8 +32,35 @@ class World(object):
         }
 
         self.velocity_setter = None
+
+        self.visualization = "full"
+        self.visualization_rate = visualization_rate
+        self._last_drawn = dict()
+        self.set_visualization(visualization)
+
         atexit.register(self.close)
 
+    def set_visualization(self, mode, rate=None):
+        if mode not in VISUALIZATION_MODES:
+            raise ValueError("Unknown visualization mode: " + str(mode))
+        self.visualization = mode
+        if rate is not None:
+            self.visualization_rate = rate
+        self._last_drawn = dict()
+
+    def should_draw(self, item_key=None):
+        """ Whether the debug item item_key (None for a new item) is due for drawing. """
+        if self.visualization == "off":
+            return False
+        if self.visualization == "full" or item_key is None:
+            return True
+        last = self._last_drawn.get(item_key)
+        return last is None or self.sim_time - last >= 1.0 / self.visualization_rate - 1e-9
+
+    def _mark_drawn(self, item_key):
+        if self.visualization == "throttled":
+            self._last_drawn[item_key] = self.sim_time
+
     def sleep(self, seconds):
         if self.sleep_flag:
             time.sleep(seconds)
@@ -42,6 +73,17 @@ class World(object):
             self.step_one()
             self.sleep(self.T_s)
 
+    def step_ticks(self, num_ticks, chunk_ticks=1):
+        """ Advances the simulation by num_ticks steps without sleeping. The per step
+        hooks are called once per chunk of chunk_ticks steps. """
+        for _ in range(int(num_ticks)):
+            self.step_one()
+
+    def fast_forward(self, secs, chunk_ticks=24):
+        """ Fast-forward version of step_seconds for phases without control, e.g.
+        waiting for the simulation to settle. """
+        self.step_ticks(int(ceil(secs * self.f_s)), chunk_ticks)
+
     def close(self):
         raise NotImplementedError
 
@@ -75,20 +117,23 @@ class _Model:
                     physicsClientId=self._physics_client,
             )
             
-        self.name = p.getBodyInfo(self.uid)
+        self.name = p.getBodyInfo(self.uid, physicsClientId=self._physics_client)
 
-        for i in range(p.getNumJoints(self.uid)):
-            info = p.getJointInfo(self.uid, i)
+        for i in range(p.getNumJoints(self.uid, physicsClientId=self._physics_client)):
+            info = p.getJointInfo(self.uid, i, physicsClientId=self._physics_client)
             name = info[12] if type(info[12]) is str else info[12].decode("utf-8")
             self.link_name_to_index[name] = i
 
     def remove(self):
-        p.removeBody(self.uid)
+        p.removeBody(self.uid, physicsClientId=self._physics_client)
 
 
 class WorldPybullet(World):
-    def __init__(self, style="gui", sleep=True, load_objects=True, savedir=None):
-        super(WorldPybullet, self).__init__(sleep)
+    def __init__(self, style="gui", sleep=True, load_objects=True, savedir=None, visualization=None):
+        # Nobody sees the debug items without GUI
+        if visualization is None:
+            visualization = "off" if style == "direct" else "full"
+        super(WorldPybullet, self).__init__(sleep, visualization)
         if not load_objects:
             assert savedir is not None
 
@@ -104,11 +149,11 @@ class WorldPybullet(World):
         if load_objects:
             p.resetSimulation(self.physics_client)
         else:
-            p.restoreState(fileName=os.path.join(savedir, "state.bullet"))
-            p.removeAllUserDebugItems()
+            p.restoreState(fileName=os.path.join(savedir, "state.bullet"), physicsClientId=self.physics_client)
+            p.removeAllUserDebugItems(physicsClientId=self.physics_client)
 
         p.setGravity(0, 0, -9.81, self.physics_client)
-        p.setAdditionalSearchPath(pybullet_data.getDataPath())
+        p.setAdditionalSearchPath(pybullet_data.getDataPath(), physicsClientId=self.physics_client)
 
     def add_model(self, path, position, orientation, scale=1.0, elementToAdd=None):
         model = _Model(self.physics_client)
@@ -119,10 +164,13 @@ class WorldPybullet(World):
         model.remove()
 
     def draw_cross(self, point):
+        if not self.should_draw("cross"):
+            return
+        self._mark_drawn("cross")
         if len(self.cross_uid) > 0:
-            p.removeUserDebugItem(self.cross_uid[0])
-            p.removeUserDebugItem(self.cross_uid[1])
-            p.removeUserDebugItem(self.cross_uid[2])
+            p.removeUserDebugItem(self.cross_uid[0], physicsClientId=self.physics_client)
+            p.removeUserDebugItem(self.cross_uid[1], physicsClientId=self.physics_client)
+            p.removeUserDebugItem(self.cross_uid[2], physicsClientId=self.physics_client)
         start1 = point - np.array([0.1, 0.0, 0.0])
         end1 = point + np.array([0.1, 0.0, 0.0])
         start2 = point - np.array([0.0, 0.1, 0.0])
@@ -133,18 +181,21 @@ class WorldPybullet(World):
         width = 1.0
         lifetime = 0
         uid1 = p.addUserDebugLine(
-            start1.tolist(), end1, color.tolist(), width, lifetime
+            start1.tolist(), end1, color.tolist(), width, lifetime, physicsClientId=self.physics_client
         )
         uid2 = p.addUserDebugLine(
-            start2.tolist(), end2, color.tolist(), width, lifetime
+            start2.tolist(), end2, color.tolist(), width, lifetime, physicsClientId=self.physics_client
         )
         uid3 = p.addUserDebugLine(
-            start3.tolist(), end3, color.tolist(), width, lifetime
+            start3.tolist(), end3, color.tolist(), width, lifetime, physicsClientId=self.physics_client
         )
         self.cross_uid = (uid1, uid2, uid3)
 
     def draw_arrow(self, point, direction, color, length=0.2, replace_id=None):
-        """ Accepts a point and a direction in world frame and draws it in the simulation """
+        """ Accepts a point and a direction in world frame and draws it in the simulation.
+        Returns the id of the arrow, which is replace_id if the arrow is not redrawn. """
+        if not self.should_draw(replace_id):
+            return replace_id
         tip = point + direction / np.linalg.norm(direction) * length
         color = self.colors[color]
         width = 4.5
@@ -157,26 +208,63 @@ class WorldPybullet(World):
                 width,
                 lifetime,
                 replaceItemUniqueId=replace_id,
+                physicsClientId=self.physics_client,
             )
         else:
             arrow_id = p.addUserDebugLine(
-                point.tolist(), tip.tolist(), color, width, lifetime
+                point.tolist(), tip.tolist(), color, width, lifetime, physicsClientId=self.physics_client
             )
+        self._mark_drawn(arrow_id)
         return arrow_id
 
     def step_one(self):
         for frc in self.forces:
-            p.applyExternalForce(frc[0], frc[1], frc[2], frc[3], frc[4])
+            p.applyExternalForce(frc[0], frc[1], frc[2], frc[3], frc[4], physicsClientId=self.physics_client)
         if self.velocity_setter is not None:
             self.velocity_setter()
-        p.stepSimulation()
+        p.stepSimulation(physicsClientId=self.physics_client)
+        self.sim_time += self.T_s
         if self.collision_checker is not None:
             self.collision_checker()
 
-    @staticmethod
-    def add_plane():
-        return p.loadURDF("plane.urdf")
+    def step_ticks(self, num_ticks, chunk_ticks=1):
+        # The chunks use the substeps of a single stepSimulation call. External
+        # forces are reapplied in every step, so they keep one call per step
+        if len(self.forces) > 0 or chunk_ticks <= 1:
+            super(WorldPybullet, self).step_ticks(num_ticks)
+            return
+
+        params = p.getPhysicsEngineParameters(physicsClientId=self.physics_client)
+        num_sub_steps = max(int(params["numSubSteps"]), 1)
+
+        try:
+            remaining = int(num_ticks)
+            while remaining > 0:
+                chunk = min(chunk_ticks, remaining)
+
+                # One call advances 'chunk' steps of T_s
+                p.setPhysicsEngineParameter(
+                    fixedTimeStep=chunk * self.T_s,
+                    numSubSteps=chunk * num_sub_steps,
+                    physicsClientId=self.physics_client,
+                )
+                self.step_one()
+                self.sim_time += (chunk - 1) * self.T_s
+                remaining -= chunk
+        finally:
+            p.setPhysicsEngineParameter(
+                fixedTimeStep=params["fixedTimeStep"],
+                numSubSteps=int(params["numSubSteps"]),
+                physicsClientId=self.physics_client,
+            )
+
+    def add_plane(self):
+        return p.loadURDF("plane.urdf", physicsClientId=self.physics_client)
 
     def close(self):
+        # Can be called explicitly and again at exit, only disconnect once
+        if self.physics_client is None:
+            return
         print("Closing world")
         p.disconnect(self.physics_client)
+        self.physics_client = None
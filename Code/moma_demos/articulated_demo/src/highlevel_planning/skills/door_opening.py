@@ -7,6 +7,9 @@ import time
 from scipy.spatial.transform import Rotation as R
 
 from highlevel_planning.tools.door_opening_util import *
+from highlevel_planning.sim.measurements import MeasurementProviderPybullet
+from highlevel_planning.tools.trajectory_logger import TrajectoryLogger, RunView
+from highlevel_planning.sim.termination_monitor import OUTCOMES
 
 import math
 import matplotlib.pyplot as plt
@@ -15,6 +18,10 @@ EPS = 1e-6
 DEBUG = True
 BASEDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+#----- Attributes of the direction estimator set by the initial probing -----
+
+ESTIMATOR_INIT_STATE = ['initDir', 'directionVector', 'x_k_1', 'x_k_2', 'y_k_1', 'y_k_2']
+
 #----- Description -----
 
 # This is the door opening skill class which corresponds to the Automatic Control 
@@ -34,6 +41,8 @@ class SkillTrajectoryPlanning:
         self.robot = robot
         self.cfg = cfg
         
+        self._physics_client = robot._world.physics_client
+        
         self.dt = time_step
         
         self.initLength = initLength
@@ -44,77 +53,60 @@ class SkillTrajectoryPlanning:
         self.cinit = cinit
         self.q_dot_prev = np.array(7*[0.0]).reshape(-1, 1)
         
-        #----- Log data for plotting -----
+        #----- Strategy of the initial direction probing, see PROBING_STRATEGIES -----
         
-        self.log_q = None
-        self.log_q_dot = None
-        self.log_tau = None
+        self.probing = 'exhaustive'
         
-        self.log_estimated_dir = None
-        self.log_actual_dir = None
+        #----- Early termination of the runs, see TerminationMonitor. Without a
+        # monitor, every run takes num_steps iterations -----
         
-        self.log_lin_vdesEE_O = None
-        self.log_ang_vdesEE_O = None
-        self.log_lin_vEE_O_meas = None
-        self.log_ang_vEE_O_meas = None
+        self.monitor = None
         
-        self.log_lin_vBase_O_meas = None
-        self.log_ang_vBase_O_meas = None
+        #----- Number of physics ticks per controller update. The controllers
+        # hold their command in between (zero-order hold) -----
         
-        self.log_f_wristframe = None
-        self.log_t_wristframe = None
+        self.control_decimation = 1
         
-        self.log_exec_time = None
-        self.log_theta = None
-        self.log_manipulability_meas = None
+        #----- Latency of the stages of the control loop. When enabled, its trace is
+        # saved with every run -----
         
-        self.log_q_dot_optimal = None
-        self.log_actual_drawer_pos = None
+        self.profiler = LatencyProfiler(enabled=False)
         
-        #----- -----
+        #----- If set to a ControllerStepRecorder, the inputs of the controller
+        # are recorded in every iteration and saved with the run, e.g. for
+        # benchmarking the controllers offline -----
         
-        #self.PrintRobotJointInfo()
+        self.step_recorder = None
         
-#-------
-    def reset(self):
-    
-        self.log_q = []
-        self.log_q_dot = []
-        self.log_tau = []
+        #----- Created on the first read, once the robot is loaded -----
         
-        self.log_estimated_dir = []
-        self.log_actual_dir = []
+        self.measurements = None
         
-        self.log_lin_vdesEE_O = []
-        self.log_ang_vdesEE_O = []
-        self.log_lin_vEE_O_meas = []
-        self.log_ang_vEE_O_meas = []
+        #----- Log data for plotting -----
         
-        self.log_lin_vBase_O_meas = []
-        self.log_ang_vBase_O_meas = []
+        self.logger = None
         
-        self.log_f_wristframe = []
-        self.log_t_wristframe = []
+        #----- -----
         
-        self.log_exec_time = []
-        self.log_theta = []
-        self.log_manipulability_meas = []
+        #self.PrintRobotJointInfo()
         
-        self.log_q_dot_optimal = []
-        self.log_actual_drawer_pos = []        
+#-------
+    def reset(self, num_steps=1000):
+        
+        self.logger = TrajectoryLogger(capacity=num_steps)
         
 #-------
     def PrintRobotJointInfo(self):
         
         #----- Prints the information about the robot from its URDF model -----
     
-        num_joints = p.getNumJoints(self.robot.model.uid)
+        num_joints = p.getNumJoints(self.robot.model.uid, physicsClientId=self._physics_client)
         
         print("***** Robot joint information *****")
         
         for i in range(num_joints):
         
-            info = p.getJointInfo(self.robot.model.uid, i)
+            info = p.getJointInfo(self.robot.model.uid, i, physicsClientId=self._physics_client)
             joint_name = info[1] if type(info[1]) is str else info[1].decode("utf-8")
             print("i: ", i, " | name: ", joint_name, " | type: ", info[2], " | parentIndex: ", info[16], " | linkName: ", info[12], " | min and max: ", 
                 info[8], info[9], info[10], info[11]
@@ -122,9 +114,11 @@ class SkillTrajectoryPlanning:
 #-------
     def draw_arrow(self, vec_wristframe, color, arrow_id=None, length=0.2):
     
-        if DEBUG:
+        #----- Goes through the visualization mode of the world, see VISUALIZATION_MODES -----
+    
+        if DEBUG and self.robot._world.should_draw(arrow_id):
         
-            link_state = p.getLinkState(self.robot.model.uid, self.robot.link_name_to_index["panda_default_EE"])
+            link_state = p.getLinkState(self.robot.model.uid, self.robot.link_name_to_index["panda_default_EE"], physicsClientId=self._physics_client)
             pos = np.array(link_state[4])
             orient = R.from_quat(link_state[5])
             vec_worldframe = orient.apply(np.squeeze(vec_wristframe))
@@ -138,9 +132,9 @@ class SkillTrajectoryPlanning:
         
         #----- Returns the current joint configuration of the robot -----
         
-        joint_positions, joint_velocities, joint_torques = GetJointStates(self.robot.model.uid)        
-        base_pos, base_ori = p.getBasePositionAndOrientation(self.robot.model.uid)        
-        lin_base_vel, ang_base_vel = p.getBaseVelocity(self.robot.model.uid)
+        joint_positions, joint_velocities, joint_torques = GetJointStates(self.robot.model.uid, self._physics_client)        
+        base_pos, base_ori = p.getBasePositionAndOrientation(self.robot.model.uid, physicsClientId=self._physics_client)        
+        lin_base_vel, ang_base_vel = p.getBaseVelocity(self.robot.model.uid, physicsClientId=self._physics_client)
         
         return joint_positions, joint_velocities, base_pos, base_ori, lin_base_vel, ang_base_vel
         
@@ -149,14 +143,49 @@ class SkillTrajectoryPlanning:
         
         #----- Artificially sets the joint configuration of the robot -----
 
-        p.resetBasePositionAndOrientation(self.robot.model.uid, base_pos, base_ori)
+        p.resetBasePositionAndOrientation(self.robot.model.uid, base_pos, base_ori, physicsClientId=self._physics_client)
         
         self.robot.update_velocity(lin_base_vel, ang_base_vel[2])                             
         self.robot.velocity_setter()
                 
         for i in range(len(joint_positions)):
-            p.resetJointState(self.robot.model.uid, i, joint_positions[i], joint_velocities[i])
+            p.resetJointState(self.robot.model.uid, i, joint_positions[i], joint_velocities[i], physicsClientId=self._physics_client)
 
+#-------
+    def SaveSnapshot(self, sk_dir=None):
+        
+        #----- Takes an in-memory snapshot of the simulation together with the base
+        # velocity command of the robot, which is applied in every simulation step.
+        # If the estimator is given, its initial direction is stored as well -----
+        
+        snapshot = {
+            'state_id': p.saveState(physicsClientId=self._physics_client),
+            'velocity_trans': list(self.robot.velocity_trans),
+            'velocity_turn': self.robot.velocity_turn,
+        }
+        
+        if sk_dir is not None:
+            snapshot['estimator'] = {name: np.copy(getattr(sk_dir, name)) for name in ESTIMATOR_INIT_STATE}
+        
+        return snapshot
+        
+#-------
+    def RestoreSnapshot(self, snapshot, sk_dir=None):
+        
+        p.restoreState(stateId=snapshot['state_id'], physicsClientId=self._physics_client)
+        
+        self.robot.update_velocity(list(snapshot['velocity_trans']), snapshot['velocity_turn'])
+        
+        if sk_dir is not None and 'estimator' in snapshot:
+            for name, value in snapshot['estimator'].items():
+                setattr(sk_dir, name, np.copy(value))
+                
+#-------
+    def RemoveSnapshot(self, snapshot):
+        
+        if snapshot is not None:
+            p.removeState(snapshot['state_id'], physicsClientId=self._physics_client)
+        
 #-------
     def ObjectConfiguration(self, mode, target_name, joint_positions=None, joint_velocities=None):
         
@@ -165,11 +194,11 @@ class SkillTrajectoryPlanning:
         obj_info = self.scene.objects[target_name]
         target_id = obj_info.model.uid
         
-        num_joints = p.getNumJoints(target_id)
+        num_joints = p.getNumJoints(target_id, physicsClientId=self._physics_client)
         
         if mode == 'memorize':
         
-            joint_states = p.getJointStates(target_id, range(num_joints))
+            joint_states = p.getJointStates(target_id, range(num_joints), physicsClientId=self._physics_client)
             joint_positions = [state[0] for state in joint_states]
             joint_velocities = [state[1] for state in joint_states]
             
@@ -178,7 +207,7 @@ class SkillTrajectoryPlanning:
         else:
             
             for i in range(len(joint_positions)):
-                p.resetJointState(target_id, i, joint_positions[i], joint_velocities[i]) 
+                p.resetJointState(target_id, i, joint_positions[i], joint_velocities[i], physicsClientId=self._physics_client) 
             
 #-------
     def GetGraspedObjActualInfo(self, target_name, link_idx, grasp_id):
@@ -200,11 +229,11 @@ class SkillTrajectoryPlanning:
             raise SkillExecutionError("Invalid grasp ID")        
         
         if link_id == -1:            
-            temp = p.getBasePositionAndOrientation(target_id)
+            temp = p.getBasePositionAndOrientation(target_id, physicsClientId=self._physics_client)
             pos_obj  = np.array(temp[0]).reshape((-1, 1))
             ori_obj = np.array(temp[1])
         else:
-            temp = p.getLinkState(target_id, link_id, computeForwardKinematics = True)
+            temp = p.getLinkState(target_id, link_id, computeForwardKinematics = True, physicsClientId=self._physics_client)
             pos_obj = np.array(temp[4]).reshape((-1, 1))
             ori_obj = np.array(temp[5])    
         
@@ -231,42 +260,57 @@ class SkillTrajectoryPlanning:
         return r_O_obj, quat, C_O_obj, nobj_O    
         
 #-------
-    def GetMeasurements(self):
+    def GetGraspedObjJointInfo(self, target_name, link_idx):
         
-        #----- This function mimics reading the information from the on-board sensors.
-        # It collects all the information required to close the feedback loop -----
-    
-        link_pos_and_vel = p.getLinkStates(self.robot.model.uid, linkIndices=[self.robot.arm_base_link_idx, self.robot.link_name_to_index["panda_default_EE"]], 
-            computeLinkVelocity = 1, computeForwardKinematics = True
-        )
+        #----- Returns the index of the joint that moves the grasped link and its
+        # limits, None if the joint has no limits. Fixed joints are skipped -----
         
-        f_wristframe, t_wristframe = self.robot.get_wrist_force_torque()
+        obj_info = self.scene.objects[target_name]
+        target_id = obj_info.model.uid
         
-        C_O_b = R.from_quat(link_pos_and_vel[0][5])
-        r_O_b = link_pos_and_vel[0][4]
+        joint_idx = obj_info.grasp_links[link_idx]
+        
+        while joint_idx >= 0:
+            
+            info = p.getJointInfo(target_id, joint_idx, physicsClientId=self._physics_client)
+            
+            if info[2] != p.JOINT_FIXED:
+                
+                limits = (info[8], info[9]) if info[9] > info[8] else None
+                return joint_idx, limits
+                
+            joint_idx = info[16]
+            
+        return None, None
         
-        C_O_ee = R.from_quat(link_pos_and_vel[1][5])
-        r_O_ee = link_pos_and_vel[1][4]
+#-------
+    def GetObjJointPosition(self, target_name, joint_idx):
         
-        lin_vEE_O = link_pos_and_vel[1][6]
-        ang_vEE_O = link_pos_and_vel[1][7]
+        target_id = self.scene.objects[target_name].model.uid
         
-        lin_vBase_O, ang_vBase_O = p.getBaseVelocity(self.robot.model.uid)
+        return p.getJointState(target_id, joint_idx, physicsClientId=self._physics_client)[0]
         
-        q, q_dot, mtorq = GetMotorJointStates(self.robot.model.uid)
+#-------
+    def SetRunOutcome(self, outcome):
         
-        zero_vec = [0.0]*len(q)
+        #----- Saved with the run, next to the number of logged controller updates -----
         
-        b = np.array(p.calculateInverseDynamics(self.robot.model.uid, list(q), list(q_dot), zero_vec))
-        M = np.array(p.calculateMassMatrix(self.robot.model.uid, list(q)))        
+        self.logger.set_constant('outcome', OUTCOMES.index(outcome))
+        self.logger.set_constant('num_updates', self.logger.num_samples)
         
-        lin, ang = p.calculateJacobian(self.robot.model.uid, self.robot.arm_ee_link_idx, [0.0, 0.0, 0.0], list(q), zero_vec, zero_vec)
-        lin = np.array(lin)
-        ang = np.array(ang)
-            
-        J_b_ee = np.concatenate((lin, ang), axis=0)
+#-------
+    def GetMeasurements(self, controller=None):
         
-        return M, b, J_b_ee, q, q_dot, C_O_b, r_O_b, C_O_ee, r_O_ee, mtorq, lin_vEE_O, ang_vEE_O, lin_vBase_O, ang_vBase_O, f_wristframe, t_wristframe 
+        #----- This function mimics reading the information from the on-board sensors.
+        # It collects all the information required to close the feedback loop. If a 
+        # controller is given, the dynamic quantities it does not need are skipped. 
+        # The returned arrays live in a preallocated buffer, which is overwritten by 
+        # the next call -----
+        
+        if self.measurements is None:
+            self.measurements = MeasurementProviderPybullet(self.robot)
+    
+        return self.measurements.GetMeasurements(controller)
 
 #-------
     def VelocityProfile1(self, t, vInit, vFinal, tConv):
@@ -297,7 +341,7 @@ class SkillTrajectoryPlanning:
         return v    
         
 #-------
-    def LogDataForPlotting(self, sk_dir, interval, q, q_dot, nObj_O, C_O_ee, veldesEE_ee, J_b_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, t_wristframe, q_dot_optimal, r_O_obj):
+    def LogDataForPlotting(self, sk_dir, interval, q, q_dot, nObj_O, C_O_ee, veldesEE_ee, J_b_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, t_wristframe, q_dot_optimal, r_O_obj, r_O_ee):
 
         #----- Calculate Data for logging -----
                 
@@ -314,65 +358,33 @@ class SkillTrajectoryPlanning:
         theta = np.arccos(np.dot(z_O.squeeze(), -nObj_O.squeeze()))
         manipulabilityMeasure = LA.det(np.matmul(J_b_ee, np.transpose(J_b_ee)))**0.5
                 
-        #----- Log Data -----
-                                
-        self.log_q.append(q)
-        self.log_q_dot.append(q_dot)
-        self.log_tau.append(mtorq)
-        
-        self.log_estimated_dir.append(e_O)
-        self.log_actual_dir.append(nObj_O)
-        
-        self.log_lin_vdesEE_O.append(vLinDesEE_O)
-        self.log_ang_vdesEE_O.append(vAngDesEE_O)
-        self.log_lin_vEE_O_meas.append(vLinEE_O)
-        self.log_ang_vEE_O_meas.append(vAngEE_O)
-        
-        self.log_lin_vBase_O_meas.append(vLinBase_O)
-        self.log_ang_vBase_O_meas.append(vAngBase_O)
-
-        self.log_f_wristframe.append(f_wristframe)
-        self.log_t_wristframe.append(t_wristframe)
-        
-        self.log_exec_time.append(interval)
-        self.log_theta.append(theta)
-        self.log_manipulability_meas.append(manipulabilityMeasure)
-        
-        self.log_q_dot_optimal.append(q_dot_optimal)
-        self.log_actual_drawer_pos.append(r_O_obj)    
+        #----- Log Data. The values are copied into the columns of the logger,
+        # hence the measurement buffer can be reused in the next tick -----
+        
+        self.logger.record(
+            q=q, q_dot=q_dot, tau=mtorq,
+            estimated_dir=e_O, actual_dir=nObj_O,
+            lin_vdesEE_O=vLinDesEE_O, ang_vdesEE_O=vAngDesEE_O,
+            lin_vEE_O_meas=vLinEE_O, ang_vEE_O_meas=vAngEE_O,
+            lin_vBase_O_meas=vLinBase_O, ang_vBase_O_meas=vAngBase_O,
+            f_wristframe=f_wristframe, t_wristframe=t_wristframe,
+            exec_time=interval, theta=theta, manipulability_meas=manipulabilityMeasure,
+            q_dot_optimal=q_dot_optimal, actual_drawer_pos=r_O_obj,
+            r_O_ee=r_O_ee, quat_O_ee=C_O_ee.as_quat()
+        )
         
 #-------
     def SaveRun(self, curr_folder, mode_name):
 
         folder_name = curr_folder + '/' + mode_name
     
-        if not os.path.isdir(folder_name):
-            os.makedirs(folder_name)
-                  
-        np.save(folder_name+'/q.npy', np.array(self.log_q))
-        np.save(folder_name+'/q_dot.npy', np.array(self.log_q_dot))
-        np.save(folder_name+'/tau.npy', np.array(self.log_tau))
-        
-        np.save(folder_name+'/estimated_dir.npy', np.array(self.log_estimated_dir))        
-        np.save(folder_name+'/actual_dir.npy',  np.array(self.log_actual_dir))            
-                                    
-        np.save(folder_name+'/exec_time.npy', np.array(self.log_exec_time)) 
-        np.save(folder_name+'/lin_vdesEE_O.npy', np.array(self.log_lin_vdesEE_O))
-        np.save(folder_name+'/ang_vdesEE_O.npy', np.array(self.log_ang_vdesEE_O))
-        
-        np.save(folder_name+'/theta.npy', np.array(self.log_theta))
-        np.save(folder_name+'/lin_vEE_O_meas.npy', np.array(self.log_lin_vEE_O_meas))
-        np.save(folder_name+'/ang_vEE_O_meas.npy', np.array(self.log_ang_vEE_O_meas))
-        np.save(folder_name+'/manipulability_meas.npy', np.array(self.log_manipulability_meas)) 
-        
-        np.save(folder_name+'/lin_vBase_O_meas.npy', np.array(self.log_lin_vBase_O_meas)) 
-        np.save(folder_name+'/ang_vBase_O_meas.npy', np.array(self.log_ang_vBase_O_meas))
+        self.logger.save(folder_name)
         
-        np.save(folder_name+'/q_dot_optimal.npy', np.array(self.log_q_dot_optimal))
-    
-        np.save(folder_name+'/f_wristframe.npy', np.array(self.log_f_wristframe))
-        np.save(folder_name+'/t_wristframe.npy', np.array(self.log_t_wristframe))
-        np.save(folder_name+'/actual_drawer_pos.npy', np.array(self.log_actual_drawer_pos))
+        if self.profiler.enabled:
+            self.profiler.SaveTrace(folder_name)
+            
+        if self.step_recorder is not None:
+            self.step_recorder.Save(folder_name)
     
         print("***** Run saved! *****")
         
@@ -394,27 +406,29 @@ class SkillTrajectoryPlanning:
         
             #----- LOAD -----
         
-            q = np.load(folder_name+'//q.npy')
-            q_dot = np.load(folder_name+'//q_dot.npy')
-            tau = np.load(folder_name+'//tau.npy')
+            traj = RunView(folder_name)
         
-            estimated_dir = np.load(folder_name+'//estimated_dir.npy')        
-            actual_dir = np.load(folder_name+'//actual_dir.npy')            
+            q = traj['q']
+            q_dot = traj['q_dot']
+            tau = traj['tau']
+        
+            estimated_dir = traj['estimated_dir']        
+            actual_dir = traj['actual_dir']            
                                 
-            exec_time = np.load(folder_name+'//exec_time.npy') 
-            lin_vdesEE_O = np.load(folder_name+'//lin_vdesEE_O.npy')
-            ang_vdesEE_O = np.load(folder_name+'//ang_vdesEE_O.npy')
+            exec_time = traj['exec_time'] 
+            lin_vdesEE_O = traj['lin_vdesEE_O']
+            ang_vdesEE_O = traj['ang_vdesEE_O']
         
-            theta = np.load(folder_name+'//theta.npy')
-            lin_vEE_O_meas = np.load(folder_name+'//lin_vEE_O_meas.npy')
-            ang_vEE_O_meas = np.load(folder_name+'//ang_vEE_O_meas.npy')
-            manipulability_meas = np.load(folder_name+'//manipulability_meas.npy') 
+            theta = traj['theta']
+            lin_vEE_O_meas = traj['lin_vEE_O_meas']
+            ang_vEE_O_meas = traj['ang_vEE_O_meas']
+            manipulability_meas = traj['manipulability_meas'] 
         
-            q_dot_optimal = np.load(folder_name+'//q_dot_optimal.npy')
+            q_dot_optimal = traj['q_dot_optimal']
         
-            f_wristframe = np.load(folder_name+'//f_wristframe.npy')
-            t_wristframe = np.load(folder_name+'//t_wristframe.npy')
-            actual_drawer_pose = np.load(folder_name+'//actual_drawer_pos.npy')
+            f_wristframe = traj['f_wristframe']
+            t_wristframe = traj['t_wristframe']
+            actual_drawer_pose = traj['actual_drawer_pos']
         
             #----- CALCULATE -----
         
@@ -699,14 +713,15 @@ class SkillTrajectoryPlanning:
             print(5*'*' + ' Plots prepared '+ 5*'*')
             
 #-------
-    def InitProgram(self, sk_dir, target_name, link_idx, grasp_id):
+    def InitProgram(self, sk_dir, target_name, link_idx, grasp_id, probing=None):
         
                 #----- This procedure performs the complete initial direction 
-                # estimtaion procedure -----
+                # estimtaion procedure. The probed directions are chosen by the
+                # probing strategy, see InitialDirectionProbing -----
         
                 print(5*"-"+' Init procedure '+5*'-')
                 
-                direction_list = sk_dir.CalculateInitialDirections()
+                probing = InitialDirectionProbing(self.probing if probing is None else probing)
                 
                 try_velocity = 0.005
                 N_steps_per_dir = 3
@@ -717,15 +732,22 @@ class SkillTrajectoryPlanning:
                 
                 startTime = time.time()
                 
-                for idx in range(len(direction_list)):
+                idx = 0
+                
+                while True:
                     
-                    d = direction_list[idx]
+                    d = probing.NextDirection()
+                    
+                    if d is None:
+                        break
+                    
+                    probeStartTime = time.time()
                     
                     print("Trying the direction n: "+str(d))
                     
                     if idx == 0:
                         
-                        M, b, J_b_ee, q, q_dot, C_O_b, r_O_b, C_O_ee, r_O_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, t_wristframe = self.GetMeasurements()
+                        M, b, J_b_ee, q, q_dot, C_O_b, r_O_b, C_O_ee, r_O_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, t_wristframe = self.GetMeasurements(self.cinit)
                         
                         veldesEE_ee = 0*np.array(d + 3*[0.0])
     
@@ -735,14 +757,14 @@ class SkillTrajectoryPlanning:
                         
                         self.cinit.PerformOneStep(veldesEE_ee, infoTuple)
                         
-                        M, b, J_b_ee, q, q_dot, C_O_b, r_O_b, C_O_ee, r_O_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, t_wristframe = self.GetMeasurements()
+                        M, b, J_b_ee, q, q_dot, C_O_b, r_O_b, C_O_ee, r_O_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, t_wristframe = self.GetMeasurements(self.cinit)
                         sf = f_wristframe
                     
                     for temp_it in range(N_steps_per_dir):
                     
                         r_O_obj,_,_,nObj_O = self.GetGraspedObjActualInfo(target_name, link_idx, grasp_id)
                         
-                        M, b, J_b_ee, q, q_dot, C_O_b, r_O_b, C_O_ee, r_O_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, t_wristframe = self.GetMeasurements()
+                        M, b, J_b_ee, q, q_dot, C_O_b, r_O_b, C_O_ee, r_O_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, t_wristframe = self.GetMeasurements(self.cinit)
                         
                         veldesEE_ee = try_velocity*np.array(d + 3*[0.0])
     
@@ -752,7 +774,7 @@ class SkillTrajectoryPlanning:
                         
                         self.cinit.PerformOneStep(veldesEE_ee, infoTuple)
                                                
-                    M, b, J_b_ee, q, q_dot, C_O_b, r_O_b, C_O_ee, r_O_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, t_wristframe = self.GetMeasurements()
+                    M, b, J_b_ee, q, q_dot, C_O_b, r_O_b, C_O_ee, r_O_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, t_wristframe = self.GetMeasurements(self.cinit)
                     
                     f_wristframe = np.array(f_wristframe).reshape(-1, 1)
                     
@@ -767,7 +789,7 @@ class SkillTrajectoryPlanning:
                     
                         r_O_obj,_,_,nObj_O = self.GetGraspedObjActualInfo(target_name, link_idx, grasp_id)
                         
-                        M, b, J_b_ee, q, q_dot, C_O_b, r_O_b, C_O_ee, r_O_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, t_wristframe = self.GetMeasurements()
+                        M, b, J_b_ee, q, q_dot, C_O_b, r_O_b, C_O_ee, r_O_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, t_wristframe = self.GetMeasurements(self.cinit)
                         
                         veldesEE_ee = -try_velocity*np.array(d + 3*[0.0])
     
@@ -777,11 +799,14 @@ class SkillTrajectoryPlanning:
                         
                         self.cinit.PerformOneStep(veldesEE_ee, infoTuple)
                                                
-                    M, b, J_b_ee, q, q_dot, C_O_b, r_O_b, C_O_ee, r_O_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, t_wristframe = self.GetMeasurements()
+                    M, b, J_b_ee, q, q_dot, C_O_b, r_O_b, C_O_ee, r_O_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, t_wristframe = self.GetMeasurements(self.cinit)
                     
                     f_wristframe = np.array(f_wristframe).reshape(-1, 1)
                     
-                    sf = f_wristframe                   
+                    sf = f_wristframe
+                    
+                    probing.Report(y, time.time() - probeStartTime)
+                    idx += 1
                    
                 sk_dir.EstimateBestInitialDirection(X_data, Y_data, C_O_ee)
 
@@ -789,13 +814,24 @@ class SkillTrajectoryPlanning:
                     
                 totalInitTime = stopTime - startTime
                 
+                summary = probing.Summary()
+                
                 print("Total init time: "+str(totalInitTime))
+                print("Probes used: "+str(summary['probes'])+"/"+str(summary['grid_probes'])+", time saved: "+str(summary['time_saved']))
             
 #-------
-    def Run(self, num_steps, sk_grasp, sk_dir, sk_nav, target_name, link_idx, grasp_id, global_folder, postfix=None):
+    def Run(self, num_steps, sk_grasp, sk_dir, sk_nav, target_name, link_idx, grasp_id, global_folder, postfix=None, use_snapshots=True, reuse_init_probe=False, monitor=None, control_decimation=None):
+        
+        #----- With 'use_snapshots', the simulation is saved in memory once the 
+        # object is grasped and every further controller starts from exactly this
+        # state. With 'reuse_init_probe' in addition, the state after the initial
+        # probing is saved as well, so the probing is only performed once -----
         
         currFolder = prepare_dir(global_folder, postfix)
         
+        graspSnapshot = None
+        initSnapshot = None
+        
         initJointPositions = None
         initJointVelocities = None
         initBasePos = None
@@ -805,6 +841,23 @@ class SkillTrajectoryPlanning:
                 
         initObjJointPositions, initObjJointVelocities = self.ObjectConfiguration('memorize', target_name)
         
+        #----- With a termination monitor, a run stops as soon as its outcome is
+        # decided, the outcome is saved with the run -----
+        
+        if monitor is None:
+            monitor = self.monitor
+            
+        objJointIdx, objJointLimits = self.GetGraspedObjJointInfo(target_name, link_idx)
+        
+        #----- With control decimation, num_steps is still the number of physics
+        # ticks. The estimator is updated at the control rate, the initial probing
+        # runs at the physics rate -----
+        
+        if control_decimation is None:
+            control_decimation = self.control_decimation
+        
+        numUpdates = int(np.ceil(num_steps/float(control_decimation)))
+        
         nControllers = len(self.listOfControllers)
         approached = False
         
@@ -814,8 +867,20 @@ class SkillTrajectoryPlanning:
                 print(10*'-'+' Controller '+str(i)+' '+10*'-')
             
                 controller = self.listOfControllers[i]
-                self.reset()
+                
+                #----- The logs are reset before anything can fail, so that a failed
+                # run never saves the logs of the previous controller -----
+                
+                self.reset(numUpdates)
+                
+                if self.step_recorder is not None:
+                    self.step_recorder.Clear()
+                
+                controller.SetControlDecimation(control_decimation)
                 sk_dir.reset()
+                
+                if self.step_recorder is not None:
+                    self.step_recorder.Reset(controller, numUpdates)
         
                 if i == 0:
                     failed = 0
@@ -828,11 +893,22 @@ class SkillTrajectoryPlanning:
                         
                         if succeded:
                             initJointPositions, initJointVelocities, initBasePos, initBaseOri, initLinVelBase, initAngVelBase = self.FreezeRobotConfiguration()
+                            
+                            if use_snapshots:
+                                graspSnapshot = self.SaveSnapshot()
                             break
                         failed +=0
                         if failed>10:
                             break
                 
+                elif initSnapshot is not None:
+                
+                    self.RestoreSnapshot(initSnapshot, sk_dir)
+                
+                elif graspSnapshot is not None:
+                
+                    self.RestoreSnapshot(graspSnapshot)
+                
                 else:
                 
                     self.robot.reset()
@@ -848,62 +924,127 @@ class SkillTrajectoryPlanning:
                 
                 #----- Perform Initial Trajectory -----
                 
-                self.InitProgram(sk_dir, target_name, link_idx, grasp_id)
+                if initSnapshot is None:
+                    
+                    self.InitProgram(sk_dir, target_name, link_idx, grasp_id)
+                    
+                    if use_snapshots and reuse_init_probe and graspSnapshot is not None:
+                        initSnapshot = self.SaveSnapshot(sk_dir)
+                
+                sk_dir.SetTimeStep(control_decimation*self.dt)
+                
+                #----- State of the estimator at the start, needed to replay it offline -----
+                
+                self.logger.set_constant('estimator_init_dir', sk_dir.GetCurrEstimate())
+                self.logger.set_constant('estimator_dt', sk_dir.dt)
+                self.logger.set_constant('estimator_initN', sk_dir.initN)
+                self.logger.set_constant('control_decimation', control_decimation)
                 
                 #----- Start Control -----
                 
+                if monitor is not None:
+                    monitor.Reset(control_decimation*self.dt)
+                
+                self.profiler.Reset()
+                controller.profiler = self.profiler
+                
                 totalPlanningTime = 0.0
-                for it in range(num_steps):
+                numIterations = 0
+                for it in range(numUpdates):
+                    
+                    numIterations = it + 1
             
                     print(5*'-'+' Iteration '+str(it)+' '+5*'-')
+                    
+                    self.profiler.NextIteration(it)
                 
                     r_O_obj,_,_,nObj_O = self.GetGraspedObjActualInfo(target_name, link_idx, grasp_id)
                                    
                     startTime = time.time()
-                
-                    M, b, J_b_ee, q, q_dot, C_O_b, r_O_b, C_O_ee, r_O_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, t_wristframe = self.GetMeasurements()
+                    
+                    #----- The recorded inputs are replayed through every controller,
+                    # hence all the dynamic quantities are measured while recording -----
+                    
+                    with self.profiler.Stage('measurement'):
+                        M, b, J_b_ee, q, q_dot, C_O_b, r_O_b, C_O_ee, r_O_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, t_wristframe = self.GetMeasurements(controller if self.step_recorder is None else None)
 
                     #self.draw_arrow(f_wristframe, "red", arrow_id=None, length=LA.norm(f_wristframe)/22.0)
-                
-                    sk_dir.UpdateEstimate(f_wristframe, 0.1, C_O_ee, False)
                     
-                    #self.draw_arrow(sk_dir.GetCurrEstimate(), "green")
+                    with self.profiler.Stage('estimator'):
+                        sk_dir.UpdateEstimate(f_wristframe, 0.1, C_O_ee, False)
                     
-                    velProfile = self.VelocityProfile2(it, self.vInit, self.vRegular, 0.5, 0.5, np.floor(self.initLength/3), self.initLength)
-                
-                    veldesEE_ee = sk_dir.GetPlannedVelocities(v=velProfile, calcAng=True, kAng=0.2)        
+                        #self.draw_arrow(sk_dir.GetCurrEstimate(), "green")
+                        
+                        velProfile = self.VelocityProfile2(it*control_decimation, self.vInit, self.vRegular, 0.5, 0.5, np.floor(self.initLength/3), self.initLength)
+                    
+                        veldesEE_ee = sk_dir.GetPlannedVelocities(v=velProfile, calcAng=True, kAng=0.2)        
                 
                     infoTuple = (M, b, J_b_ee, q, q_dot, C_O_b, C_O_ee, r_O_ee, velProfile, mtorq[:7])
-                                
+                    
+                    if self.step_recorder is not None:
+                        self.step_recorder.Record(veldesEE_ee, infoTuple, r_O_b)
+                    
+                    #----- The controller times its own stages -----
+                    
                     controller.PerformOneStep(veldesEE_ee, infoTuple)
                 
                     stopTime = time.time()
                 
                     interval = stopTime - startTime
                     totalPlanningTime += interval
-
-                    sk_dir.UpdateBuffers(f_wristframe, r_O_ee)
+                    
+                    with self.profiler.Stage('estimator'):
+                        sk_dir.UpdateBuffers(f_wristframe, r_O_ee)
                     
                     print("Object position: ", r_O_obj)
                     #----- Log Data -----
+                    
+                    with self.profiler.Stage('logging'):
+                        self.LogDataForPlotting(sk_dir, interval, q, q_dot, nObj_O, C_O_ee, veldesEE_ee, J_b_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, 
+                            t_wristframe, controller.GetCurrOptSol(), r_O_obj, r_O_ee
+                        )
+                    
+                    #----- Early termination -----
+                    
+                    if monitor is not None:
+                        
+                        monitorInfo = {
+                            'it': it,
+                            'obj_joint_pos': self.GetObjJointPosition(target_name, objJointIdx) if objJointIdx is not None else None,
+                            'obj_joint_limits': objJointLimits,
+                            'grasp': self.robot.check_grasp() if monitor.NeedsGrasp() else None,
+                            'f_wristframe': f_wristframe,
+                            'dot': np.dot(C_O_ee.apply(sk_dir.GetCurrEstimate()), nObj_O),
+                        }
+                        
+                        if monitor.Update(monitorInfo):
+                            print("Run stopped after "+str(it+1)+" iterations: "+monitor.outcome)
+                            break
                 
-                    self.LogDataForPlotting(sk_dir, interval, q, q_dot, nObj_O, C_O_ee, veldesEE_ee, J_b_ee, mtorq, vLinEE_O, vAngEE_O, vLinBase_O, vAngBase_O, f_wristframe, 
-                        t_wristframe, controller.GetCurrOptSol(), r_O_obj
-                    )
+                print("Total planning time for "+str(numIterations)+" iterations: "+str(totalPlanningTime))
                 
-                print("Total planning time for "+str(it)+" iterations: "+str(totalPlanningTime))
+                if self.profiler.enabled:
+                    self.profiler.PrintSummary()
+                self.SetRunOutcome(monitor.outcome if monitor is not None else 'completed')
                 self.SaveRun(currFolder, controller.mode_name)
                 
             except Exception as e:
                 print(50*'=')
                 print(e)
+                self.SetRunOutcome('error')
                 self.SaveRun(currFolder, controller.mode_name)
+                
+            finally:
+                sk_dir.SetTimeStep(self.dt)
         
         #----- Reset Everything for the next run -----
+        
+        self.RemoveSnapshot(graspSnapshot)
+        self.RemoveSnapshot(initSnapshot)
             
         self.PlotRuns(currFolder)
         self.ObjectConfiguration('reset', target_name, initObjJointPositions, initObjJointVelocities)
-        self.robot._world.step_seconds(2)
+        self.robot._world.fast_forward(2)
                                         
 #-------                
 
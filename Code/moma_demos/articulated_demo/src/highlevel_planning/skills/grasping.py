@@ -8,6 +8,7 @@ class SkillGrasping:
     def __init__(self, scene_, robot_, config):
         self.scene = scene_
         self.robot = robot_
+        self._physics_client = robot_._world.physics_client
 
         self.last_pre_pos = None
         self.last_pre_orient = None
@@ -32,11 +33,11 @@ class SkillGrasping:
 
         # Get the object pose
         if link_id == -1:
-            temp = p.getBasePositionAndOrientation(target_id)
+            temp = p.getBasePositionAndOrientation(target_id, physicsClientId=self._physics_client)
             r_O_O_obj = np.array(temp[0]).reshape((-1, 1))
             C_O_obj = R.from_quat(np.array(temp[1]))
         else:
-            temp = p.getLinkState(target_id, link_id)
+            temp = p.getLinkState(target_id, link_id, physicsClientId=self._physics_client)
             r_O_O_obj = np.array(temp[4]).reshape((-1, 1))
             C_O_obj = R.from_quat(np.array(temp[5]))
 
@@ -44,7 +45,7 @@ class SkillGrasping:
         r_Obj_obj_grasp = obj_info.grasp_pos[link_id][grasp_id].reshape((-1, 1))
         
         # Get robot arm base orientation
-        temp1 = p.getLinkState(self.robot.model.uid, self.robot.arm_base_link_idx)
+        temp1 = p.getLinkState(self.robot.model.uid, self.robot.arm_base_link_idx, physicsClientId=self._physics_client)
         C_O_rob = R.from_quat(np.array(temp1[5]))
 
         # Compute desired position of end effector in robot frame
@@ -72,15 +73,15 @@ class SkillGrasping:
         if target_name == 'dishwasher':
         
             target_id = self.scene.objects[target_name].model.uid
-            nj = p.getNumJoints(target_id)          
+            nj = p.getNumJoints(target_id, physicsClientId=self._physics_client)          
             for counter in range(nj):
-                p.resetJointState(target_id, counter, -0.01, 0.0) 
+                p.resetJointState(target_id, counter, -0.01, 0.0, physicsClientId=self._physics_client) 
 
         self.robot.open_gripper()
  
         # Go to pre-grasp pose
         pos_pre = pos - np.matmul(
-            R.from_quat(orient).as_dcm(), np.array([0.0, 0.0, self._pregrasp_z_offset])
+            R.from_quat(orient).as_matrix(), np.array([0.0, 0.0, self._pregrasp_z_offset])
         )
 
         pos_pre_joints = self.robot.ik(pos_pre, orient)
@@ -89,14 +90,14 @@ class SkillGrasping:
                 lock.release()
             return False
         self.robot.transition_cmd_to(pos_pre_joints)
-        self.robot._world.step_seconds(0.5)
+        self.robot._world.fast_forward(0.5)
 
         # Go to grasp pose
         self.robot.transition_cartesian(pos, orient)
 
-        self.robot._world.step_seconds(0.2)
+        self.robot._world.fast_forward(0.2)
         self.robot.close_gripper()
-        self.robot._world.step_seconds(0.4)
+        self.robot._world.fast_forward(0.4)
 
         # Save some variables required for releasing
         self.last_pre_pos = pos_pre
@@ -109,11 +110,11 @@ class SkillGrasping:
     def release_object(self):
         pos_current, orient_current = self.robot.fk(np.array(self.robot.get_joints()))
         pos_retract = pos_current - np.matmul(
-            R.from_quat(orient_current).as_dcm(), np.array([0.0, 0.0, 0.07])
+            R.from_quat(orient_current).as_matrix(), np.array([0.0, 0.0, 0.07])
         )
 
         self.robot.open_gripper()
-        self.robot._world.step_seconds(0.2)
+        self.robot._world.fast_forward(0.2)
         self.robot.transition_cartesian(pos_retract, orient_current)
 
 
@@ -5,6 +5,7 @@ from highlevel_planning.tools.util import homogenous_trafo, invert_hom_trafo
 from matplotlib import pyplot as plt
 
 from highlevel_planning.tools.util import IKError
+from highlevel_planning.tools.trajectory_logger import TrajectoryLogger, RateLimitedPrinter
 
 EPS = 1e-6
 DEBUG = True
@@ -17,9 +18,10 @@ def ortho_projection(direction):
 
 
 def draw_arrow(vec_wristframe, robot, color, arrow_id=None, length=0.2):
-    if DEBUG:
+    if DEBUG and robot._world.should_draw(arrow_id):
         link_state = p.getLinkState(
-            robot.model.uid, robot.link_name_to_index["panda_default_EE"]
+            robot.model.uid, robot.link_name_to_index["panda_default_EE"],
+            physicsClientId=robot._world.physics_client,
         )
         pos = np.array(link_state[4])
         orient = R.from_quat(link_state[5])
@@ -55,6 +57,11 @@ class SkillMove:
 
         self.cart_vel_ctrl = None
 
+        # Telemetry of move_object. With telemetry_window set, only the last
+        # telemetry_window ticks are kept. Status output every print_period seconds
+        self.telemetry_window = None
+        self.print_period = 1.0
+
     def move_object(self, desired_distance, direction_initial_guess):
 
         travelled_distance = 0.0
@@ -74,14 +81,14 @@ class SkillMove:
         if self.orthogonal_correction:
             arrow_3_id = draw_arrow(np.array([0.1, 0.0, 0.0]), self.robot, "yellow")
 
-        plot_time = np.array([0.0])
-        plot_force_data = np.zeros((3, 1))
-        plot_direction_data = np.copy(direction)
+        telemetry = TrajectoryLogger(max_samples=self.telemetry_window)
+        telemetry.record(time=0.0, force=np.zeros(3), direction=np.squeeze(direction))
+        printer = RateLimitedPrinter(self.print_period)
 
         current_time = 0.0
 
         while travelled_distance < desired_distance:
-            plot_time = np.append(plot_time, current_time)
+            tick_time = current_time
             current_time += self.robot._world.T_s
 
             # Measure force and torque
@@ -95,7 +102,6 @@ class SkillMove:
                 arrow_id=arrow_2_id,
                 length=np.linalg.norm(f_wristframe) / 22.0,
             )
-            plot_force_data = np.append(plot_force_data, f_wristframe, axis=1)
 
             # ---- Translation -----
 
@@ -125,7 +131,11 @@ class SkillMove:
             )
             direction /= np.linalg.norm(direction)
             draw_arrow(direction, self.robot, "green", arrow_id=arrow_1_id)
-            plot_direction_data = np.append(plot_direction_data, direction, axis=1)
+            telemetry.record(
+                time=tick_time,
+                force=np.squeeze(f_wristframe),
+                direction=np.squeeze(direction),
+            )
 
             # Compute new translation velocity reference
             velocity_translation = self.desired_velocity * direction   #- np.matmul(
@@ -147,20 +157,27 @@ class SkillMove:
             
             # ---- Apply for one step --------
 
-            self.robot.task_space_velocity_control(
-                np.squeeze(velocity_translation), np.squeeze(velocity_rotation), 1
+            self.robot.stream_task_space_velocity(
+                np.squeeze(velocity_translation), np.squeeze(velocity_rotation)
             )
 
             # Update travelled distance
             new_position, _ = self.robot.get_link_pose("panda_default_EE")
-            print(direction)
+            printer.print(current_time, "Direction: ", np.squeeze(direction))
             travelled_distance += np.linalg.norm(new_position - last_position)
             last_position = new_position
 
+        self.robot.stop_arm()
+
         if DEBUG:
             # filename = "/home/fjulian/Desktop/drawer2.pdf"
             filename = None
-            self.plot_data(plot_time, plot_direction_data, plot_force_data, filename)
+            self.plot_data(
+                telemetry.get("time"),
+                telemetry.get("direction").T,
+                telemetry.get("force").T,
+                filename,
+            )
 
         return True
 
@@ -172,7 +189,7 @@ class SkillMove:
         axs_force = []
         plot_data = {"ylabel": ["x", "y", "z"]}
         for i in range(3):
-            axs_dir[i].set_xlim(0.0, plot_time[-1])
+            axs_dir[i].set_xlim(plot_time[0], plot_time[-1])
             axs_dir[i].plot(
                 plot_time,
                 plot_direction_data[i, :],
@@ -12,11 +12,12 @@ class SkillNavigate:
     def __init__(self, scene, robot):
         self.robot_ = robot
         self.robot_uid_ = robot.model.uid
+        self._physics_client = robot._world.physics_client
         self.scene_ = scene
 
     def _check_collisions(self):
         for _, obj in self.scene_.objects.items():
-            temp = p.getClosestPoints(self.robot_uid_, obj.model.uid, distance=0.5)
+            temp = p.getClosestPoints(self.robot_uid_, obj.model.uid, distance=0.5, physicsClientId=self._physics_client)
             for elem in temp:
                 contact_distance = elem[8]
                 if contact_distance < 0.0:
@@ -26,14 +27,15 @@ class SkillNavigate:
 
     def _move(self, pos, orient):
         p.resetBasePositionAndOrientation(
-            self.robot_uid_, pos.tolist(), orient.tolist()
+            self.robot_uid_, pos.tolist(), orient.tolist(),
+            physicsClientId=self._physics_client,
         )
 
     def move_to_object(self, target_name, nav_min_dist=None):
         target_id = self.scene_.objects[target_name].model.uid
 
         # Get the object position
-        temp = p.getBasePositionAndOrientation(target_id)
+        temp = p.getBasePositionAndOrientation(target_id, physicsClientId=self._physics_client)
         target_pos = np.array(temp[0]) #+ np.array([-0.2, 0.0, 0.0])			# CHANGE THIS BACK!!
 
         # Get valid nav angles
@@ -51,7 +53,7 @@ class SkillNavigate:
         self.robot_.to_start()
 
         # Get robot position
-        temp = p.getBasePositionAndOrientation(self.robot_uid_)
+        temp = p.getBasePositionAndOrientation(self.robot_uid_, physicsClientId=self._physics_client)
         robot_pos = np.array(temp[0])
         robot_orient = R.from_quat(temp[1])
 
@@ -100,6 +102,7 @@ class SkillNavigate:
                 obj.model.uid,
                 distance=0.01,
                 linkIndexA=self.robot_.link_name_to_index["panda_leftfinger"],
+                physicsClientId=self._physics_client,
             )
             if len(temp) > 0:
                 if object_in_hand_uid is not None:
@@ -113,7 +116,7 @@ class SkillNavigate:
         T_rob_obj = None
         if object_in_hand_uid is not None:
             # Get object position
-            temp = p.getBasePositionAndOrientation(object_in_hand_uid)
+            temp = p.getBasePositionAndOrientation(object_in_hand_uid, physicsClientId=self._physics_client)
             held_object_pos = np.array(temp[0])
             held_object_orient = R.from_quat(temp[1])
 
@@ -149,6 +152,7 @@ class SkillNavigate:
                 object_in_hand_uid,
                 held_object_pos.tolist(),
                 held_object_orient.tolist(),
+                physicsClientId=self._physics_client,
             )
 
 
@@ -12,6 +12,7 @@ class SkillNavigate:
     
         self.robot_ = robot
         self.robot_uid_ = robot.model.uid
+        self._physics_client = robot._world.physics_client
         self.scene_ = scene
         
         self.offset_pos = offset_pos
@@ -19,7 +20,7 @@ class SkillNavigate:
 
     def _check_collisions(self):
         for _, obj in self.scene_.objects.items():
-            temp = p.getClosestPoints(self.robot_uid_, obj.model.uid, distance=0.5)
+            temp = p.getClosestPoints(self.robot_uid_, obj.model.uid, distance=0.5, physicsClientId=self._physics_client)
             for elem in temp:
                 contact_distance = elem[8]
                 if contact_distance < 0.0:
@@ -29,14 +30,15 @@ class SkillNavigate:
 
     def _move(self, pos, orient):
         p.resetBasePositionAndOrientation(
-            self.robot_uid_, pos.tolist(), orient.tolist()
+            self.robot_uid_, pos.tolist(), orient.tolist(),
+            physicsClientId=self._physics_client,
         )
 
     def move_to_object(self, target_name, nav_min_dist=None):
         target_id = self.scene_.objects[target_name].model.uid
 
         # Get the object position
-        temp = p.getBasePositionAndOrientation(target_id)
+        temp = p.getBasePositionAndOrientation(target_id, physicsClientId=self._physics_client)
         target_pos = np.array(temp[0]) + np.array(self.offset_pos)					# It is positioning with offset
 
         # Get valid nav angles
@@ -73,12 +75,12 @@ class SkillNavigate:
         assert len(target_pos) == 3
         assert type(target_pos) is np.ndarray
         
-        nj = p.getNumJoints(target_id)
+        nj = p.getNumJoints(target_id, physicsClientId=self._physics_client)
         
         self.robot_.to_start()
                
         # Get robot position
-        temp = p.getBasePositionAndOrientation(self.robot_uid_)
+        temp = p.getBasePositionAndOrientation(self.robot_uid_, physicsClientId=self._physics_client)
         robot_pos = np.array(temp[0])
         robot_orient = R.from_quat(temp[1])
 
@@ -105,7 +107,7 @@ class SkillNavigate:
             for alpha in alphas:
                 
                 for counter in range(nj):
-                    p.resetJointState(target_id, counter, -0.0, 0.0) 
+                    p.resetJointState(target_id, counter, -0.0, 0.0, physicsClientId=self._physics_client) 
 
                 direction_vec = np.array([np.cos(alpha), np.sin(alpha), 0])
                 robot_pos[:2] = target_pos[:2] + r * direction_vec[:2]
@@ -129,7 +131,7 @@ class SkillNavigate:
         target_id = self.scene_.objects[target_name].model.uid
 
         # Get the object position
-        temp = p.getBasePositionAndOrientation(target_id)
+        temp = p.getBasePositionAndOrientation(target_id, physicsClientId=self._physics_client)
         target_pos = np.array(temp[0]) + np.array(self.offset_pos)					# It is positioning with offset
 
         # Get valid nav angles
@@ -149,7 +151,7 @@ class SkillNavigate:
         self.robot_.to_start()
 
         # Get robot position
-        temp = p.getBasePositionAndOrientation(self.robot_uid_)
+        temp = p.getBasePositionAndOrientation(self.robot_uid_, physicsClientId=self._physics_client)
         robot_pos = np.array(temp[0])
         robot_orient = R.from_quat(temp[1])
 
@@ -186,7 +188,7 @@ class SkillNavigate:
                 self._move(robot_pos, robot_orient)
                 pos, orient = sk_grasp.compute_grasp(target_name, link_idx, grasp_id)
                 pos_pre = pos - np.matmul(
-                    R.from_quat(orient).as_dcm(), np.array([0.0, 0.0, sk_grasp._pregrasp_z_offset])
+                    R.from_quat(orient).as_matrix(), np.array([0.0, 0.0, sk_grasp._pregrasp_z_offset])
                     )
                 pos_pre_joints = self.robot_.ik(pos_pre, orient)
                     
@@ -209,6 +211,7 @@ class SkillNavigate:
                 obj.model.uid,
                 distance=0.01,
                 linkIndexA=self.robot_.link_name_to_index["panda_leftfinger"],
+                physicsClientId=self._physics_client,
             )
             if len(temp) > 0:
                 if object_in_hand_uid is not None:
@@ -222,7 +225,7 @@ class SkillNavigate:
         T_rob_obj = None
         if object_in_hand_uid is not None:
             # Get object position
-            temp = p.getBasePositionAndOrientation(object_in_hand_uid)
+            temp = p.getBasePositionAndOrientation(object_in_hand_uid, physicsClientId=self._physics_client)
             held_object_pos = np.array(temp[0])
             held_object_orient = R.from_quat(temp[1])
 
@@ -258,6 +261,7 @@ class SkillNavigate:
                 object_in_hand_uid,
                 held_object_pos.tolist(),
                 held_object_orient.tolist(),
+                physicsClientId=self._physics_client,
             )
 
 
@@ -1,8 +1,11 @@
 import os
+import json
+from collections import OrderedDict
 import pybullet as p
 
 import numpy as np
 from datetime import datetime
+from time import perf_counter_ns
 from numpy import linalg as LA
 
 EPS = 1e-6
@@ -56,9 +59,9 @@ def NullProjection(A):
 	
 	return np.eye(A.shape[1])-np.matmul(LA.pinv(A), A) 
 
-def GetJointStates(robot):
+def GetJointStates(robot, physics_client=0):
 
-	joint_states = p.getJointStates(robot, range(p.getNumJoints(robot)))
+	joint_states = p.getJointStates(robot, range(p.getNumJoints(robot, physicsClientId=physics_client)), physicsClientId=physics_client)
 	joint_positions = [state[0] for state in joint_states]
 	joint_velocities = [state[1] for state in joint_states]
 	joint_torques = [state[3] for state in joint_states]
@@ -66,17 +69,28 @@ def GetJointStates(robot):
 	return joint_positions, joint_velocities, joint_torques
 
 
-def GetMotorJointStates(robot):
+def GetMotorJointStates(robot, physics_client=0, motor_joint_idx=None):
 
-	joint_states = p.getJointStates(robot, range(p.getNumJoints(robot)))
-	joint_infos = [p.getJointInfo(robot, i) for i in range(p.getNumJoints(robot))]
-	joint_states = [j for j, i in zip(joint_states, joint_infos) if i[3] > -1]
+	#----- If the indices of the motor joints are known, e.g. from RobotArmPybullet.motor_joint_idx,
+	# the joint infos do not have to be queried -----
+
+	if motor_joint_idx is None:
+		motor_joint_idx = GetMotorJointIndices(robot, physics_client)
+
+	joint_states = p.getJointStates(robot, motor_joint_idx, physicsClientId=physics_client)
 	joint_positions = [state[0] for state in joint_states]
 	joint_velocities = [state[1] for state in joint_states]
 	joint_torques = [state[3] for state in joint_states]
 	
 	return joint_positions, joint_velocities, joint_torques
 	
+def GetMotorJointIndices(robot, physics_client=0):
+
+	num_joints = p.getNumJoints(robot, physicsClientId=physics_client)
+	joint_infos = [p.getJointInfo(robot, i, physicsClientId=physics_client) for i in range(num_joints)]
+	
+	return [i for i in range(num_joints) if joint_infos[i][3] > -1]
+	
 #----- Optimization objectives and constraints -----	
 	
 def Objective1(x, *args):
@@ -92,3 +106,412 @@ def Constraint1(x, *args):
 	v = args[0]
 	
 	return v**2 - x[0]**2 - x[1]**2
+	
+def SolveSplit2D(vdes, vmean, s, v, num_samples=32, num_rounds=6):
+
+	#----- Minimizes Objective1 subject to Constraint1 with a bounded amount of work,
+	# i.e. ||vdes - s*x|| + ||vmean - x|| subject to ||x|| <= v. The objective is the
+	# weighted sum of the distances of x to vdes/s (weight |s|) and to vmean (weight 1),
+	# so its unconstrained minimum lies at the point with the larger weight. If that 
+	# point is outside the disc, the minimum lies on the circle and is found by a 
+	# coarse to fine search over the angle, where every round shrinks the search
+	# interval by a factor of num_samples/2 -----
+
+	vdes = np.asarray(vdes, dtype=float)
+	vmean = np.asarray(vmean, dtype=float)
+	
+	if v <= 0.0:
+		return np.zeros(2)
+		
+	if abs(s) < 1.0:
+		x_free = vmean
+	elif abs(s) > 1.0:
+		x_free = vdes/s
+	else:
+		
+		#----- Every point between vdes/s and vmean is optimal, take the one closest to the origin -----
+		
+		a = vdes/s
+		d = vmean - a
+		t = 0.0 if np.dot(d, d) < EPS**2 else np.clip(-np.dot(a, d)/np.dot(d, d), 0.0, 1.0)
+		x_free = a + t*d
+		
+	if LA.norm(x_free) <= v:
+		return np.array(x_free)
+		
+	#----- The search works with complex numbers to keep the number of array operations low -----
+	
+	a = complex(vdes[0], vdes[1])
+	m = complex(vmean[0], vmean[1])
+	offsets = np.linspace(-1.0, 1.0, num_samples + 1)
+	
+	theta_c = np.arctan2(x_free[1], x_free[0])
+	half_width = np.pi
+	
+	for _ in range(num_rounds):
+	
+		theta = theta_c + half_width*offsets
+		z = v*np.exp(1j*theta)
+		cost = np.abs(a - s*z) + np.abs(m - z)
+		
+		theta_c = theta[np.argmin(cost)]
+		half_width = 2.0*half_width/num_samples
+		
+	return v*np.array([np.cos(theta_c), np.sin(theta_c)])
+	
+#----- Rolling statistics of the object poses -----
+
+class RollingPoseStatistics:
+
+	# Keeps the sum and the sum of outer products of the last 'buffer_length'
+	# poses, so that their mean and 3x3 covariance are updated in O(1) per pose.
+	# The poses are taken relative to an origin close to them to avoid
+	# cancellation, and the sums are recomputed from the window once every
+	# 'buffer_length' poses to remove the accumulated rounding errors.
+
+	def __init__(self, buffer_length):
+	
+		self.bufferLength = buffer_length
+		self.Reset()
+	
+	def Reset(self):
+	
+		self.window = np.zeros((self.bufferLength, 3))
+		self.n = 0
+		self.head = 0
+		self.numUpdates = 0
+		
+		self.origin = None
+		self.S1 = np.zeros(3)
+		self.S2 = np.zeros((3, 3))
+	
+	def Push(self, pose):
+	
+		pose = np.asarray(pose, dtype=np.float64).reshape(3)
+		
+		if self.origin is None:
+			self.origin = np.copy(pose)
+		
+		x = pose - self.origin
+		
+		if self.n == self.bufferLength:
+			x_old = self.window[self.head]
+			self.S1 -= x_old
+			self.S2 -= np.outer(x_old, x_old)
+		else:
+			self.n += 1
+		
+		self.window[self.head] = x
+		self.head = (self.head + 1) % self.bufferLength
+		
+		self.S1 += x
+		self.S2 += np.outer(x, x)
+		
+		self.numUpdates += 1
+		
+		if self.numUpdates % self.bufferLength == 0:
+			self.Recompute()
+	
+	def Recompute(self):
+	
+		# Also moves the origin to the mean of the window, which keeps the poses
+		# small while the object moves away from the first pose
+		
+		X = self.window[:self.n]
+		
+		shift = np.mean(X, axis=0)
+		X -= shift
+		self.origin += shift
+		
+		self.S1 = np.sum(X, axis=0)
+		self.S2 = np.matmul(X.T, X)
+	
+	def Mean(self):
+	
+		return self.origin + self.S1/self.n
+	
+	def Covariance(self):
+	
+		mean = self.S1/self.n
+		
+		return self.S2/self.n - np.outer(mean, mean)
+	
+	def PrincipalDirection(self):
+	
+		# Same direction as the first right singular vector of the centered poses,
+		# up to the sign
+		
+		w, V = LA.eigh(self.Covariance())
+		
+		return V[:, -1]
+
+#----- Probing strategies for the initial direction estimation -----
+
+PROBING_STRATEGIES = ['exhaustive', 'adaptive']
+
+class InitialDirectionProbing:
+
+	# Chooses the candidate directions that are probed at the start of the door
+	# opening. The candidates lie on the Nx x Ny grid of the hemisphere used by
+	# 'CalculateInitialDirections' and every probe is scored with the drop of the
+	# measured force 'y'.
+	#
+	# 'exhaustive' probes every candidate of the grid, in the same order as before.
+	# 'adaptive' is a coarse-to-fine search: it starts with the coarse subgrid,
+	# then probes the untried neighbours (along x and y) of the best direction
+	# with a halved grid step, and stops once the best score improves by less than 'tol' from one
+	# round to the next, or once the best direction has no untried neighbour.
+
+	def __init__(self, strategy='exhaustive', Nx=5, Ny=5, tol=0.02):
+
+		if strategy not in PROBING_STRATEGIES:
+			raise ValueError("Unknown probing strategy: " + str(strategy))
+
+		self.strategy = strategy
+		self.tol = tol
+
+		self.listOfX = list(np.linspace(-1.0, 1.0, num=Nx))
+		self.listOfY = list(np.linspace(-1.0, 1.0, num=Ny))
+
+		self.grid = [(i, j) for i in range(Nx) for j in range(Ny) if self.listOfX[i]**2 + self.listOfY[j]**2 <= 1]
+
+		self.scores = dict()
+		self.probeTimes = []
+
+		if self.strategy == 'exhaustive':
+
+			self.queue = list(self.grid)
+			self.step = 1
+
+		else:
+
+			self.step = max(1, (max(Nx, Ny) - 1)//2)
+			self.queue = [(i, j) for (i, j) in self.grid if i % self.step == 0 and j % self.step == 0]
+
+		self.bestScore = None
+		self.current = None
+
+	def Direction(self, idx):
+
+		x = self.listOfX[idx[0]]
+		y = self.listOfY[idx[1]]
+
+		return [x, y, -(1.0 - x**2 - y**2)**0.5]
+
+	def NextDirection(self):
+
+		# Returns the next direction to probe or None once the search is over
+
+		if len(self.queue) == 0 and self.strategy == 'adaptive':
+			self.Refine()
+
+		if len(self.queue) == 0:
+			return None
+
+		self.current = self.queue.pop(0)
+
+		return self.Direction(self.current)
+
+	def Report(self, y, probe_time=None):
+
+		# Score of the direction returned by the last call of 'NextDirection'
+
+		self.scores[self.current] = y
+
+		if probe_time is not None:
+			self.probeTimes.append(probe_time)
+
+	def Refine(self):
+
+		if not self.scores:
+			return
+
+		best = max(self.scores, key=self.scores.get)
+
+		bestScore = self.scores[best]
+
+		if self.bestScore is not None and bestScore - self.bestScore < self.tol:
+			return
+
+		self.bestScore = bestScore
+		self.step = max(1, self.step//2)
+
+		for di, dj in ((-self.step, 0), (self.step, 0), (0, -self.step), (0, self.step)):
+
+			idx = (best[0] + di, best[1] + dj)
+
+			if idx in self.grid and idx not in self.scores:
+				self.queue.append(idx)
+
+	def Summary(self):
+
+		# Probes used, probes of the exhaustive grid and the time saved against
+		# the exhaustive grid, estimated with the mean time of a probe
+
+		numProbes = len(self.scores)
+		numGrid = len(self.grid)
+
+		meanProbeTime = np.mean(self.probeTimes) if len(self.probeTimes) > 0 else 0.0
+
+		return {
+			'strategy': self.strategy,
+			'probes': numProbes,
+			'grid_probes': numGrid,
+			'time_saved': (numGrid - numProbes)*meanProbeTime,
+		}
+
+#----- Latency profiling of the control loop -----
+
+PROFILER_STAGES = ['measurement', 'estimator', 'velocity_split', 'qp_solve', 'motor_command', 'physics_step', 'logging']
+
+LATENCY_TRACE_FILE_NAME = 'latency_trace.json'
+
+class _ProfilerSpan:
+
+	def __init__(self, profiler, stage):
+
+		self.profiler = profiler
+		self.stage = stage
+		self.start = 0
+
+	def __enter__(self):
+
+		self.start = perf_counter_ns()
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+
+		self.profiler.Record(self.stage, self.start, perf_counter_ns())
+		return False
+
+class _NullSpan:
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		return False
+
+_NULL_SPAN = _NullSpan()
+
+class LatencyProfiler:
+
+	# Times the stages of the control loop (see PROFILER_STAGES) with
+	# perf_counter_ns. Every stage is timed with
+	#
+	#   with profiler.Stage('qp_solve'):
+	#       ...
+	#
+	# and the spans are kept with the iteration they belong to, set with
+	# 'NextIteration'. The statistics sum the spans of a stage per iteration, so a
+	# stage that is timed in several places of one iteration counts once. All the
+	# spans of a run are exported as a Chrome trace (chrome://tracing, Perfetto),
+	# with the statistics of the stages in 'otherData'. A disabled profiler only
+	# returns a shared no-op span.
+
+	def __init__(self, enabled=True):
+
+		self.enabled = enabled
+		self.Reset()
+
+	def Reset(self):
+
+		self.stages = []
+		self.starts = []
+		self.durations = []
+		self.iterations = []
+
+		self.iteration = 0
+		self.origin = perf_counter_ns()
+
+	def NextIteration(self, iteration=None):
+
+		self.iteration = self.iteration + 1 if iteration is None else iteration
+
+	def Stage(self, stage):
+
+		if not self.enabled:
+			return _NULL_SPAN
+
+		return _ProfilerSpan(self, stage)
+
+	def Record(self, stage, start, stop):
+
+		self.stages.append(stage)
+		self.starts.append(start - self.origin)
+		self.durations.append(stop - start)
+		self.iterations.append(self.iteration)
+
+	def StageDurations(self, stage):
+
+		# Duration of the stage in every iteration in which it was timed [ns]
+
+		stages = np.array(self.stages)
+		mask = stages == stage
+
+		if not np.any(mask):
+			return np.zeros(0, dtype=np.int64)
+
+		iterations = np.array(self.iterations, dtype=np.int64)[mask]
+		durations = np.array(self.durations, dtype=np.int64)[mask]
+
+		_, idx = np.unique(iterations, return_inverse=True)
+
+		return np.bincount(idx, weights=durations).astype(np.int64)
+
+	def Histogram(self, stage, bins=None):
+
+		# Histogram of the durations of the stage [us], by default with
+		# logarithmic bins from 1 us to 10 s
+
+		if bins is None:
+			bins = np.logspace(0, 7, num=71)
+
+		return np.histogram(self.StageDurations(stage)*1e-3, bins=bins)
+
+	def Summary(self):
+
+		# Statistics of every timed stage [us]
+
+		summary = OrderedDict()
+
+		for stage in sorted(set(self.stages), key=lambda s: PROFILER_STAGES.index(s) if s in PROFILER_STAGES else len(PROFILER_STAGES)):
+
+			durations = self.StageDurations(stage)*1e-3
+			p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+
+			summary[stage] = {
+				'count': int(len(durations)),
+				'mean': float(np.mean(durations)),
+				'p50': float(p50),
+				'p95': float(p95),
+				'p99': float(p99),
+				'max': float(np.max(durations)),
+			}
+
+		return summary
+
+	def PrintSummary(self):
+
+		print("{:>16} {:>8} {:>10} {:>10} {:>10} {:>10}".format("stage [us]", "count", "p50", "p95", "p99", "max"))
+
+		for stage, s in self.Summary().items():
+			print("{:>16} {:8d} {:10.1f} {:10.1f} {:10.1f} {:10.1f}".format(stage, s['count'], s['p50'], s['p95'], s['p99'], s['max']))
+
+	def SaveTrace(self, folder_name, process_name='control_loop'):
+
+		# Chrome trace events use microseconds
+
+		events = [{'name': 'process_name', 'ph': 'M', 'pid': 0, 'tid': 0, 'args': {'name': process_name}}]
+
+		for stage, start, duration, iteration in zip(self.stages, self.starts, self.durations, self.iterations):
+			events.append({
+				'name': stage, 'cat': 'control', 'ph': 'X', 'pid': 0, 'tid': 0,
+				'ts': start*1e-3, 'dur': duration*1e-3, 'args': {'iteration': iteration},
+			})
+
+		if not os.path.isdir(folder_name):
+			os.makedirs(folder_name)
+
+		with open(os.path.join(folder_name, LATENCY_TRACE_FILE_NAME), 'w') as trace_file:
+			json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': self.Summary()}, trace_file)
@@ -0,0 +1,260 @@
+import os
+import json
+import hashlib
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+#----- Description -----
+
+# Renders a batch of matplotlib figures to files in a pool of headless (Agg)
+# worker processes. The calling process does not plot anything: a figure is
+# described by a FigureJob, created with 'figure_subplots' like with
+# plt.subplots, which records the calls on its axes (plot, fill_between,
+# set_ylabel, legend, ...) together with their data. Every job is sent to one of
+# the workers, which builds the figure by replaying the calls and saves it.
+#
+# Every job is identified by a digest of its recorded calls, i.e. of the data and
+# the plot parameters of the figure, and an optional salt, e.g. a hash of the
+# script that describes the figures. The digests of the saved figures are kept
+# in a cache file next to them. The digest is checked before any plotting, and
+# figures whose digest did not change since they were saved are skipped.
+
+#-----------------------
+
+CACHE_NAME = "figure_cache.json"
+
+#----- Axes methods that return a new axes, which the later calls can refer to -----
+
+TWIN_METHODS = ["twinx", "twiny"]
+
+
+def _freeze(value):
+
+    #----- Copy of the arguments of a call, so that the data can not change
+    # between recording and rendering -----
+
+    if isinstance(value, np.ndarray):
+        return np.array(value)
+
+    if isinstance(value, list):
+        return [_freeze(v) for v in value]
+
+    if isinstance(value, tuple):
+        return tuple(_freeze(v) for v in value)
+
+    if isinstance(value, dict):
+        return {k: _freeze(v) for k, v in value.items()}
+
+    return value
+
+
+def _update_digest(h, value):
+
+    if isinstance(value, np.ndarray):
+        h.update(repr((value.dtype.str, value.shape)).encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+
+    elif isinstance(value, (list, tuple)):
+        h.update(b"(")
+        for v in value:
+            _update_digest(h, v)
+        h.update(b")")
+
+    elif isinstance(value, dict):
+        h.update(b"{")
+        for k in sorted(value.keys()):
+            h.update(repr(k).encode())
+            _update_digest(h, value[k])
+        h.update(b"}")
+
+    else:
+        h.update(repr(value).encode())
+
+
+class _AxesRecorder:
+
+    #----- Stands in for one axes of a FigureJob and records the calls on it -----
+
+    def __init__(self, job, axes_idx):
+
+        self._job = job
+        self._axes_idx = axes_idx
+
+    def __getattr__(self, name):
+
+        def record(*args, **kwargs):
+            return self._job.record(self._axes_idx, name, args, kwargs)
+
+        return record
+
+
+class FigureJob:
+
+    def __init__(self, nrows=1, ncols=1, **fig_kw):
+
+        self.nrows = nrows
+        self.ncols = ncols
+        self.fig_kw = _freeze(fig_kw)
+
+        self.num_axes = nrows*ncols
+        self.calls = []
+
+    def axes(self):
+
+        #----- Recorders of the axes, in the layout returned by plt.subplots -----
+
+        recorders = [_AxesRecorder(self, i) for i in range(self.nrows*self.ncols)]
+
+        if self.nrows == 1 and self.ncols == 1:
+            return recorders[0]
+
+        if self.nrows == 1 or self.ncols == 1:
+            return tuple(recorders)
+
+        return tuple(tuple(recorders[r*self.ncols:(r + 1)*self.ncols]) for r in range(self.nrows))
+
+    def record(self, axes_idx, name, args, kwargs):
+
+        self.calls.append((axes_idx, name, _freeze(args), _freeze(kwargs)))
+
+        if name in TWIN_METHODS:
+            self.num_axes += 1
+            return _AxesRecorder(self, self.num_axes - 1)
+
+        return None
+
+    def digest(self, salt=""):
+
+        h = hashlib.sha1(salt.encode())
+        _update_digest(h, (self.nrows, self.ncols, self.fig_kw, self.calls))
+
+        return h.hexdigest()
+
+    def build(self):
+
+        #----- Builds the figure by replaying the recorded calls -----
+
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        fig, axes = plt.subplots(self.nrows, self.ncols, squeeze=False, **self.fig_kw)
+        axes = list(axes.flat)
+
+        for axes_idx, name, args, kwargs in self.calls:
+
+            result = getattr(axes[axes_idx], name)(*args, **kwargs)
+
+            if name in TWIN_METHODS:
+                axes.append(result)
+
+        return fig
+
+
+def figure_subplots(nrows=1, ncols=1, **fig_kw):
+
+    #----- Same call as plt.subplots, returns the job instead of the figure -----
+
+    job = FigureJob(nrows, ncols, **fig_kw)
+
+    return job, job.axes()
+
+
+def _load_cache(folder):
+
+    cache_path = os.path.join(folder, CACHE_NAME)
+
+    if not os.path.isfile(cache_path):
+        return dict()
+
+    with open(cache_path, "r") as f:
+        return json.load(f)
+
+
+def _save_cache(folder, cache):
+
+    cache_path = os.path.join(folder, CACHE_NAME)
+    tmp_path = cache_path + ".tmp"
+
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+    os.replace(tmp_path, cache_path)
+
+
+def _render_worker(job, file_path):
+
+    import matplotlib.pyplot as plt
+
+    fig = job.build()
+    fig.savefig(file_path)
+    plt.close(fig)
+
+    return file_path
+
+
+def render_figures(jobs, folder, num_workers=None, salt="", use_cache=True):
+
+    #----- Saves every (FigureJob, file name) of jobs into folder. Returns the
+    # list of the file names that were rendered -----
+
+    if num_workers is None or num_workers < 1:
+        num_workers = os.cpu_count()
+
+    cache = _load_cache(folder) if use_cache else dict()
+
+    todo = []
+
+    for job, file_name in jobs:
+
+        digest = job.digest(salt)
+        file_path = os.path.join(folder, file_name)
+
+        if cache.get(file_name) == digest and os.path.isfile(file_path):
+            print("Figure unchanged: " + file_name)
+        else:
+            todo.append((job, file_name, digest))
+
+    rendered = []
+
+    if len(todo) > 0 and min(num_workers, len(todo)) == 1:
+
+        #----- Starting a worker does not pay off for a single process -----
+
+        try:
+            for job, file_name, digest in todo:
+                _render_worker(job, os.path.join(folder, file_name))
+                cache[file_name] = digest
+                rendered.append(file_name)
+                print("Figure rendered: " + file_name)
+
+        finally:
+            _save_cache(folder, cache)
+
+    elif len(todo) > 0:
+
+        ctx = mp.get_context("spawn")
+
+        with ProcessPoolExecutor(max_workers=min(num_workers, len(todo)), mp_context=ctx) as executor:
+
+            futures = [
+                (executor.submit(_render_worker, job, os.path.join(folder, file_name)), file_name, digest)
+                for job, file_name, digest in todo
+            ]
+
+            try:
+                for future, file_name, digest in futures:
+                    future.result()
+                    cache[file_name] = digest
+                    rendered.append(file_name)
+                    print("Figure rendered: " + file_name)
+
+            finally:
+                _save_cache(folder, cache)
+
+    else:
+        _save_cache(folder, cache)
+
+    return rendered
@@ -7,6 +7,8 @@ from datetime import datetime
 
 import matplotlib.pyplot as plt 
 
+from highlevel_planning.tools.trajectory_logger import RunView
+
 def prepare_global_dir():
 
 	date_and_time = datetime.now()
@@ -46,34 +48,7 @@ def save_run(sk_traj, curr_folder, mode_name):
 
 	folder_name = curr_folder + '/' + mode_name
 	
-	if not os.path.isdir(folder_name):
-		os.makedirs(folder_name)
-        		  
-	np.save(folder_name+'/q.npy', np.array(sk_traj.log_q))
-	np.save(folder_name+'/q_dot.npy', np.array(sk_traj.log_q_dot))
-	np.save(folder_name+'/tau.npy', np.array(sk_traj.log_tau))
-		
-	np.save(folder_name+'/estimated_dir.npy', np.array(sk_traj.log_estimated_dir))		
-	np.save(folder_name+'/actual_dir.npy',  np.array(sk_traj.log_actual_dir))			
-								
-	np.save(folder_name+'/exec_time.npy', np.array(sk_traj.log_exec_time)) 
-	np.save(folder_name+'/lin_vdesEE_O.npy', np.array(sk_traj.log_lin_vdesEE_O))
-	np.save(folder_name+'/ang_vdesEE_O.npy', np.array(sk_traj.log_ang_vdesEE_O))
-		
-	np.save(folder_name+'/theta.npy', np.array(sk_traj.log_theta))
-	np.save(folder_name+'/lin_vEE_O_meas.npy', np.array(sk_traj.log_lin_vEE_O_meas))
-	np.save(folder_name+'/ang_vEE_O_meas.npy', np.array(sk_traj.log_ang_vEE_O_meas))
-	np.save(folder_name+'/manipulability_meas.npy', np.array(sk_traj.log_manipulability_meas)) 
-		
-	np.save(folder_name+'/lin_vBase_O_meas.npy', np.array(sk_traj.log_lin_vBase_O_meas)) 
-	np.save(folder_name+'/ang_vBase_O_meas.npy', np.array(sk_traj.log_ang_vBase_O_meas))
-		
-	np.save(folder_name+'/q_dot_optimal.npy', np.array(sk_traj.log_q_dot_optimal))
-	np.save(folder_name+'/relative_v.npy', np.array(sk_traj.log_relative_v))
-	
-	np.save(folder_name+'/f_wristframe.npy', np.array(sk_traj.log_f_wristframe))
-	np.save(folder_name+'/t_wristframe.npy', np.array(sk_traj.log_t_wristframe))
-	np.save(folder_name+'/actual_drawer_pos.npy', np.array(sk_traj.log_actual_drawer_pos))
+	sk_traj.logger.save(folder_name)
 	
 	print("***** Run saved! *****")
 	
@@ -93,31 +68,33 @@ def plot_runs(sk_traj, curr_folder, list_of_modes):
 		
 		#----- LOAD -----
 		
-		q = np.load(folder_name+'//q.npy')
-		q_dot = np.load(folder_name+'//q_dot.npy')
-		tau = np.load(folder_name+'//tau.npy')
+		traj = RunView(folder_name)
+		
+		q = traj['q']
+		q_dot = traj['q_dot']
+		tau = traj['tau']
 		
-		estimated_dir = np.load(folder_name+'//estimated_dir.npy')		
-		actual_dir = np.load(folder_name+'//actual_dir.npy')			
+		estimated_dir = traj['estimated_dir']		
+		actual_dir = traj['actual_dir']			
 								
-		exec_time = np.load(folder_name+'//exec_time.npy') 
-		lin_vdesEE_O = np.load(folder_name+'//lin_vdesEE_O.npy')
-		ang_vdesEE_O = np.load(folder_name+'//ang_vdesEE_O.npy')
+		exec_time = traj['exec_time'] 
+		lin_vdesEE_O = traj['lin_vdesEE_O']
+		ang_vdesEE_O = traj['ang_vdesEE_O']
 		
-		theta = np.load(folder_name+'//theta.npy')
-		lin_vEE_O_meas = np.load(folder_name+'//lin_vEE_O_meas.npy')
-		ang_vEE_O_meas = np.load(folder_name+'//ang_vEE_O_meas.npy')
-		manipulability_meas = np.load(folder_name+'//manipulability_meas.npy') 
+		theta = traj['theta']
+		lin_vEE_O_meas = traj['lin_vEE_O_meas']
+		ang_vEE_O_meas = traj['ang_vEE_O_meas']
+		manipulability_meas = traj['manipulability_meas'] 
 		
-		lin_vBase_O_meas = np.load(folder_name+'//lin_vBase_O_meas.npy') 
-		ang_vBase_O_meas = np.load(folder_name+'//ang_vBase_O_meas.npy')
+		lin_vBase_O_meas = traj['lin_vBase_O_meas'] 
+		ang_vBase_O_meas = traj['ang_vBase_O_meas']
 		
-		q_dot_optimal = np.load(folder_name+'//q_dot_optimal.npy')
-		relative_v = np.load(folder_name+'//relative_v.npy')
+		q_dot_optimal = traj['q_dot_optimal']
+		relative_v = traj['relative_v']
 		
-		f_wristframe = np.load(folder_name+'//f_wristframe.npy')
-		t_wristframe = np.load(folder_name+'//t_wristframe.npy')
-		actual_drawer_pose = np.load(folder_name+'//actual_drawer_pos.npy')
+		f_wristframe = traj['f_wristframe']
+		t_wristframe = traj['t_wristframe']
+		actual_drawer_pose = traj['actual_drawer_pos']
 		
 		#----- CALCULATE -----
 		
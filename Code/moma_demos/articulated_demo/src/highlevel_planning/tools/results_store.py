@@ -0,0 +1,264 @@
+import operator
+import numpy as np
+
+from highlevel_planning.tools.trajectory_logger import RunView
+
+#----- Description -----
+
+# Single file store for the results of a whole batch of door opening runs, used
+# by the analysis scripts instead of crawling the run folders. Every run is
+# identified by an integer key (object, criterion, value, config, controller)
+# and is reduced to the feature channels in FEATURE_NAMES. The runs have
+# different lengths, hence the features of all runs are concatenated along the
+# time axis and every run keeps its offset and length. Runs that were stopped
+# early keep their actual length, the outcome saved with a run (the index in
+# OUTCOMES of termination_monitor) is stored next to it, -1 for runs saved
+# without an outcome. The store is saved compressed into one .npz file.
+#
+# Dense tensors are only built for the keys that an analysis asks for. For the
+# existing analysis code, indexing the store like the former dense matrix
+#
+#   store[i, j, k, run, c, feature, t]
+#
+# gives the same values. Like in the dense matrix, the last time step
+# (num_steps) holds the length of the run in feature 0, and keys without a run
+# give zeros. A full index of integers reads the single value from the data,
+# the matrix of a run is only built for slices.
+
+#-----------------------
+
+FEATURE_NAMES = [
+    "dot_product",
+    "manipulability",
+    "exec_time",
+    "lin_vEE_O_meas_x",
+    "lin_vEE_O_meas_y",
+    "lin_vEE_O_meas_z",
+    "lin_vdesEE_O_x",
+    "lin_vdesEE_O_y",
+    "lin_vdesEE_O_z",
+    "actual_drawer_pos_x",
+    "actual_drawer_pos_y",
+    "actual_drawer_pos_z",
+]
+
+NUM_KEY_LEVELS = 5
+
+#----- Types of the indices that select a single element of a key level or axis -----
+
+INTEGER_TYPES = frozenset([int, np.int8, np.int16, np.int32, np.int64, np.uint8, np.uint16, np.uint32, np.uint64])
+
+
+def compute_features(traj):
+
+    #----- Reduces the channels of one run (see RunView) to FEATURE_NAMES,
+    # one row per feature -----
+
+    estimated_dir = np.reshape(traj["estimated_dir"], (-1, 3))
+    actual_dir = np.reshape(traj["actual_dir"], (-1, 3))
+
+    return np.concatenate((
+        np.einsum('ij,ij->i', estimated_dir, actual_dir)[np.newaxis, :],
+        np.reshape(traj["manipulability_meas"], (1, -1)),
+        np.reshape(traj["exec_time"], (1, -1)),
+        np.transpose(traj["lin_vEE_O_meas"][:, :3]),
+        np.transpose(traj["lin_vdesEE_O"][:, :3]),
+        np.transpose(traj["actual_drawer_pos"][:, :3]),
+    ), axis=0)
+
+
+def ingest_runs(entries, store_path, num_steps=1200, key_shape=None):
+
+    #----- Builds the store from entries, an iterable of (key, run folder). Runs
+    # longer than num_steps are cut, like in the former dense matrix. key_shape
+    # is the number of indices of every key level, by default the largest
+    # index + 1 -----
+
+    keys = []
+    blocks = []
+    lengths = []
+    outcomes = []
+
+    for key, folder_name in entries:
+
+        run = RunView(folder_name)
+        features = compute_features(run)[:, :num_steps]
+
+        keys.append(key)
+        blocks.append(features)
+        lengths.append(features.shape[1])
+        outcomes.append(int(run["outcome"]) if "outcome" in run else -1)
+
+    keys = np.reshape(np.array(keys, dtype=np.int64), (-1, NUM_KEY_LEVELS))
+    lengths = np.array(lengths, dtype=np.int64)
+    outcomes = np.array(outcomes, dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+
+    if len(blocks) > 0:
+        data = np.concatenate(blocks, axis=1)
+    else:
+        data = np.zeros((len(FEATURE_NAMES), 0))
+
+    np.savez_compressed(
+        store_path,
+        keys=keys,
+        key_shape=np.array(key_shape if key_shape is not None else np.max(keys, axis=0, initial=-1) + 1, dtype=np.int64),
+        offsets=offsets,
+        lengths=lengths,
+        outcomes=outcomes,
+        data=data,
+        feature_names=np.array(FEATURE_NAMES),
+        num_steps=np.array(num_steps),
+    )
+
+    return ResultsStore(store_path)
+
+
+def _normalize_index(index, size):
+
+    #----- Integer index of an axis of length size, negative indices count from
+    # the end like in numpy -----
+
+    index = int(index)
+
+    if index < -size or index >= size:
+        raise IndexError("index " + str(index) + " is out of bounds for axis with size " + str(size))
+
+    return index + size if index < 0 else index
+
+
+class ResultsStore:
+
+    def __init__(self, store_path):
+
+        with np.load(store_path) as store:
+            self.keys = store["keys"]
+            self.offsets = store["offsets"]
+            self.lengths = store["lengths"]
+            self.outcomes = store["outcomes"] if "outcomes" in store.files else -np.ones(len(self.lengths), dtype=np.int64)
+            self.data = store["data"]
+            self.feature_names = [str(name) for name in store["feature_names"]]
+            self.num_steps = int(store["num_steps"])
+            self.key_shape = tuple(store["key_shape"].tolist())
+
+        self.row_of_key = {tuple(key): row for row, key in enumerate(self.keys.tolist())}
+
+        self.shape = self.key_shape + (len(self.feature_names), self.num_steps + 1)
+
+    def __len__(self):
+
+        return len(self.lengths)
+
+    def get_run(self, key):
+
+        #----- Features of one run, shape (num features, length), or None -----
+
+        row = self.row_of_key.get(tuple(key))
+
+        if row is None:
+            return None
+
+        return self.data[:, self.offsets[row]:self.offsets[row] + self.lengths[row]]
+
+    def get_outcome(self, key):
+
+        #----- Outcome code of one run, -1 if it is unknown or there is no run -----
+
+        row = self.row_of_key.get(tuple(key))
+
+        if row is None:
+            return -1
+
+        return int(self.outcomes[row])
+
+    def run_matrix(self, key):
+
+        #----- Features of one run in the layout of the former dense matrix -----
+
+        out = np.zeros((len(self.feature_names), self.num_steps + 1))
+        row = self.row_of_key.get(tuple(key))
+
+        if row is not None:
+            length = self.lengths[row]
+            out[:, :length] = self.data[:, self.offsets[row]:self.offsets[row] + length]
+            out[0, self.num_steps] = length
+
+        return out
+
+    def tensor(self, objects=None, criteria=None, values=None, runs=None, controllers=None):
+
+        #----- Dense tensor for the selected indices of every key level (None
+        # selects all of them), shape (..., num features, num_steps + 1) -----
+
+        selection = [objects, criteria, values, runs, controllers]
+        selection = [np.arange(self.shape[l]) if sel is None else np.atleast_1d(sel) for l, sel in enumerate(selection)]
+
+        out = np.zeros(tuple(len(sel) for sel in selection) + (len(self.feature_names), self.num_steps + 1))
+
+        #----- Position of every stored run in the output, -1 if it is not selected -----
+
+        positions = np.zeros(self.keys.shape, dtype=np.int64)
+
+        for l, sel in enumerate(selection):
+            lookup = -np.ones(self.shape[l], dtype=np.int64)
+            lookup[sel] = np.arange(len(sel))
+            positions[:, l] = lookup[self.keys[:, l]]
+
+        selected = np.flatnonzero(np.all(positions >= 0, axis=1))
+
+        for row in selected:
+            idx = tuple(positions[row])
+            length = self.lengths[row]
+            out[idx][:, :length] = self.data[:, self.offsets[row]:self.offsets[row] + length]
+            out[idx][0, self.num_steps] = length
+
+        return out
+
+    def element(self, index):
+
+        #----- One value store[i, j, k, run, c, feature, t], read directly from
+        # the data of the run without building its matrix -----
+
+        if min(index) < 0 or not all(map(operator.lt, index, self.shape)):
+            index = tuple(map(_normalize_index, index, self.shape))
+
+        feature = index[NUM_KEY_LEVELS]
+        t = index[NUM_KEY_LEVELS + 1]
+
+        row = self.row_of_key.get(index[:NUM_KEY_LEVELS])
+
+        if row is None:
+            return np.float64(0.0)
+
+        if t < self.lengths[row]:
+            return self.data[feature, self.offsets[row] + t]
+
+        if t == self.num_steps and feature == 0:
+            return np.float64(self.lengths[row])
+
+        return np.float64(0.0)
+
+    def __getitem__(self, index):
+
+        if not isinstance(index, tuple):
+            index = (index,)
+
+        if len(index) == NUM_KEY_LEVELS + 2 and INTEGER_TYPES.issuperset(map(type, index)):
+            return self.element(index)
+
+        key = index[:NUM_KEY_LEVELS]
+        rest = index[NUM_KEY_LEVELS:]
+
+        if len(key) == NUM_KEY_LEVELS and INTEGER_TYPES.issuperset(map(type, key)):
+            key = tuple(map(_normalize_index, key, self.key_shape))
+            return self.run_matrix(key)[rest]
+
+        #----- Slices of the key levels, build the dense tensor of the selection
+        # and drop the levels that were indexed with an integer -----
+
+        selection = [np.arange(self.shape[l])[key[l]] if l < len(key) else None for l in range(NUM_KEY_LEVELS)]
+        integer_levels = tuple(l for l in range(len(key)) if np.ndim(selection[l]) == 0)
+
+        tensor = np.squeeze(self.tensor(*selection), axis=integer_levels)
+
+        return tensor[(Ellipsis,) + rest]
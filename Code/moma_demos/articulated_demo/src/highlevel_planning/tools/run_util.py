@@ -58,7 +58,7 @@ def setup_pybullet_world(scene_object, basedir, savedir, objects, args, cfg, rob
     robot.reset()
 
     robot.to_start()
-    world.step_seconds(0.5)
+    world.fast_forward(0.5)
 
     # Save world
     if not args.reuse_objects:
@@ -66,6 +66,6 @@ def setup_pybullet_world(scene_object, basedir, savedir, objects, args, cfg, rob
             os.makedirs(savedir)
         with open(os.path.join(savedir, "objects.pkl"), "wb") as output:
             pickle.dump((scene.objects, robot.model), output)
-        p.saveBullet(os.path.join(savedir, "state.bullet"))
+        p.saveBullet(os.path.join(savedir, "state.bullet"), physicsClientId=world.physics_client)
 
     return robot, scene
@@ -30,6 +30,50 @@ def parse_arguments():
         help="determines in which mode to connect to pybullet. Can be 'gui', 'direct' or 'shared'.",
         default="direct",				# To display gui put 'gui'
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        action="store",
+        type=int,
+        help="number of configurations simulated in parallel when running a sweep. Defaults to the number of cores.",
+        default=None,
+    )
+    parser.add_argument(
+        "-t",
+        "--timeout",
+        action="store",
+        type=float,
+        help="if given, a configuration of a sweep is aborted after this many seconds.",
+        default=None,
+    )
+    parser.add_argument(
+        "--no-early-stop",
+        action="store_true",
+        help="if given, every run takes all of its iterations instead of stopping once its outcome is decided.",
+    )
+    parser.add_argument(
+        "--control-decimation",
+        action="store",
+        type=int,
+        help="number of physics ticks per controller update, the commands are held in between.",
+        default=1,
+    )
+    parser.add_argument(
+        "--profile-latency",
+        action="store_true",
+        help="if given, the stages of the control loop are timed and their trace is saved with every run.",
+    )
+    parser.add_argument(
+        "--record-controller-steps",
+        action="store_true",
+        help="if given, the inputs of the controllers are saved with every run, for scripts/benchmark_controllers.py.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store",
+        help="results folder of an interrupted sweep. Configurations that already finished are skipped.",
+        default=None,
+    )
     args = parser.parse_args()
     return args
 
@@ -43,7 +87,7 @@ def restore_pybullet_sim(savedir, args):
     return objects, robot_mdl
 
 
-def setup_pybullet_world(scene_object, basedir, savedir, objects, args, cfg, robot_mdl, graspOffset, elementToAdd):		# Added grasp offset
+def setup_pybullet_world(scene_object, basedir, savedir, objects, args, cfg, robot_mdl, graspOffset, elementToAdd, save_world=True):		# Added grasp offset
     # Create world
     world = WorldPybullet(
         style=args.method,
@@ -58,14 +102,15 @@ def setup_pybullet_world(scene_object, basedir, savedir, objects, args, cfg, rob
     robot.reset()
 
     robot.to_start()
-    world.step_seconds(0.5)
+    world.fast_forward(0.5)
 
-    # Save world
-    if not args.reuse_objects:
+    # Save world. Parallel sweep workers must not do this, since they would all
+    # write to the same files
+    if save_world and not args.reuse_objects:
         if not os.path.isdir(savedir):
             os.makedirs(savedir)
         with open(os.path.join(savedir, "objects.pkl"), "wb") as output:
             pickle.dump((scene.objects, robot.model), output)
-        p.saveBullet(os.path.join(savedir, "state.bullet"))
+        p.saveBullet(os.path.join(savedir, "state.bullet"), physicsClientId=world.physics_client)
 
     return robot, scene
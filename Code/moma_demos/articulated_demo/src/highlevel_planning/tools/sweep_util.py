@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import traceback
+import queue
+import multiprocessing as mp
+
+#----- Description -----
+
+# Utilities for running a sweep over many initial configurations of the door
+# opening experiment. Every configuration is executed in its own worker process,
+# which connects to its own pybullet server, so the configurations are fully
+# independent and can run side by side. A manifest file in the global results
+# folder keeps track of the state of every configuration, which is used to resume
+# an interrupted sweep and to report the failed scenarios at the end.
+
+#-----------------------
+
+MANIFEST_NAME = "sweep_manifest.json"
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_TIMEOUT = "timeout"
+STATUS_CRASHED = "crashed"
+
+
+def load_manifest(global_folder):
+
+    manifest_path = os.path.join(global_folder, MANIFEST_NAME)
+
+    if not os.path.isfile(manifest_path):
+        return dict()
+
+    with open(manifest_path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(global_folder, manifest):
+
+    # Write to a temporary file first, so that a crash while writing never
+    # leaves a corrupted manifest behind
+
+    manifest_path = os.path.join(global_folder, MANIFEST_NAME)
+    tmp_path = manifest_path + ".tmp"
+
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    os.replace(tmp_path, manifest_path)
+
+
+def get_failed_scenarios(manifest):
+
+    return sorted(
+        [name for name, entry in manifest.items() if entry["status"] not in [STATUS_DONE, STATUS_PENDING]]
+    )
+
+
+def _sweep_worker(worker_fcn, scen_name, kwargs, result_queue):
+
+    try:
+        worker_fcn(scen_name, **kwargs)
+        result_queue.put((scen_name, STATUS_DONE, None))
+
+    except Exception:
+        result_queue.put((scen_name, STATUS_FAILED, traceback.format_exc()))
+
+
+def run_sweep(worker_fcn, scenarios, global_folder, num_workers=None, timeout=None, poll_period=0.5):
+
+    #----- Runs worker_fcn(scen_name, **kwargs) for every (scen_name, kwargs) in
+    # scenarios, using at most num_workers processes at the same time. Scenarios
+    # that are marked as done in the manifest of global_folder are skipped, which
+    # allows to resume a sweep after a crash. Returns the final manifest -----
+
+    if num_workers is None or num_workers < 1:
+        num_workers = os.cpu_count()
+
+    manifest = load_manifest(global_folder)
+
+    todo = []
+
+    for scen_name, kwargs in scenarios:
+
+        if scen_name in manifest and manifest[scen_name]["status"] == STATUS_DONE:
+            print("Skipping finished combination: ", scen_name)
+            continue
+
+        manifest[scen_name] = {"status": STATUS_PENDING, "duration": None, "error": None}
+        todo.append((scen_name, kwargs))
+
+    save_manifest(global_folder, manifest)
+
+    # Each worker is a single simulation, so prevent the numerical libraries in
+    # the workers from spawning one thread per core on top of the process pool
+
+    for var in ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"]:
+        os.environ.setdefault(var, "1")
+
+    # pybullet keeps its connections in module level state, which must not be
+    # shared with the parent process, hence every worker is spawned fresh
+
+    ctx = mp.get_context("spawn")
+    result_queue = ctx.Queue()
+
+    running = dict()
+
+    def finish(scen_name, status, error):
+
+        process, start_time = running.pop(scen_name)
+        process.join()
+
+        manifest[scen_name] = {"status": status, "duration": time.time() - start_time, "error": error}
+        save_manifest(global_folder, manifest)
+
+        print(50*'=')
+        print('Finished combination: ', scen_name, ' | status: ', status)
+        print(50*'=')
+
+    while len(todo) > 0 or len(running) > 0:
+
+        #----- Start new workers while there are free slots -----
+
+        while len(todo) > 0 and len(running) < num_workers:
+
+            scen_name, kwargs = todo.pop(0)
+
+            print(50*'=')
+            print('Executing combination: ', scen_name)
+            print(50*'=')
+
+            process = ctx.Process(target=_sweep_worker, args=(worker_fcn, scen_name, kwargs, result_queue))
+            process.start()
+
+            running[scen_name] = (process, time.time())
+            manifest[scen_name]["status"] = STATUS_RUNNING
+
+        save_manifest(global_folder, manifest)
+
+        #----- Collect the results of the finished workers -----
+
+        try:
+            scen_name, status, error = result_queue.get(timeout=poll_period)
+            if scen_name in running:
+                finish(scen_name, status, error)
+        except queue.Empty:
+            pass
+
+        #----- Handle workers that died without reporting or took too long -----
+
+        for scen_name in list(running.keys()):
+
+            process, start_time = running[scen_name]
+
+            if not process.is_alive() and process.exitcode != 0:
+                finish(scen_name, STATUS_CRASHED, "Worker exited with code " + str(process.exitcode))
+
+            elif timeout is not None and time.time() - start_time > timeout:
+                process.terminate()
+                finish(scen_name, STATUS_TIMEOUT, "Exceeded timeout of " + str(timeout) + " s")
+
+    failed = get_failed_scenarios(manifest)
+
+    print(30*'='+" List of failed experiments "+30*'=')
+    for name in failed:
+        print(name + ": " + manifest[name]["status"])
+    print("Manifest saved to: " + os.path.join(global_folder, MANIFEST_NAME))
+
+    return manifest
@@ -0,0 +1,227 @@
+import os
+import struct
+import zipfile
+import numpy as np
+
+#----- Description -----
+
+# Columnar logger for the data that is recorded in every control tick of the door
+# opening experiment. Every channel is a NumPy array with one row per tick, which
+# is allocated on the first record (the shape of a row is taken from the recorded
+# value) with room for the expected number of ticks. Recording a tick only copies
+# the values into the next row. If more ticks than expected are recorded, the
+# columns grow by doubling their size, so no data is dropped. Values that exist
+# once per run are stored as constants next to the channels. With max_samples,
+# the logger only keeps the last max_samples ticks in a ring buffer instead.
+#
+# A run is flushed once into a single uncompressed file (TRAJECTORY_FILE_NAME)
+# with one array per channel, which RunView maps lazily into memory. Runs saved
+# before this format existed consist of one .npy file per channel, which
+# load_trajectory and RunView still read.
+
+#-----------------------
+
+TRAJECTORY_FILE_NAME = "trajectory.npz"
+
+
+class TrajectoryLogger:
+
+    def __init__(self, capacity=1000, dtype=np.float64, max_samples=None):
+
+        self.capacity = max(int(capacity), 1)
+        self.dtype = dtype
+
+        self.max_samples = max_samples
+        if max_samples is not None:
+            self.capacity = min(self.capacity, int(max_samples))
+
+        self.columns = dict()
+        self.constants = dict()
+        self.num_samples = 0
+
+        # Row of the oldest tick once the ring buffer is full
+        self.head = 0
+
+    def record(self, **channels):
+
+        #----- Copies the values of one tick into the next row of every channel -----
+
+        wrap = self.max_samples is not None and self.num_samples == self.max_samples
+
+        if self.num_samples == self.capacity and not wrap:
+            self._grow()
+
+        k = self.head if wrap else self.num_samples
+
+        for name, value in channels.items():
+
+            column = self.columns.get(name)
+
+            if column is None:
+                column = np.zeros((self.capacity,) + np.shape(value), dtype=self.dtype)
+                self.columns[name] = column
+
+            column[k] = value
+
+        if wrap:
+            self.head = (self.head + 1) % self.capacity
+        else:
+            self.num_samples += 1
+
+    def set_constant(self, name, value):
+
+        #----- Stores a value that is saved once per run, e.g. a parameter -----
+
+        self.constants[name] = np.array(value, dtype=self.dtype)
+
+    def _grow(self):
+
+        self.capacity *= 2
+        if self.max_samples is not None:
+            self.capacity = min(self.capacity, int(self.max_samples))
+
+        for name, column in self.columns.items():
+            new_column = np.zeros((self.capacity,) + column.shape[1:], dtype=self.dtype)
+            new_column[:self.num_samples] = column[:self.num_samples]
+            self.columns[name] = new_column
+
+    def get(self, name):
+
+        column = self.columns[name][:self.num_samples]
+
+        if self.head > 0:
+            column = np.concatenate((column[self.head:], column[:self.head]), axis=0)
+
+        return column
+
+    def as_dict(self):
+
+        channels = {name: self.get(name) for name in self.columns}
+        channels.update(self.constants)
+
+        return channels
+
+    def save(self, folder_name):
+
+        if not os.path.isdir(folder_name):
+            os.makedirs(folder_name)
+
+        # Not compressed, so that RunView can map the channels
+        np.savez(os.path.join(folder_name, TRAJECTORY_FILE_NAME), **self.as_dict())
+
+
+class RateLimitedPrinter:
+
+    #----- Prints at most once per 'period' of (simulated) time, for status
+    # output inside of control loops -----
+
+    def __init__(self, period=1.0):
+
+        self.period = period
+        self.last_time = None
+
+    def print(self, current_time, *args):
+
+        if self.last_time is not None and current_time - self.last_time < self.period:
+            return False
+
+        self.last_time = current_time
+        print(*args)
+
+        return True
+
+
+def load_trajectory(folder_name):
+
+    #----- Returns a dict with one array per channel of the run saved in folder_name -----
+
+    file_path = os.path.join(folder_name, TRAJECTORY_FILE_NAME)
+
+    if os.path.isfile(file_path):
+        with np.load(file_path) as data:
+            return {name: data[name] for name in data.files}
+
+    # Legacy format, one .npy file per channel
+
+    trajectory = dict()
+
+    for file_name in sorted(os.listdir(folder_name)):
+        if file_name.endswith(".npy"):
+            trajectory[file_name[:-4]] = np.load(os.path.join(folder_name, file_name))
+
+    return trajectory
+
+
+class RunView:
+
+    #----- Read only view of a saved run. Every channel is memory-mapped on its
+    # first access, so only the pages that are actually used are read from the
+    # disk. The run file is written uncompressed, hence every channel is a plain
+    # .npy array inside the zip container and can be mapped at its offset -----
+
+    def __init__(self, folder_name):
+
+        self.folder_name = folder_name
+        self.file_path = os.path.join(folder_name, TRAJECTORY_FILE_NAME)
+
+        self._channels = dict()
+        self._members = dict()
+
+        if os.path.isfile(self.file_path):
+            with zipfile.ZipFile(self.file_path) as archive:
+                for info in archive.infolist():
+                    if info.filename.endswith(".npy"):
+                        self._members[info.filename[:-4]] = info
+        else:
+            # Legacy format, one .npy file per channel
+            for file_name in os.listdir(folder_name):
+                if file_name.endswith(".npy"):
+                    self._members[file_name[:-4]] = None
+
+    def channels(self):
+
+        return sorted(self._members.keys())
+
+    def __contains__(self, name):
+
+        return name in self._members
+
+    def __getitem__(self, name):
+
+        if name not in self._channels:
+            self._channels[name] = self._map_channel(name)
+
+        return self._channels[name]
+
+    def _map_channel(self, name):
+
+        info = self._members[name]
+
+        if info is None:
+            return np.load(os.path.join(self.folder_name, name + ".npy"), mmap_mode='r')
+
+        if info.compress_type != zipfile.ZIP_STORED:
+            with np.load(self.file_path) as data:
+                return data[name]
+
+        with open(self.file_path, "rb") as f:
+
+            #----- Skip the local file header of the zip member, then the .npy header -----
+
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+            name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            offset = f.tell()
+
+        if int(np.prod(shape)) == 0:
+            return np.zeros(shape, dtype=dtype)
+
+        return np.memmap(self.file_path, dtype=dtype, mode='r', offset=offset, shape=shape, order='F' if fortran_order else 'C')
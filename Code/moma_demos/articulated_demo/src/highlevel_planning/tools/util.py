@@ -19,7 +19,7 @@ def quat_from_rotvec(rotvec):
 
 
 def quat_from_mat(mat):
-    orient_rep = R.from_dcm(mat)
+    orient_rep = R.from_matrix(mat)
     return orient_rep.as_quat()
 
 
@@ -35,13 +35,13 @@ def homogenous_trafo(translation, rotation):
     assert type(translation) is np.ndarray
     assert len(translation) == 3
     assert type(rotation) is R
-    t = np.concatenate((rotation.as_dcm(), translation.reshape(-1, 1)), axis=1)
+    t = np.concatenate((rotation.as_matrix(), translation.reshape(-1, 1)), axis=1)
     t = np.concatenate((t, np.array([[0.0, 0.0, 0.0, 1.0]])), axis=0)
     return t
 
 
 def pos_and_orient_from_hom_trafo(hom_trafo):
-    return hom_trafo[:3, 3], R.from_dcm(hom_trafo[:3, :3]).as_quat()
+    return hom_trafo[:3, 3], R.from_matrix(hom_trafo[:3, :3]).as_quat()
 
 
 def invert_hom_trafo(hom_trafo):
@@ -51,7 +51,7 @@ def invert_hom_trafo(hom_trafo):
     return res
 
 
-def get_combined_aabb(uid):
+def get_combined_aabb(uid, physics_client=0):
     """
     By default, the getAABB function offered by pybullet only outputs the bounding
     box for a single link (the base link by default). This function combines the 
@@ -59,12 +59,13 @@ def get_combined_aabb(uid):
     
     Args:
         uid (int): The UID of the object we would like to compute the bounding box of.
+        physics_client (int): The pybullet client the object lives in.
     """
-    num_joints = p.getNumJoints(uid)
-    aabb_min, aabb_max = p.getAABB(uid, linkIndex=-1)
+    num_joints = p.getNumJoints(uid, physicsClientId=physics_client)
+    aabb_min, aabb_max = p.getAABB(uid, linkIndex=-1, physicsClientId=physics_client)
     aabb_min, aabb_max = np.array(aabb_min), np.array(aabb_max)
     for i in range(num_joints):
-        aabb_local_min, aabb_local_max = p.getAABB(uid, linkIndex=i)
+        aabb_local_min, aabb_local_max = p.getAABB(uid, linkIndex=i, physicsClientId=physics_client)
         aabb_local_min, aabb_local_max = (
             np.array(aabb_local_min),
             np.array(aabb_local_max),
@@ -74,9 +75,9 @@ def get_combined_aabb(uid):
     return aabb_min, aabb_max
 
 
-def get_object_position(object_name, scene_objects, knowledge_base):
+def get_object_position(object_name, scene_objects, knowledge_base, physics_client=0):
     if object_name in scene_objects:
-        pos, _ = p.getBasePositionAndOrientation(scene_objects[object_name].model.uid)
+        pos, _ = p.getBasePositionAndOrientation(scene_objects[object_name].model.uid, physicsClientId=physics_client)
         return np.array(pos)
     elif object_name in knowledge_base.lookup_table:
         return knowledge_base.lookup_table[object_name]
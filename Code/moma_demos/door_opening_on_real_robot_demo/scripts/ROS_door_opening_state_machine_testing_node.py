@@ -496,6 +496,9 @@ class RunningState(State):
 
         self.robot.InitProgram()
 
+        self.robot.profiler.enabled = True
+        self.robot.profiler.Reset()
+
         while counter < N_steps and not rospy.is_shutdown():
 
             print(50*'*')
@@ -505,41 +508,42 @@ class RunningState(State):
 
             self.robot.run_once(counter, vInit, vFinal, alphaInit, alphaFinal, t0, tConv, alpha=0.05, smooth=False, mixCoeff=0.1)
 
-            req = PandaStateSrvRequest()
-            panda_model = self.robot.panda_model_state_srv(req)
+            with self.robot.profiler.Stage('logging'):
+                req = PandaStateSrvRequest()
+                panda_model = self.robot.panda_model_state_srv(req)
 
-            stopTime = time.time()
-            interval = stopTime - startTime
+                stopTime = time.time()
+                interval = stopTime - startTime
 
-            ext_wrench = np.array(panda_model.K_F_ext_hat_K)
+                ext_wrench = np.array(panda_model.K_F_ext_hat_K)
 
-            force = list(np.squeeze(ext_wrench[:3]))
+                force = list(np.squeeze(ext_wrench[:3]))
 
-            robot_force.append(force)
-            iteration_times.append(interval)
+                robot_force.append(force)
+                iteration_times.append(interval)
 
-            robot_q.append(panda_model.q)
-            robot_q_d.append(panda_model.q_d)
-            robot_dq.append(panda_model.dq)
-            robot_dq_d.append(panda_model.dq_d)
-            robot_g.append(panda_model.gravity)
-            robot_b.append(panda_model.coriolis)
+                robot_q.append(panda_model.q)
+                robot_q_d.append(panda_model.q_d)
+                robot_dq.append(panda_model.dq)
+                robot_dq_d.append(panda_model.dq_d)
+                robot_g.append(panda_model.gravity)
+                robot_b.append(panda_model.coriolis)
 
-            J_b_ee = np.array(panda_model.jacobian)                     # It is saved as column major but python does everyhing row major
-            robot_Jacobian.append(J_b_ee)
-            J_b_ee = np.transpose(J_b_ee.reshape(7, 6))
-            manipulabilityMeasure = LA.det(np.matmul(J_b_ee, np.transpose(J_b_ee)))**0.5
+                J_b_ee = np.array(panda_model.jacobian)                     # It is saved as column major but python does everyhing row major
+                robot_Jacobian.append(J_b_ee)
+                J_b_ee = np.transpose(J_b_ee.reshape(7, 6))
+                manipulabilityMeasure = LA.det(np.matmul(J_b_ee, np.transpose(J_b_ee)))**0.5
 
-            robot_manip.append(manipulabilityMeasure)
+                robot_manip.append(manipulabilityMeasure)
 
-            robot_tau_d_no_g.append(panda_model.tau_d_no_gravity)
-            robot_EE_T_K.append(panda_model.EE_T_K)
-            robot_O_T_EE.append(panda_model.O_T_EE)
+                robot_tau_d_no_g.append(panda_model.tau_d_no_gravity)
+                robot_EE_T_K.append(panda_model.EE_T_K)
+                robot_O_T_EE.append(panda_model.O_T_EE)
 
-            robot_base_vel.append([self.robot.baseState_msg.twist.twist.linear.x, self.robot.baseState_msg.twist.twist.linear.y, 0.0])
+                robot_base_vel.append([self.robot.baseState_msg.twist.twist.linear.x, self.robot.baseState_msg.twist.twist.linear.y, 0.0])
 
-            direction = list(np.squeeze(np.array(self.robot.direction_estimator.GetCurrEstimate())))
-            robot_dir_estimate.append(direction)
+                direction = list(np.squeeze(np.array(self.robot.direction_estimator.GetCurrEstimate())))
+                robot_dir_estimate.append(direction)
 
             counter += 1
 
@@ -561,6 +565,11 @@ class RunningState(State):
         np.save(self.folder_name + '/robot_true_init_dir', np.array(self.robot.true_init_dir))
         np.save(self.folder_name + '/robot_ee_world_pos', np.array(self.robot.world_ee_pos))
 
+        self.robot.profiler.PrintSummary()
+        self.robot.profiler.SaveTrace(self.folder_name)
+
+        self.robot.profiler.enabled = False
+
 #-------
     def test7(self):
 
@@ -9,6 +9,8 @@ from collections import deque
 EPS = 1e-6
 DEBUG = True
 
+PCA_MODES = ['svd', 'rolling']
+
 #----- Description -----
 
 # This class performs the online direction estimation update procedure. It performs
@@ -17,12 +19,21 @@ DEBUG = True
 # desired end effector velocity (linear + angular) and transfers it to the velocity
 # planner module that performs the velocity split and planning within hardware
 # constraints.
+#
+# The fixed-grasp based estimate is the principal direction of the buffered
+# object poses. In the 'svd' mode it is computed from the SVD of the centered
+# poses in every tick, in the 'rolling' mode from the 3x3 covariance of the poses,
+# which is updated in O(1) per pose, so the cost does not grow with the buffer
+# length.
 
 #-----------------------
 
 class SkillUnconstrainedDirectionEstimation:
 
-    def __init__(self, time_step, buffer_length, init_direction, initN=100, fd1=0.1):
+    def __init__(self, time_step, buffer_length, init_direction, initN=100, fd1=0.1, pca_mode='svd'):
+
+        if pca_mode not in PCA_MODES:
+            raise ValueError("Unknown PCA mode: " + str(pca_mode))
 
         self.dt = time_step
         self.bufferLength = buffer_length
@@ -58,6 +69,9 @@ class SkillUnconstrainedDirectionEstimation:
 
         self.sufficiently_filled = False
 
+        self.pca_mode = pca_mode
+        self.poseStats = RollingPoseStatistics(buffer_length) if pca_mode == 'rolling' else None
+
 #-------
     def reset(self):
 
@@ -66,6 +80,9 @@ class SkillUnconstrainedDirectionEstimation:
         self.objPoseBuffer = deque(maxlen=self.bufferLength)
         self.measuredForcesBuffer = deque(maxlen=self.bufferLength)
 
+        if self.poseStats is not None:
+            self.poseStats.Reset()
+
 #-------
     def SetupButterworthFilter(self):
 
@@ -84,21 +101,20 @@ class SkillUnconstrainedDirectionEstimation:
 
         #----- Fixed-grasp based estimator -----
 
-        sample = np.copy(np.array(self.objPoseBuffer[0]).reshape(1,3))
+        if self.pca_mode == 'rolling':
 
-        X = np.copy(sample)
+            v1 = self.poseStats.PrincipalDirection()
 
-        for i in range(1,len(self.objPoseBuffer)):
+        else:
 
-            sample = np.copy(np.array(self.objPoseBuffer[i]).reshape(1,3))
-            X = np.concatenate((X, sample), axis=0)
+            X = np.array(self.objPoseBuffer).reshape(-1,3)
 
-        data_mean = np.mean(X, axis=0)
-        X_centered = X - data_mean
-        u, s, vh = LA.svd(X_centered,  full_matrices=False)
-        vh = vh.T
+            data_mean = np.mean(X, axis=0)
+            X_centered = X - data_mean
+            u, s, vh = LA.svd(X_centered,  full_matrices=False)
+            vh = vh.T
 
-        v1 = vh[:,0]
+            v1 = vh[:,0]
 
         e = np.sign(np.dot(v1, self.vec))*v1
 
@@ -198,11 +214,17 @@ class SkillUnconstrainedDirectionEstimation:
                 self.objPoseBuffer.append(pose)
                 self.measuredForcesBuffer.append(np.array(f_wristframe).reshape(3,1))
 
+                if self.poseStats is not None:
+                    self.poseStats.Push(pose)
+
         else:
 
             self.objPoseBuffer.append(pose)
             self.measuredForcesBuffer.append(np.array(f_wristframe).reshape(3,1))
 
+            if self.poseStats is not None:
+                self.poseStats.Push(pose)
+
 #-------
     def CalculateInitialDirections(self, Nx=5, Ny=5):
 
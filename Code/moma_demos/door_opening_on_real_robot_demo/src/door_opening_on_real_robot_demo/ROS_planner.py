@@ -45,8 +45,17 @@ class RobotPlanner:
 
         self.cinit = controller_init
 
+        #----- Strategy of the initial direction probing, see PROBING_STRATEGIES -----
+
+        self.probing = 'exhaustive'
+
         self.processing = False
 
+        #----- Latency of the stages of run_once, see LatencyProfiler. Enabled by
+        # the running state of the testing node -----
+
+        self.profiler = LatencyProfiler(enabled=False)
+
         #----- Msg buffer -----
 
         self.baseState_msg = None                                                # Receives the Position and Velocity of the base
@@ -398,52 +407,59 @@ class RobotPlanner:
 #-------
     def run_once(self, t, vInit, vFinal, alphaInit, alphaFinal, t0, tConv, alpha=0.1, smooth=False, mixCoeff=0.1):
 
+        self.profiler.NextIteration(t)
+        self.controller.profiler = self.profiler
+
         #----- Copying -----
 
         try:
-            base_state_msg = Odometry()                                              # Base position and velocity
+            with self.profiler.Stage('measurement'):
 
-            self.processing = True
+                base_state_msg = Odometry()                                              # Base position and velocity
 
-            base_state_msg = self.baseState_msg
+                self.processing = True
 
-            req = PandaStateSrvRequest()
-            panda_model = self.panda_model_state_srv(req)
+                base_state_msg = self.baseState_msg
+
+                req = PandaStateSrvRequest()
+                panda_model = self.panda_model_state_srv(req)
 
-            self.processing = False
+                self.processing = False
 
-            #----- Update values using URDF model -----
+                #----- Update values using URDF model -----
 
-            self.CalculateVars_usingPanda(panda_model, base_state_msg)
+                self.CalculateVars_usingPanda(panda_model, base_state_msg)
 
-            #----- Calculate Info -----
+                #----- Calculate Info -----
 
-            T_O_ee = np.matmul(self.T_O_b, self.T_b_ee)
+                T_O_ee = np.matmul(self.T_O_b, self.T_b_ee)
 
-            C_O_ee = R.from_dcm(T_O_ee[:3, :3])
-            C_O_b = R.from_dcm(self.T_O_b[:3, :3])
-            C_b_ee = R.from_dcm(self.T_b_ee[:3, :3])
+                C_O_ee = R.from_dcm(T_O_ee[:3, :3])
+                C_O_b = R.from_dcm(self.T_O_b[:3, :3])
+                C_b_ee = R.from_dcm(self.T_b_ee[:3, :3])
 
-            r_O_ee = np.squeeze(np.copy(T_O_ee[:3, 3]))
+                r_O_ee = np.squeeze(np.copy(T_O_ee[:3, 3]))
 
-            self.world_ee_pos.append(r_O_ee)
+                self.world_ee_pos.append(r_O_ee)
 
-            #----- Update Buffers and estimatein direction_estimator class -----
+            with self.profiler.Stage('estimator'):
 
-            if len(self.direction_estimator.measuredForcesBuffer)>0:
+                #----- Update Buffers and estimatein direction_estimator class -----
 
-                self.direction_estimator.UpdateBuffers(self.force - np.squeeze(self.direction_estimator.measuredForcesBuffer[0]), r_O_ee)
-                self.direction_estimator.UpdateEstimate(self.force, alpha, C_O_ee, smooth, mixCoeff)
+                if len(self.direction_estimator.measuredForcesBuffer)>0:
 
-            else:
+                    self.direction_estimator.UpdateBuffers(self.force - np.squeeze(self.direction_estimator.measuredForcesBuffer[0]), r_O_ee)
+                    self.direction_estimator.UpdateEstimate(self.force, alpha, C_O_ee, smooth, mixCoeff)
 
-                self.direction_estimator.UpdateBuffers(self.force, r_O_ee)
+                else:
 
-            #----- Get linear velocity magnitude from the velocity profile -----
+                    self.direction_estimator.UpdateBuffers(self.force, r_O_ee)
 
-            velProfile = self.VelocityProfile(t, vInit, vFinal, alphaInit, alphaFinal, t0, tConv)
+                #----- Get linear velocity magnitude from the velocity profile -----
 
-            veldesEE_ee = self.direction_estimator.GetPlannedVelocities(v=velProfile, calcAng=True, kAng=0.3)   #Change to 0.05 or false
+                velProfile = self.VelocityProfile(t, vInit, vFinal, alphaInit, alphaFinal, t0, tConv)
+
+                veldesEE_ee = self.direction_estimator.GetPlannedVelocities(v=velProfile, calcAng=True, kAng=0.3)   #Change to 0.05 or false
 
             r_b_ee = self.T_b_ee[:3, 3]
 
@@ -452,7 +468,8 @@ class RobotPlanner:
             try:
                 temp = self.controller.PerformOneStep(veldesEE_ee, infoTuple)
 
-                self.publishArmAndBaseVelocityControl(self.controller.GetCurrOptSol(), linVelBase = self.controller.vLinBase_b, angVelBase = self.controller.vAngBase_b[2])
+                with self.profiler.Stage('motor_command'):
+                    self.publishArmAndBaseVelocityControl(self.controller.GetCurrOptSol(), linVelBase = self.controller.vLinBase_b, angVelBase = self.controller.vAngBase_b[2])
 
             except:
 
@@ -519,13 +536,15 @@ class RobotPlanner:
                 self.publishArmAndBaseVelocityControl(self.cinit.GetCurrOptSol(), linVelBase = [0.0, 0.0, 0.0], angVelBase = 0.0)
 
 #-------
-    def InitProgram(self):
+    def InitProgram(self, probing=None):
 
-        #----- Function that performs the initial direction estimation movement -----
+        #----- Function that performs the initial direction estimation movement.
+        # The probed directions are chosen by the probing strategy, see
+        # InitialDirectionProbing -----
 
         print(5*"-"+' Init procedure '+5*'-')
 
-        direction_list = self.direction_estimator.CalculateInitialDirections()
+        probing = InitialDirectionProbing(self.probing if probing is None else probing)
 
         try_velocity = 0.005
         N_steps_per_dir = 3
@@ -536,9 +555,16 @@ class RobotPlanner:
 
         startTime = time.time()
 
-        for idx in range(len(direction_list)):
+        idx = 0
+
+        while True:
+
+            d = probing.NextDirection()
 
-            d = direction_list[idx]
+            if d is None:
+                break
+
+            probeStartTime = time.time()
 
             print("Trying the direction n: "+str(d))
 
@@ -626,12 +652,18 @@ class RobotPlanner:
 
             sf = np.array(panda_model.K_F_ext_hat_K[:3])
 
+            probing.Report(y, time.time() - probeStartTime)
+            idx += 1
+
         self.direction_estimator.EstimateBestInitialDirection(X_data, Y_data, C_O_ee, C_b_ee)
 
         stopTime = time.time()
         totalInitTime = stopTime - startTime
 
+        summary = probing.Summary()
+
         print("Total init time: "+str(totalInitTime))
+        print("Probes used: "+str(summary['probes'])+"/"+str(summary['grid_probes'])+", time saved: "+str(summary['time_saved']))
 
 #-------
     def RecordTrueInitDirection(self):
@@ -51,6 +51,10 @@ class Controller:
 
         self.sol_lin_previous = [0.0]*7
 
+        #----- Timed by the planner that runs this controller -----
+
+        self.profiler = LatencyProfiler(enabled=False)
+
 #-------
     def PrepareTask1(self, J_b_ee, vdesEE_b, M, b, q, q_dot, tau_prev):
 
@@ -222,7 +226,8 @@ class Controller:
         J_b_ee = J_b_ee[:, :7]
 
         try:
-            self.q_dot_optimal = self.CalculateDesiredJointVel(veldesEE_ee, J_b_ee, M, b, q, q_dot, C_b_ee, tau_prev, False)
+            with self.profiler.Stage('qp_solve'):
+                self.q_dot_optimal = self.CalculateDesiredJointVel(veldesEE_ee, J_b_ee, M, b, q, q_dot, C_b_ee, tau_prev, False)
             self.q_dot_dot_optimal = (1/self.dt)*(self.q_dot_optimal - q_dot)
             self.tau_optimal = np.matmul(M, self.q_dot_dot_optimal) + b
         except:
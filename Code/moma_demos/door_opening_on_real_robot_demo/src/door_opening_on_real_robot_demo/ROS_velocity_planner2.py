@@ -64,6 +64,10 @@ class Controller:
 
         self.sol_lin_previous = [0.0]*7
 
+        #----- Timed by the planner that runs this controller -----
+
+        self.profiler = LatencyProfiler(enabled=False)
+
 #-------
     def PrepareTask1(self, J_b_ee, vdesEE_b, M, b, q, q_dot, tau_prev):
 
@@ -320,9 +324,11 @@ class Controller:
         J_b_ee = J_b_ee[:, :7]
 
         try:
-            vLinBase_b, vAngBase_b, vEE_ee = self.SplitVelocity(veldesEE_ee, J_b_ee, C_O_b, C_O_ee, r_b_ee, v, q)
+            with self.profiler.Stage('velocity_split'):
+                vLinBase_b, vAngBase_b, vEE_ee = self.SplitVelocity(veldesEE_ee, J_b_ee, C_O_b, C_O_ee, r_b_ee, v, q)
 
-            self.q_dot_optimal = self.CalculateDesiredJointVel(vEE_ee, J_b_ee, M, b, q, q_dot, C_b_ee, tau_prev, False)
+            with self.profiler.Stage('qp_solve'):
+                self.q_dot_optimal = self.CalculateDesiredJointVel(vEE_ee, J_b_ee, M, b, q, q_dot, C_b_ee, tau_prev, False)
 
             self.q_dot_dot_optimal = (1/self.dt)*(self.q_dot_optimal - q_dot)
 